@@ -0,0 +1,75 @@
+'''
+Async views for the ASGI deployment (core.asgi).
+
+The event loop only parses requests and renders responses. Anything that
+blocks, the ORM and the file caches, runs on a pool of ASYNC_ORM_THREADS
+threads per worker, so a slow query or a locked database holds one of those
+threads while the loop keeps serving everything else. The pool's threads keep
+their connections between calls the way a request's thread would.
+'''
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.views import APIView
+
+executor = ThreadPoolExecutor(max_workers=settings.ASYNC_ORM_THREADS, thread_name_prefix='orm')
+
+VIEW_ATTRIBUTES = ('renderer_classes', 'parser_classes', 'authentication_classes', 'throttle_classes',
+                   'permission_classes')
+
+
+def _call(func, args, kwargs):
+    # What request_started and request_finished do for a request's own thread
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run(func, *args, **kwargs):
+    # Runs blocking work on the pool; context variables (see core.routers) go there and back
+    return await sync_to_async(_call, thread_sensitive=False, executor=executor)(func, args, kwargs)
+
+
+class AsyncAPIView(APIView):
+    '''
+    APIView with coroutine handlers. Authentication, permissions and throttles
+    run on the pool, the handler on the loop.
+    '''
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await run(self.initial, request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def async_api_view(http_method_names):
+    # api_view for coroutine functions; the decorators of rest_framework.decorators apply as they are
+    def decorator(func):
+        async def handler(self, request, *args, **kwargs):
+            return await func(request, *args, **kwargs)
+        attributes = {method.lower(): handler for method in http_method_names}
+        attributes.update({name: getattr(func, name) for name in VIEW_ATTRIBUTES if hasattr(func, name)})
+        attributes['http_method_names'] = [method.lower() for method in http_method_names] + ['options']
+        view = type(func.__name__, (AsyncAPIView,), attributes)
+        view.__doc__ = func.__doc__
+        return view.as_view()
+    return decorator
@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# The async views of core.urls replace their sync counterparts; ASYNC_VIEWS=0 serves the sync ones instead
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+# Every uvicorn worker imports this module, so each one starts with its typeahead index built
+from shows.typeahead import warm  # noqa: E402
+
+warm()
@@ -0,0 +1,24 @@
+'''
+API error handling.
+
+A request that waited SQLITE_BUSY_TIMEOUT for the SQLite write lock without
+getting it answers 503 with a Retry-After, not a 500, so clients (and the
+simulate_viewers load test) can tell contention from bugs and retry.
+'''
+from django.db import OperationalError
+from rest_framework import exceptions, views
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+
+class DatabaseBusy(exceptions.APIException):
+    status_code = 503
+    default_detail = 'The database is busy, try again shortly.'
+    default_code = 'database_locked'
+    wait = 1  # seconds, sent as Retry-After
+
+
+def exception_handler(exc, context):
+    if isinstance(exc, OperationalError) and str(exc) in LOCKED_MESSAGES:
+        exc = DatabaseBusy()
+    return views.exception_handler(exc, context)
@@ -0,0 +1,97 @@
+'''
+File cache shared by the workers when there is no Redis (REDIS_URL).
+
+Django's FileBasedCache lists the whole cache directory on every set to decide
+whether to cull, and its add() and incr() are a read and then a write. Here
+entries are spread over SHARDS subdirectories by key hash and a set only culls
+its own subdirectory, against its share of MAX_ENTRIES, so a write lists about
+MAX_ENTRIES / SHARDS files. add() and incr() hold a lock file, so a counter
+incremented by several workers at once keeps every increment.
+'''
+import contextlib
+import glob
+import os
+import pickle
+import random
+import tempfile
+import time
+import zlib
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+from django.core.files.move import file_move_safe
+from django.utils._os import safe_makedirs
+
+SHARDS = 256
+LOCK_FILE = 'counters.lock'
+
+
+class ShardedFileCache(FileBasedCache):
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._shard_max_entries = max(1, self._max_entries // SHARDS)
+
+    def _key_to_file(self, key, version=None):
+        name = os.path.basename(super()._key_to_file(key, version))
+        return os.path.join(self._dir, name[:2], name)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        fname = self._key_to_file(key, version)
+        shard = os.path.dirname(fname)
+        # The cache directory can be deleted at any time
+        safe_makedirs(shard, mode=0o700, exist_ok=True)
+        self._cull_shard(shard)
+        fd, tmp_path = tempfile.mkstemp(dir=shard)
+        renamed = False
+        try:
+            with open(fd, 'wb') as file:
+                self._write_content(file, timeout, value)
+            file_move_safe(tmp_path, fname, allow_overwrite=True)
+            renamed = True
+        finally:
+            if not renamed:
+                os.remove(tmp_path)
+
+    def _cull_shard(self, shard):
+        filelist = glob.glob(os.path.join(shard, f'*{self.cache_suffix}'))
+        if len(filelist) < self._shard_max_entries:
+            return
+        if self._cull_frequency == 0:
+            doomed = filelist
+        else:
+            doomed = random.sample(filelist, len(filelist) // self._cull_frequency)
+        for fname in doomed:
+            self._delete(fname)
+
+    def _list_cache_files(self):
+        # Entries written before the cache was sharded are still listed, so clear() removes them
+        return [os.path.join(self._dir, fname) for pattern in (f'*{self.cache_suffix}', f'*/*{self.cache_suffix}')
+                for fname in glob.glob(pattern, root_dir=self._dir)]
+
+    @contextlib.contextmanager
+    def _counter_lock(self):
+        self._createdir()
+        with open(os.path.join(self._dir, LOCK_FILE), 'ab') as file:
+            locks.lock(file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(file)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._counter_lock():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._counter_lock():
+            try:
+                with open(self._key_to_file(key, version), 'rb') as file:
+                    expiry = pickle.load(file)
+                    value = pickle.loads(zlib.decompress(file.read()))
+            except FileNotFoundError:
+                expiry, value = 0, None
+            if expiry is not None and expiry < time.time():
+                raise ValueError(f"Key '{key}' not found")
+            # The entry keeps the expiry it had, as it does in Redis
+            self.set(key, value + delta, None if expiry is None else expiry - time.time(), version)
+            return value + delta
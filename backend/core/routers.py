@@ -0,0 +1,141 @@
+'''
+Database routing: user activity and read replicas.
+
+Progress, history, recent views, favorites and watchlist are written far more
+often than anything else, so they go to the `activity` database when one is
+configured, where those writes do not contend with the catalog's.
+
+Catalog models are read far more than they are written, so their reads go to
+the `replica` database when one is configured. Everything else, and every
+write, goes to the primary. Once a request writes to the catalog, the rest of
+it reads from the primary, and so do the client's requests for REPLICA_STICKY
+afterwards, so nobody reads a replica that has not caught up with their own
+changes. Outside requests (commands, migrations, workers) everything uses the
+primary.
+'''
+import contextlib
+import contextvars
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+ACTIVITY = 'activity'
+REPLICA = 'replica'
+PRIMARY_COOKIE = 'db_primary'
+ACTIVITY_MODELS = {'shows.progress', 'shows.historyentry', 'shows.recentview', 'shows.favorite', 'shows.watchlistentry'}
+CATALOG_MODELS = {'shows.show', 'shows.artist', 'shows.country', 'shows.language', 'shows.genre', 'shows.rating',
+                  'shows.label'}
+
+# Whether reads go to the primary, and whether anything was written, in the current request
+_pinned = contextvars.ContextVar('db_pinned', default=True)
+_wrote = contextvars.ContextVar('db_wrote', default=False)
+
+
+def is_catalog(model):
+    opts = model._meta
+    if opts.auto_created:
+        # A many-to-many table belongs to the catalog when both of its sides do
+        return all(is_catalog(field.related_model) for field in opts.fields if field.is_relation)
+    return opts.label_lower in CATALOG_MODELS
+
+
+@contextlib.contextmanager
+def primary(condition=True):
+    # Reads inside go to the primary when condition holds
+    token = _pinned.set(True) if condition else None
+    try:
+        yield
+    finally:
+        if token is not None:
+            _pinned.reset(token)
+
+
+class ActivityRouter:
+    def _db(self, model):
+        if ACTIVITY in settings.DATABASES and model._meta.label_lower in ACTIVITY_MODELS:
+            return ACTIVITY
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db(model)
+
+    def db_for_write(self, model, **hints):
+        return self._db(model)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Activity rows point at users and shows by id; there is no join between the databases
+        if ACTIVITY in {obj1._state.db, obj2._state.db}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if ACTIVITY not in settings.DATABASES:
+            return None
+        is_activity = model_name is not None and f'{app_label}.{model_name}' in ACTIVITY_MODELS
+        if db == ACTIVITY:
+            return is_activity
+        return False if is_activity else None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if REPLICA in settings.DATABASES and not _pinned.get() and is_catalog(model):
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Other models are always read from the primary, so only catalog writes need the reads to follow
+        if is_catalog(model):
+            _pinned.set(True)
+            _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica follows the primary's schema through replication
+        return db != REPLICA
+
+
+class PrimaryStickinessMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = self._pin(request)
+        try:
+            return self._stick(self.get_response(request))
+        finally:
+            self._reset(tokens)
+
+    async def __acall__(self, request):
+        tokens = self._pin(request)
+        try:
+            return self._stick(await self.get_response(request))
+        finally:
+            self._reset(tokens)
+
+    def _pin(self, request):
+        # Requests that change something read what they change from the primary too
+        return (_pinned.set(request.method not in SAFE_METHODS or PRIMARY_COOKIE in request.COOKIES),
+                _wrote.set(False))
+
+    def _stick(self, response):
+        if _wrote.get() and REPLICA in settings.DATABASES:
+            response.set_cookie(PRIMARY_COOKIE, '1', max_age=int(settings.REPLICA_STICKY.total_seconds()),
+                                httponly=True, samesite='Lax')
+        return response
+
+    def _reset(self, tokens):
+        _pinned.reset(tokens[0])
+        _wrote.reset(tokens[1])
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 import json
+import sys
 from datetime import timedelta
 from rest_framework.settings import api_settings
 from dotenv import load_dotenv
@@ -68,6 +69,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.routers.PrimaryStickinessMiddleware',
 ]
 
 AUTH_USER_MODEL = 'users.CustomUser'
@@ -94,8 +96,13 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
+# core.asgi serves the hottest endpoints with async views (see core.aio)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS') == '1'
+ASYNC_ORM_THREADS = int(os.getenv('ASYNC_ORM_THREADS', 8))  # per worker, for the blocking work of async views
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ('knox.auth.TokenAuthentication',),
+    'DEFAULT_AUTHENTICATION_CLASSES': ('users.auth.CachedTokenAuthentication',),
+    'EXCEPTION_HANDLER': 'core.exceptions.exception_handler',
 }
 
 KNOX_TOKEN_MODEL = 'knox.AuthToken'
@@ -114,24 +121,152 @@ REST_KNOX = {
     'TOKEN_MODEL': 'knox.AuthToken',
 }
 
+# Catalog representations are shared by every worker, through Redis when REDIS_URL is set and the file system otherwise
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'core.filecache.ShardedFileCache',
+        'LOCATION': BASE_DIR.parent / 'data' / 'cache' / 'catalog',
+        'TIMEOUT': 60 * 60 * 24,  # entries are invalidated by version, this only bounds the disk use
+        'VERSION': 2,  # raised when the cached representations change shape
+        'OPTIONS': {'MAX_ENTRIES': 20000},  # culled per shard, so a write lists about 80 files
+    },
+    # Versions that revoke the tokens cached by the workers
+    'auth': {
+        'BACKEND': 'core.filecache.ShardedFileCache',
+        'LOCATION': BASE_DIR.parent / 'data' / 'cache' / 'auth',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+REDIS_URL = os.getenv('REDIS_URL')  # e.g. redis://redis:6379/0, run with an allkeys-lru maxmemory policy
+if REDIS_URL:
+    for alias in ('catalog', 'auth'):
+        # Both share the database, so clearing either one (generate_catalog does) empties both
+        CACHES[alias].update({'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL,
+                              'KEY_PREFIX': alias})
+        CACHES[alias].pop('OPTIONS')
+
+# Verified tokens each worker keeps, and how long before one is checked against the database again
+AUTH_CACHE_SIZE = 10000
+AUTH_CACHE_MAX_AGE = timedelta(minutes=5)
+
+# Requests running more queries than their view's budget are logged; while developing and in the tests
+# they fail instead, so an N+1 regression fails the build
+QUERY_BUDGETS_CHECKED = True
+QUERY_BUDGETS_ENFORCED = os.getenv('DEBUG') == '1' or sys.argv[1:2] == ['test']
+
+# Playback heartbeats are buffered per worker and written in bulk
+HEARTBEAT_FLUSH_INTERVAL = 5  # seconds
+HEARTBEAT_FLUSH_SIZE = 500
+HEARTBEAT_SEQUENCE_TTL = timedelta(hours=1)
+
+# Viewing history
+RECENT_VIEWS_LIMIT = 40  # distinct shows kept for the history tab
+HISTORY_RETENTION = timedelta(days=365)  # older entries are removed by compact_history
+HISTORY_COMPACTION_WINDOW = timedelta(minutes=30)  # repeated views of a show within it are merged
+
+# Resized copies of uploaded images, made on upload and by the generate_renditions command
+IMAGE_RENDITION_WIDTHS = (160, 320, 640)  # the first one is the thumbnail of list cards
+IMAGE_RENDITION_FORMATS = ('avif', 'webp')  # best first; formats Pillow cannot write are skipped
+# Uploads are named after their content; prune_media leaves unreferenced ones younger than this,
+# since a file is written before the row pointing at it is committed
+MEDIA_PRUNE_GRACE = timedelta(hours=1)
+
+# Typeahead suggestions come from an index in every worker, rebuilt when it gets this old
+TYPEAHEAD_MAX_AGE = timedelta(minutes=10)
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+# The SMTP server can be swapped for a local stand-in, e.g. `python -m aiosmtpd -n -l localhost:1025`
+EMAIL_HOST = os.getenv('EMAIL_SMTP_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.getenv('EMAIL_SMTP_PORT', 587))
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', '1') == '1'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_DEFAULT_FROM')
 
+# Emails wait in users.OutboxEmail for the send_outbox worker
+EMAIL_OUTBOX_BATCH = 50
+EMAIL_OUTBOX_POLL_INTERVAL = 5  # seconds
+EMAIL_OUTBOX_LEASE = timedelta(minutes=5)  # how long a claimed batch is kept from other workers
+EMAIL_OUTBOX_RETENTION = timedelta(days=30)  # sent emails are deleted after it
+EMAIL_RETRY_BACKOFF = timedelta(seconds=30)  # doubled after every failed attempt
+EMAIL_MAX_ATTEMPTS = 8
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR.parent / 'data' / 'db.sqlite3',
-    }
+# Every gunicorn worker writes to the same SQLite file, so it runs in WAL mode (readers never wait for
+# the writer) and write transactions take the lock when they begin instead of failing on a busy upgrade
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # durable at checkpoints, which is enough with WAL
+    'cache_size': -32000,  # in KiB, per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
 }
+SQLITE_BUSY_TIMEOUT = 20  # seconds a connection waits for the write lock
+
+SQLITE_DATABASE = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR.parent / 'data' / 'db.sqlite3',
+    'OPTIONS': {
+        'timeout': SQLITE_BUSY_TIMEOUT,
+        'transaction_mode': 'IMMEDIATE',
+        # Run on every new connection
+        'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+    },
+    # Connections are kept across requests, so the pragmas and the page cache are set up once per worker
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+}
+
+# DB_ENGINE=postgresql switches to PostgreSQL, configured by the POSTGRES_* variables; with
+# POSTGRES_REPLICA_HOST set, catalog reads go to that replica (see core.routers)
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+POSTGRES_POOL = {
+    'min_size': int(os.getenv('POSTGRES_POOL_MIN', 1)),
+    'max_size': int(os.getenv('POSTGRES_POOL_MAX', 4)),  # per gunicorn worker
+    'timeout': 10,  # seconds a request waits for a free connection
+}
+
+
+def postgres_database(host, name=os.getenv('POSTGRES_DB', 'simsy')):
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'HOST': host,
+        'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        'NAME': name,
+        'USER': os.getenv('POSTGRES_USER', 'simsy'),
+        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+        # Connections come from a pool kept by every worker, which Django requires CONN_MAX_AGE 0 for
+        'OPTIONS': {'pool': POSTGRES_POOL},
+        'CONN_MAX_AGE': 0,
+    }
+
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {'default': postgres_database(os.getenv('POSTGRES_HOST', 'localhost'))}
+    if os.getenv('POSTGRES_REPLICA_HOST'):
+        DATABASES['replica'] = postgres_database(os.getenv('POSTGRES_REPLICA_HOST')) | {'TEST': {'MIRROR': 'default'}}
+else:
+    DATABASES = {'default': SQLITE_DATABASE}
+
+# User activity (progress, history, favorites, watchlist) gets a database of its own with ACTIVITY_DB=sqlite
+# (data/activity.sqlite3) or ACTIVITY_DB=postgresql (ACTIVITY_POSTGRES_HOST/ACTIVITY_POSTGRES_DB); run
+# `migrate --database activity`, then `move_activity` to bring over what the main database holds
+ACTIVITY_DB = os.getenv('ACTIVITY_DB', '')
+if ACTIVITY_DB == 'sqlite':
+    DATABASES['activity'] = SQLITE_DATABASE | {'NAME': BASE_DIR.parent / 'data' / 'activity.sqlite3'}
+elif ACTIVITY_DB == 'postgresql':
+    DATABASES['activity'] = postgres_database(os.getenv('ACTIVITY_POSTGRES_HOST', os.getenv('POSTGRES_HOST', 'localhost')),
+                                              os.getenv('ACTIVITY_POSTGRES_DB', 'simsy_activity'))
+
+DATABASE_ROUTERS = ['core.routers.ActivityRouter', 'core.routers.ReplicaRouter']
+REPLICA_STICKY = timedelta(seconds=10)  # longer than the replica lags; reads follow a client's writes for this long
 
 
 # Password validation
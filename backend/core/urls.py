@@ -4,6 +4,8 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from shows.views import ArtistsViewSet, LanguagesViewSet, CountriesViewSet, GenresViewSet, RatingsViewSet, LabelsViewSet, ShowsViewSet
+from shows.views import asyncFavoritesView, asyncWatchlistView, asyncNewView, asyncHistoryView, asyncHeartbeatView, asyncUpdateTimeReachedView, asyncSearchView
+from users.views import asyncCurrentUserView
 router = DefaultRouter()
 
 router.register('artists', ArtistsViewSet)
@@ -22,4 +24,17 @@ urlpatterns = [
     path('password_reset/', include('django_rest_passwordreset.urls', namespace='password_reset')),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT) + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
-urlpatterns += router.urls
\ No newline at end of file
+urlpatterns += router.urls
+
+if settings.ASYNC_VIEWS:
+    # Ahead of the sync views they replace
+    urlpatterns = [
+        path('shows/favorites/', asyncFavoritesView),
+        path('shows/watchlist/', asyncWatchlistView),
+        path('shows/new/', asyncNewView),
+        path('shows/history/', asyncHistoryView),
+        path('shows/<int:pk>/heartbeat/', asyncHeartbeatView),
+        path('shows/<int:pk>/update_time_reached/', asyncUpdateTimeReachedView),
+        path('users/current/', asyncCurrentUserView),
+        path('api/search/<str:query>/', asyncSearchView),
+    ] + urlpatterns
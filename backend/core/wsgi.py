@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Every gunicorn worker imports this module, so each one starts with its typeahead index built
+from shows.typeahead import warm  # noqa: E402
+
+warm()
@@ -0,0 +1,14 @@
+'''
+gunicorn settings, read from the working directory.
+
+SERVER_MODE=asgi serves core.asgi with uvicorn workers, which answer the
+hottest endpoints with async views; the default serves core.wsgi with sync
+workers.
+'''
+import os
+
+if os.getenv('SERVER_MODE') == 'asgi':
+    wsgi_app = 'core.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'core.wsgi:application'
@@ -32,8 +32,18 @@ admin.site.register(Rating, ratingAdminDisplay)
 
 class showAdminDisplay(admin.ModelAdmin):
     list_display = ['id','name','year','kind', 'sample','captions','rating','finalized','image']
-    list_filter = ['finalized', 'labels', 'favorites','watchlist','kind','sample','languages','captions','rating','year']
+    list_filter = ['finalized', 'labels','kind','sample','languages','captions','rating','year']
     ordering = ['-id']
     list_max_show_all = 5000
     list_per_page = 1000
-admin.site.register(Show, showAdminDisplay)
\ No newline at end of file
+admin.site.register(Show, showAdminDisplay)
+class progressAdminDisplay(admin.ModelAdmin):
+    list_display = ['id','user','show','season','episode','time','updated']
+    raw_id_fields = ['user','show']
+admin.site.register(Progress, progressAdminDisplay)
+
+class historyEntryAdminDisplay(admin.ModelAdmin):
+    list_display = ['id','user','show','viewed_at']
+    raw_id_fields = ['user','show']
+    ordering = ['-viewed_at']
+admin.site.register(HistoryEntry, historyEntryAdminDisplay)
@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ShowsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shows'
+
+    def ready(self):
+        from . import search, signals  # noqa: F401
+        post_migrate.connect(search.migrated, sender=self, dispatch_uid='search_migrated')
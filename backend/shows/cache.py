@@ -0,0 +1,196 @@
+'''
+Shared cache of catalog representations.
+
+Every catalog entity has a version counter, and so does every entity type for
+its lists. Cached data is keyed by the versions it was built from, so bumping a
+counter is enough to invalidate it. Signals bump the entity that changed and
+every entity whose representation nests it; the nesting is read from the query
+plans of the cached serializers.
+'''
+import hashlib
+import logging
+import time
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router, transaction
+from django.db.models import Q
+from core.routers import primary
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'catalog'
+MODELS = {
+    'show': 'shows.Show',
+    'artist': 'shows.Artist',
+    'country': 'shows.Country',
+    'language': 'shows.Language',
+    'genre': 'shows.Genre',
+    'label': 'shows.Label',
+    'rating': 'shows.Rating',
+}
+# Version of a user's favorites, watchlist, progress and preferences, which the user's fields of shows are made of
+USER_STATE = 'user_state'
+# Hits and misses are counted in batches to keep the cache round trips off the hot path
+METRICS_BATCH = 50
+
+
+class CatalogCache:
+    def __init__(self, alias):
+        self.alias = alias
+        # entity type -> serializer classes whose cached data nests other entities
+        self.serializers = {}
+        self._dependents = None
+        self._hits = self._misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def register(self, entity_type, *serializer_classes):
+        self.serializers.setdefault(entity_type, set()).update(serializer_classes)
+        self._dependents = None
+
+    # ----- Versions -----
+    def _version_key(self, entity_type, object_id=None):
+        return f'v:{entity_type}' if object_id is None else f'v:{entity_type}:{object_id}'
+
+    def versions(self, entity_type, object_ids=None):
+        # {object_id: version}, or the list version of the type when object_ids is None
+        keys = {self._version_key(entity_type, object_id): object_id
+                for object_id in (object_ids if object_ids is not None else [None])}
+        found = self.cache.get_many(keys)
+        missing = {key: self._fresh() for key in keys if key not in found}
+        if missing:
+            # A counter that was evicted starts somewhere new, so older entries stay unreachable
+            self.cache.set_many(missing, timeout=None)
+            found.update(missing)
+        versions = {object_id: found[key] for key, object_id in keys.items()}
+        return versions if object_ids is not None else versions[None]
+
+    def _fresh(self):
+        return time.time_ns()
+
+    def _recent(self, versions):
+        # Versions are bump times; a replica may not have the rows of one bumped lately yet
+        return max(versions, default=0) > time.time_ns() - settings.REPLICA_STICKY.total_seconds() * 1e9
+
+    def bump(self, entity_type, object_ids=()):
+        keys = [self._version_key(entity_type)] + [self._version_key(entity_type, object_id) for object_id in object_ids]
+        self.cache.set_many({key: self._fresh() for key in keys}, timeout=None)
+
+    # ----- Data -----
+    def variant(self, *parts):
+        return hashlib.md5(repr(parts).encode()).hexdigest()[:16]
+
+    def _key(self, entity_type, object_id, version, variant):
+        return f'd:{entity_type}:{object_id}:{version}:{variant}'
+
+    def get_many(self, entity_type, object_ids, variant, build, versions=None):
+        # {object_id: data}; build(missing_ids) returns {object_id: data} for the ones not cached
+        if versions is None:
+            versions = self.versions(entity_type, object_ids)
+        keys = {self._key(entity_type, object_id, version, variant): object_id for object_id, version in versions.items()}
+        found = {keys[key]: data for key, data in self.cache.get_many(keys).items()}
+        missing = [object_id for object_id in object_ids if object_id not in found]
+        self._count(len(found), len(missing))
+        if missing:
+            with primary(self._recent(versions[object_id] for object_id in missing)):
+                built = build(missing)
+            self.cache.set_many({self._key(entity_type, object_id, versions[object_id], variant): data
+                                 for object_id, data in built.items()})
+            found.update(built)
+        return found
+
+    def get_list(self, entity_type, variant, build, version=None):
+        # For data built from every entity of a type
+        if version is None:
+            version = self.versions(entity_type)
+        key = self._key(entity_type, 'list', version, variant)
+        data = self.cache.get(key)
+        self._count(data is not None, data is None)
+        if data is None:
+            with primary(self._recent([version])):
+                data = build()
+            self.cache.set(key, data)
+        return data
+
+    # ----- Metrics -----
+    def _count(self, hits, misses):
+        self._hits += hits
+        self._misses += misses
+        if self._hits + self._misses >= METRICS_BATCH:
+            self.flush_metrics()
+
+    def flush_metrics(self):
+        hits, misses, self._hits, self._misses = self._hits, self._misses, 0, 0
+        for key, value in (('m:hits', hits), ('m:misses', misses)):
+            if value:
+                self.cache.add(key, 0, timeout=None)
+                try:
+                    self.cache.incr(key, value)
+                except ValueError:
+                    # Evicted in between
+                    self.cache.set(key, value, timeout=None)
+
+    def stats(self):
+        self.flush_metrics()
+        values = self.cache.get_many(['m:hits', 'm:misses'])
+        hits, misses = values.get('m:hits', 0), values.get('m:misses', 0)
+        return {'hits': hits, 'misses': misses, 'hit_ratio': hits / (hits + misses) if hits + misses else None}
+
+    def reset_stats(self):
+        self._hits = self._misses = 0
+        self.cache.delete_many(['m:hits', 'm:misses'])
+
+    # ----- Invalidation -----
+    def dependents(self, get_model=global_apps.get_model):
+        # model -> [(entity type, lookup from that type to the model)] for every nested relation
+        if self._dependents is None:
+            from .prefetch import plan
+            dependents = {}
+            for entity_type, serializer_classes in self.serializers.items():
+                model = get_model(MODELS[entity_type])
+                paths = set()
+                for serializer_class in serializer_classes:
+                    query_plan = plan(serializer_class, model)
+                    paths |= query_plan.select | query_plan.prefetch
+                for path in paths:
+                    related = model
+                    for name in path.split('__'):
+                        related = related._meta.get_field(name).related_model
+                    dependents.setdefault(related, set()).add((entity_type, path))
+            self._dependents = dependents
+        return self._dependents
+
+    def changed(self, model, object_ids):
+        # Invalidates the given entities and everything nesting them once the change commits; a reader
+        # between the bump and the commit would cache the old rows under the new version until the next edit
+        object_ids = {object_id for object_id in object_ids if object_id is not None}
+        if not object_ids:
+            return
+        # What nests them is looked up now, while a deletion can still see its links
+        bumps = {}
+        entity_type = getattr(model, '_catalog_type', None)
+        if entity_type is not None:
+            bumps[entity_type] = object_ids
+        by_type = {}
+        for dependent_type, path in self.dependents().get(model, ()):
+            by_type.setdefault(dependent_type, Q())
+            by_type[dependent_type] |= Q(**{f'{path}__in': object_ids})
+        for dependent_type, condition in by_type.items():
+            dependent_model = global_apps.get_model(MODELS[dependent_type])
+            dependent_ids = set(dependent_model.objects.filter(condition).values_list('id', flat=True))
+            if dependent_ids:
+                bumps.setdefault(dependent_type, set()).update(dependent_ids)
+        self.bump_on_commit(model, bumps)
+
+    def bump_on_commit(self, model, bumps):
+        # bumps is {entity_type: object_ids}; right away outside a transaction
+        def bump_all():
+            for entity_type, object_ids in bumps.items():
+                self.bump(entity_type, object_ids)
+        transaction.on_commit(bump_all, using=router.db_for_write(model))
+
+
+catalog_cache = CatalogCache(CACHE_ALIAS)
@@ -0,0 +1,40 @@
+'''
+Conditional GET for read endpoints.
+
+Validators are built from the version counters of the catalog cache and the
+ids a response is made of, so checking one costs no serialization. Versions are
+the nanosecond time of the change that set them, which makes the newest one the
+Last-Modified date as well.
+'''
+import hashlib
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def timestamp(moment):
+    # A datetime on the scale of the versions
+    return int(moment.timestamp() * 10**9)
+
+
+class Validators:
+    def __init__(self, versions, *parts, per_user=False):
+        versions = list(versions)
+        self.etag = quote_etag(hashlib.md5(repr((versions, parts)).encode()).hexdigest())
+        self.last_modified = max(versions) // 10**9 if versions else None
+        self.per_user = per_user
+
+    def not_modified(self, request):
+        # The 304 to answer with when the client's copy is current, otherwise None
+        response = get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+        return self.apply(response) if response is not None else None
+
+    def apply(self, response):
+        response.headers['ETag'] = self.etag
+        if self.last_modified is not None:
+            response.headers['Last-Modified'] = http_date(self.last_modified)
+        # Clients keep the copy but always ask whether it is still current
+        patch_cache_control(response, no_cache=True)
+        if self.per_user:
+            patch_cache_control(response, private=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,36 @@
+'''
+Denormalized relation counts of the taxonomy models.
+
+Every counted relation has a `<relation>_count` column. Signals recount the
+rows a change touched from the relation itself, so concurrent changes cannot
+make a column drift.
+'''
+from django.apps import apps as global_apps
+from django.db.models import Count, OuterRef, Subquery
+
+# model -> relations counted in a column of it
+COUNTED = {
+    'shows.Artist': ['shows'],
+    'shows.Language': ['shows', 'countries'],
+    'shows.Country': ['shows', 'artists'],
+    'shows.Genre': ['shows'],
+    'shows.Rating': ['shows'],
+    'shows.Label': ['shows'],
+}
+
+
+def refresh(model, relation, object_ids):
+    object_ids = {object_id for object_id in object_ids if object_id is not None}
+    if not object_ids:
+        return
+    count = model.objects.filter(pk=OuterRef('pk')).order_by().annotate(count=Count(relation)).values('count')
+    model.objects.filter(pk__in=object_ids).update(**{f'{relation}_count': Subquery(count)})
+
+
+def refresh_all(get_model=global_apps.get_model):
+    # get_model lets migrations fill the columns from historical models
+    for model_name, relations in COUNTED.items():
+        model = get_model(model_name)
+        for relation in relations:
+            count = model.objects.filter(pk=OuterRef('pk')).order_by().annotate(count=Count(relation)).values('count')
+            model.objects.update(**{f'{relation}_count': Subquery(count)})
@@ -0,0 +1,147 @@
+import atexit
+import logging
+import threading
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.utils import timezone
+from core import aio
+from .cache import catalog_cache, USER_STATE
+from .models import Progress, Show
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatBuffer:
+    '''
+    Worker-local write-behind buffer for playback heartbeats.
+
+    Only the latest position per (user, show, season, episode) is kept and the
+    whole buffer is written with a few bulk upserts once it gets old or big.
+    '''
+
+    def __init__(self, interval, size):
+        self.interval = interval
+        self.size = size
+        self._lock = threading.Lock()
+        # (user_id, show_id, season, episode) -> (time, received)
+        self._pending = {}
+        # (user_id, show_id) -> (last accepted sequence number, received)
+        self._sequences = {}
+        self._timer = None
+
+    def add(self, user_id, show_id, season, episode, time, seq=None):
+        accepted, full = self._add(user_id, show_id, season, episode, time, seq)
+        if full:
+            self.flush()
+        return accepted
+
+    async def aadd(self, user_id, show_id, season, episode, time, seq=None):
+        # add() for async views, which write a full buffer from the ORM threads
+        accepted, full = self._add(user_id, show_id, season, episode, time, seq)
+        if full:
+            await aio.run(self.flush)
+        return accepted
+
+    def _add(self, user_id, show_id, season, episode, time, seq):
+        # (accepted, whether the buffer is full now)
+        received = timezone.now()
+        with self._lock:
+            if seq is not None:
+                last = self._sequences.get((user_id, show_id))
+                # Duplicate or out-of-order heartbeat
+                if last and seq <= last[0]:
+                    return False, False
+                self._sequences[(user_id, show_id)] = (seq, received)
+            self._pending[(user_id, show_id, season, episode)] = (time, received)
+            full = len(self._pending) >= self.size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.interval, self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return True, full
+
+    def discard(self, user_id, show_id, season=None, episode=None):
+        with self._lock:
+            for key in [key for key in self._pending if key[:2] == (user_id, show_id)
+                        and (season is None or key[2:] == (season, episode))]:
+                del self._pending[key]
+
+    def pending_for(self, user_id, show_ids):
+        # {show_id: [(season, episode, time, received), ...]} for what this worker has not written yet
+        show_ids = set(show_ids)
+        pending = {}
+        with self._lock:
+            for (pending_user, show_id, season, episode), (time, received) in self._pending.items():
+                if pending_user == user_id and show_id in show_ids:
+                    pending.setdefault(show_id, []).append((season, episode, time, received))
+        return pending
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            # Forget sequence numbers of players that went quiet
+            cutoff = timezone.now() - settings.HEARTBEAT_SEQUENCE_TTL
+            self._sequences = {key: value for key, value in self._sequences.items() if value[1] > cutoff}
+        if not pending:
+            return 0
+        try:
+            return self._write(pending)
+        except Exception:
+            logger.exception('Failed to flush %d playback heartbeats', len(pending))
+            with self._lock:
+                # Put them back unless a newer heartbeat arrived meanwhile
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)
+            return 0
+
+    def _timed_flush(self):
+        try:
+            self.flush()
+        finally:
+            # The timer thread has its own connections
+            connections.close_all()
+
+    def _write(self, pending):
+        # Heartbeats for users or shows deleted meanwhile would break the whole batch
+        show_ids = set(Show.objects.filter(id__in={key[1] for key in pending}).values_list('id', flat=True))
+        user_ids = set(User.objects.filter(id__in={key[0] for key in pending}).values_list('id', flat=True))
+        rows = [(user_id, show_id, season, episode, time, received)
+                for (user_id, show_id, season, episode), (time, received) in pending.items()
+                if user_id in user_ids and show_id in show_ids]
+        if not rows:
+            return 0
+
+        opts = Progress._meta
+        # Progress may live in the activity database
+        connection = connections[router.db_for_write(Progress)]
+        qn = connection.ops.quote_name
+        fields = [opts.get_field(name) for name in ('user', 'show', 'season', 'episode', 'time', 'updated')]
+        columns = ', '.join(qn(field.column) for field in fields)
+        unique = ', '.join(qn(field.column) for field in fields[:4])
+        table = qn(opts.db_table)
+        updated = qn(fields[5].column)
+        batch_size = max(connection.ops.bulk_batch_size(fields, rows), 1)
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                for start in range(0, len(rows), batch_size):
+                    batch = rows[start:start + batch_size]
+                    placeholders = ', '.join(['(%s)' % ', '.join(['%s'] * len(fields))] * len(batch))
+                    params = [field.get_db_prep_save(value, connection)
+                              for row in batch for field, value in zip(fields, row)]
+                    # A heartbeat flushed late by another worker must not overwrite a newer position
+                    cursor.execute(
+                        f'INSERT INTO {table} ({columns}) VALUES {placeholders} '
+                        f'ON CONFLICT ({unique}) DO UPDATE SET {qn(fields[4].column)} = excluded.{qn(fields[4].column)}, '
+                        f'{updated} = excluded.{updated} WHERE excluded.{updated} > {table}.{updated}',
+                        params)
+        catalog_cache.bump(USER_STATE, {row[0] for row in rows})
+        return len(rows)
+
+
+heartbeats = HeartbeatBuffer(settings.HEARTBEAT_FLUSH_INTERVAL, settings.HEARTBEAT_FLUSH_SIZE)
+# Gunicorn workers exit through sys.exit on a graceful shutdown, so this runs before the worker dies
+atexit.register(heartbeats.flush)
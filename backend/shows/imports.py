@@ -1,40 +1,71 @@
-def initReached(user, show_id, show_kind, season=1, episode=1, time=0):
-    if show_id not in user.reached:
-        user.reached[show_id] = {}
-    if show_kind == 'film':
-        if 't' not in user.reached[show_id]:
-            user.reached[show_id]['t'] = time
-    else:
-        if 's' not in user.reached[show_id]:
-            user.reached[show_id]['s'] = season
-        if 'e' not in user.reached[show_id]:
-            user.reached[show_id]['e'] = episode
-        if 't' not in user.reached[show_id]:
-            user.reached[show_id]['t'] = {str(season):{str(episode):time}}
-        if str(season) not in user.reached[show_id]['t']:
-            user.reached[show_id]['t'][str(season)] = {str(episode):time}
-        if str(episode) not in user.reached[show_id]['t'][str(season)]:
-            user.reached[show_id]['t'][str(season)][str(episode)] = time
-    return user.reached[show_id]
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+from .cache import catalog_cache, USER_STATE
+from .heartbeats import heartbeats
+from .models import Progress, HistoryEntry, RecentView
+
+
+def getReached(user, show_ids):
+    # One query for many shows, shaped like {show_id: {'s': season, 'e': episode, 't': {season: {episode: time}}}}
+    reached = {show_id: {} for show_id in show_ids}
+    rows = list(Progress.objects.filter(user=user, show_id__in=show_ids).values_list(
+        'show_id', 'season', 'episode', 'time', 'updated'))
+    # Heartbeats this worker has not written yet are newer than what is in the database
+    for show_id, pending in heartbeats.pending_for(user.id, show_ids).items():
+        rows.extend((show_id, *row) for row in pending)
+    # Oldest first, so the last one seen is where the user currently is
+    for show_id, season, episode, time, _ in sorted(rows, key=lambda row: row[4]):
+        reached[show_id]['s'], reached[show_id]['e'] = season, episode
+        reached[show_id].setdefault('t', {}).setdefault(
+            str(season), {})[str(episode)] = time
+    return reached
 
 def updateReached(user, show_id, show_kind, season, episode, time=0):
-    show_id = str(show_id)
-    user.reached[show_id] = initReached(user, show_id, show_kind, season, episode, time)
-    user.reached[show_id]['s'] = season
-    user.reached[show_id]['e'] = episode
-    season, episode = str(season), str(episode)
+    if show_kind == 'film':
+        season = episode = 1
+    now = timezone.now()
+    if not time:
+        # Resume from a heartbeat this worker has not written yet
+        pending = heartbeats.pending_for(user.id, [show_id]).get(show_id, [])
+        time = next((pending_time for pending_season, pending_episode, pending_time, _ in pending
+                     if (pending_season, pending_episode) == (season, episode)), 0)
     if time:
-        if show_kind == 'film':
-            user.reached[show_id]['t'] = time
-        else:
-            user.reached[show_id]['t'][season][episode] = time
+        # An explicit position wins over anything still buffered for that episode
+        heartbeats.discard(user.id, show_id, season, episode)
+        # Single upsert instead of rewriting the whole user row
+        Progress.objects.bulk_create(
+            [Progress(user=user, show_id=show_id, season=season,
+                      episode=episode, time=time, updated=now)],
+            update_conflicts=True,
+            unique_fields=['user', 'show', 'season', 'episode'],
+            update_fields=['time', 'updated'])
     else:
-        if show_kind == 'film':
-            time = user.reached[show_id]['t']
-        else:
-            time = user.reached[show_id]['t'][season][episode]
-    user.save()
-    return season, episode, time
+        # Read and write in one transaction, which takes the write lock up front
+        with transaction.atomic(using=router.db_for_write(Progress)):
+            progress, created = Progress.objects.get_or_create(
+                user=user, show_id=show_id, season=season, episode=episode, defaults={'updated': now})
+            if not created:
+                Progress.objects.filter(pk=progress.pk).update(updated=now)
+        time = progress.time
+    catalog_cache.bump(USER_STATE, [user.id])
+    return str(season), str(episode), time
+
+def logView(user, show_id):
+    now = timezone.now()
+    # One short write transaction, after the response data is built
+    with transaction.atomic(using=router.db_for_write(HistoryEntry)):
+        HistoryEntry.objects.create(user=user, show_id=show_id, viewed_at=now)
+        RecentView.objects.bulk_create(
+            [RecentView(user=user, show_id=show_id, viewed_at=now)],
+            update_conflicts=True,
+            unique_fields=['user', 'show'],
+            update_fields=['viewed_at'])
+        # Keep the recent views bounded; at most one row falls off per view
+        stale = list(RecentView.objects.filter(user=user).order_by(
+            '-viewed_at').values_list('pk', flat=True)[settings.RECENT_VIEWS_LIMIT:])
+        if stale:
+            RecentView.objects.filter(pk__in=stale).delete()
 
 from rest_framework import status
 from rest_framework.response import Response
@@ -0,0 +1,235 @@
+import contextlib
+import json
+import re
+import time
+import tracemalloc
+from pathlib import Path
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import URLResolver, get_resolver
+from django.utils import timezone
+from knox.models import AuthToken
+from rest_framework.test import APIClient
+from shows.heartbeats import heartbeats
+from shows.models import Artist, Country, Genre, HistoryEntry, Label, Language, Progress, Rating, Show
+from shows.prefetch import QueryCounter
+User = get_user_model()
+
+# Writes that only touch the benchmark user's own state: url name -> (method, body(iteration))
+WRITES = {
+    'users-current': ('patch', lambda i: {'shows_per_page': 10}),
+    'show-heartbeat': ('post', lambda i: {'season': 1, 'episode': 1, 'time_reached': i, 'seq': i}),
+    'show-update-time-reached': ('post', lambda i: {'season': 1, 'episode': 1, 'time_reached': i}),
+    'show-first-episode': ('post', lambda i: {}),
+    'show-next-episode': ('post', lambda i: {'season': 1, 'episode': 1}),
+    'show-previous-episode': ('post', lambda i: {'season': 1, 'episode': 2}),
+    'show-last-episode': ('post', lambda i: {}),
+    'show-jump-to-episode': ('post', lambda i: {'season': 1, 'episode': 2}),
+    'show-toggleFavorite': ('post', lambda i: {}),
+    'show-toggleWatchlist': ('post', lambda i: {}),
+    'show-mark-as-unwatched': ('post', lambda i: {}),
+}
+# Routes that are never requested, with why
+SKIPPED = {
+    'login-list': 'queues a login email',
+    'register-list': 'creates users',
+    'knox_login': 'creates tokens',
+    'knox_logout': 'revokes the benchmark token',
+    'knox_logoutall': 'revokes the benchmark token',
+    'reset-password-request': 'sends emails',
+    'reset-password-validate': 'needs a reset token',
+    'reset-password-confirm': 'needs a reset token',
+}
+PLACEHOLDER = re.compile(r'\(\?P<(\w+)>[^)]*\)|<(?:\w+:)?(\w+)>')
+
+
+def routes(patterns, prefix=''):
+    # (route, pattern) of every endpoint; format suffixes, API root pages and the admin left out
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if route.startswith('admin/') or 'format>' in route or getattr(pattern, 'name', None) == 'api-root':
+            continue
+        if isinstance(pattern, URLResolver):
+            yield from routes(pattern.url_patterns, route)
+        else:
+            yield route, pattern
+
+
+def template(route):
+    # 'shows/^(?P<pk>[^/.]+)/heartbeat/$' -> 'shows/{pk}/heartbeat/'
+    return PLACEHOLDER.sub(lambda match: '{%s}' % (match.group(1) or match.group(2)), route).replace('^', '').replace('$', '')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = ('Times every API route with the test client against the configured database, recording query counts, '
+            'latency percentiles and peak memory as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30, help='Timed requests per route')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per route before, to fill caches')
+        parser.add_argument('--filter', default='', help='Only routes containing this text')
+        parser.add_argument('--username', default='benchmark', help='User the requests are made as; created if missing')
+        parser.add_argument('--query', help="Search and typeahead query; the requested show's name by default")
+        parser.add_argument('--output', help='JSON file for the results; data/benchmarks/<time>.json by default')
+        parser.add_argument('--compare', help='Earlier results to check these against')
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help='A route regressed when its p50 grew by this factor (and at least 1 ms)')
+
+    def handle(self, *args, **options):
+        user, created = User.objects.get_or_create(username=options['username'], defaults={
+            'email': f'{options["username"]}@example.com'})
+        token = AuthToken.objects.create(user)[1]
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        kwargs = self.kwargs(user, options['query'])
+
+        results, skipped = {}, {}
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']):
+                for route, pattern in routes(get_resolver().url_patterns):
+                    for method, body in self.requests(pattern):
+                        name = f'{method.upper()} /{template(route)}'
+                        if options['filter'] not in name:
+                            continue
+                        if pattern.name in SKIPPED:
+                            skipped[name] = SKIPPED[pattern.name]
+                            continue
+                        url = '/' + PLACEHOLDER.sub(lambda match: str(kwargs(pattern, match.group(1) or match.group(2))),
+                                                    route).replace('^', '').replace('$', '')
+                        results[name] = self.measure(client, method, url, body, options['warmup'], options['repeat'])
+                        self.stdout.write(self.line(name, results[name]))
+        finally:
+            heartbeats.flush()
+            AuthToken.objects.filter(user=user).delete()
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'database': connections['default'].vendor,
+            'dataset': {model._meta.label: model._base_manager.count()
+                        for model in (Show, Artist, User, Progress, HistoryEntry)},
+            'repeat': options['repeat'],
+            'results': results,
+            'skipped': skipped,
+        }
+        output = Path(options['output'] or
+                      settings.BASE_DIR.parent / 'data' / 'benchmarks' / f'{timezone.now():%Y%m%d-%H%M%S}.json')
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} routes timed, {len(skipped)} skipped; results in {output}'))
+
+        if options['compare']:
+            self.compare(options['compare'], results, options['threshold'])
+
+    def requests(self, pattern):
+        # (method, body) of the requests made to a route
+        callback = pattern.callback
+        actions = getattr(callback, 'actions', None)
+        view_class = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+        if actions is not None:
+            methods = set(actions)
+        elif view_class is not None:
+            methods = {method for method in ('get', 'post') if hasattr(view_class, method)}
+        else:
+            # static() and media routes
+            return []
+        found = [('get', None)] if 'get' in methods else []
+        if pattern.name in WRITES and WRITES[pattern.name][0] in methods:
+            found.append(WRITES[pattern.name])
+        elif not found and pattern.name in SKIPPED:
+            found.append((sorted(methods)[0], None))
+        return found
+
+    def kwargs(self, user, query):
+        # The object a route is requested for: the busiest of its kind, a series for the shows, the user itself
+        chosen = {
+            Show: Show.objects.filter(kind='series').order_by('-id').values_list('id', flat=True).first()
+            or Show.objects.values_list('id', flat=True).first(),
+            User: user.id,
+        }
+        query = query or Show.objects.filter(id=chosen[Show]).values_list('name', flat=True).first() or 'show'
+        for model in (Artist, Country, Genre, Label, Language, Rating):
+            chosen[model] = model.objects.order_by('-shows_count').values_list('id', flat=True).first()
+
+        def value(pattern, name):
+            if name == 'query':
+                return query
+            view_class = getattr(pattern.callback, 'cls', None)
+            model = getattr(getattr(view_class, 'queryset', None), 'model', None)
+            if chosen.get(model) is None:
+                raise CommandError(f'There is no {model._meta.verbose_name} to request {pattern.name} for; '
+                                   'run generate_catalog first.')
+            return chosen[model]
+        return value
+
+    def measure(self, client, method, url, body, warmup, repeat):
+        def request(iteration):
+            data = body(iteration) if body else None
+            return getattr(client, method)(url, data, format='json' if data is not None else None)
+
+        start = time.perf_counter()
+        response = request(0)
+        first = time.perf_counter() - start
+        for iteration in range(1, warmup):
+            request(iteration)
+
+        timings, queries = [], []
+        for iteration in range(warmup, warmup + repeat):
+            counter = QueryCounter()
+            # Counted on every database, the activity and replica ones included
+            with contextlib.ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(counter))
+                start = time.perf_counter()
+                response = request(iteration)
+                timings.append(time.perf_counter() - start)
+            queries.append(counter.count)
+
+        # One more request for the memory, since tracing slows everything down
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            request(warmup + repeat)
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+        return {
+            'url': url,
+            'status': response.status_code,
+            'first_ms': round(first * 1000, 2),
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'mean_ms': round(sum(timings) / len(timings) * 1000, 2),
+            'queries': max(queries),
+            'peak_memory_kib': round(peak / 1024, 1),
+        }
+
+    def line(self, name, result):
+        return (f'{name:55} {result["status"]:>4} p50 {result["p50_ms"]:8.2f} ms  p95 {result["p95_ms"]:8.2f} ms  '
+                f'{result["queries"]:>3} queries  {result["peak_memory_kib"]:>8} KiB')
+
+    def compare(self, path, results, threshold):
+        with open(path) as file:
+            baseline = json.load(file)['results']
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result['queries'] > before['queries']:
+                regressions.append(f'{name}: {before["queries"]} -> {result["queries"]} queries')
+            if result['p50_ms'] > before['p50_ms'] * threshold and result['p50_ms'] - before['p50_ms'] >= 1:
+                regressions.append(f'{name}: p50 {before["p50_ms"]} -> {result["p50_ms"]} ms')
+            if result['status'] != before['status']:
+                regressions.append(f'{name}: status {before["status"]} -> {result["status"]}')
+        if regressions:
+            raise CommandError('Regressed against ' + path + ':\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {path}.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from shows.cache import catalog_cache
+
+
+class Command(BaseCommand):
+    help = 'Shows the hits and misses of the catalog cache across all workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Start counting again after showing them')
+
+    def handle(self, *args, **options):
+        stats = catalog_cache.stats()
+        ratio = 'n/a' if stats['hit_ratio'] is None else f"{stats['hit_ratio']:.1%}"
+        self.stdout.write(f"Hits: {stats['hits']}  Misses: {stats['misses']}  Hit ratio: {ratio}")
+        if options['reset']:
+            catalog_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+from shows.models import HistoryEntry, RecentView
+
+
+class Command(BaseCommand):
+    help = 'Applies the viewing history retention and compaction policy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=settings.HISTORY_RETENTION.days,
+                            help='Delete history entries older than this many days')
+        parser.add_argument('--window-minutes', type=int,
+                            default=int(settings.HISTORY_COMPACTION_WINDOW.total_seconds() // 60),
+                            help='Merge repeated views of the same show within this many minutes')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Retention: entries past the retention period are dropped
+        cutoff = timezone.now() - timezone.timedelta(days=options['retention_days'])
+        expired, _ = HistoryEntry.objects.filter(viewed_at__lt=cutoff).delete()
+
+        # Compaction: keep only the first of repeated views of a show inside the window
+        window = timezone.timedelta(minutes=options['window_minutes'])
+        merged, stale, last = 0, [], None
+        entries = HistoryEntry.objects.order_by('user_id', 'show_id', 'viewed_at').values_list(
+            'id', 'user_id', 'show_id', 'viewed_at')
+        for entry_id, user_id, show_id, viewed_at in entries.iterator(chunk_size=batch_size):
+            if last and last[:2] == (user_id, show_id) and viewed_at - last[2] < window:
+                stale.append(entry_id)
+            else:
+                last = (user_id, show_id, viewed_at)
+            if len(stale) >= batch_size:
+                merged += HistoryEntry.objects.filter(id__in=stale).delete()[0]
+                stale = []
+        if stale:
+            merged += HistoryEntry.objects.filter(id__in=stale).delete()[0]
+
+        # Recent views are trimmed on write; this catches users left above the limit
+        trimmed = 0
+        limit = settings.RECENT_VIEWS_LIMIT
+        for user_id in RecentView.objects.values('user_id').annotate(views=Count('id')).filter(
+                views__gt=limit).values_list('user_id', flat=True):
+            extra = list(RecentView.objects.filter(user_id=user_id).order_by(
+                '-viewed_at').values_list('id', flat=True)[limit:])
+            trimmed += RecentView.objects.filter(id__in=extra).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {expired} expired and {merged} repeated history entries, trimmed {trimmed} recent views.'))
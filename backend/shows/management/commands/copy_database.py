@@ -0,0 +1,105 @@
+import contextlib
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+
+SOURCE = 'sqlite_source'
+
+
+def dependency_order(models):
+    # Models after the ones their foreign keys point to
+    ordered, pending = [], list(models)
+    while pending:
+        ready = [model for model in pending if all(
+            field.related_model in ordered or field.related_model is model or field.related_model not in pending
+            for field in model._meta.concrete_fields if field.many_to_one or field.one_to_one)]
+        if not ready:
+            raise CommandError(f'Circular foreign keys between {", ".join(model._meta.label for model in pending)}')
+        ordered += ready
+        pending = [model for model in pending if model not in ready]
+    return ordered
+
+
+@contextlib.contextmanager
+def original_timestamps(models):
+    # bulk_create would stamp auto_now and auto_now_add fields with the time of the copy
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    flags = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in flags:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def copy_rows(model, source, target, batch_size):
+    # Copies the rows of a model between databases with their ids; returns how many
+    copied, batch = 0, []
+    for row in model._base_manager.using(source).order_by(model._meta.pk.name).iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) == batch_size:
+            model._base_manager.using(target).bulk_create(batch)
+            copied += len(batch)
+            batch = []
+    model._base_manager.using(target).bulk_create(batch)
+    return copied + len(batch)
+
+
+def reset_sequences(alias, models):
+    # Ids were copied as they are, so the sequences start after them
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+class Command(BaseCommand):
+    help = 'Copies every row of the SQLite database into the configured databases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=str(settings.SQLITE_DATABASE['NAME']),
+                            help='SQLite file to copy from')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--no-input', action='store_false', dest='interactive')
+
+    def handle(self, *args, **options):
+        target = connections[DEFAULT_DB_ALIAS]
+        if target.vendor == 'sqlite':
+            raise CommandError('The default database is SQLite; set DB_ENGINE=postgresql first')
+        connections.settings[SOURCE] = connections.configure_settings(
+            {DEFAULT_DB_ALIAS: {**settings.SQLITE_DATABASE, 'NAME': options['source']}})[DEFAULT_DB_ALIAS]
+
+        models = dependency_order([model for model in apps.get_models(include_auto_created=True)
+                                   if model._meta.managed and not model._meta.proxy])
+        # Every model goes where the routers put it, so user activity lands in its own database if there is one
+        targets = {}
+        for model in models:
+            targets.setdefault(router.db_for_write(model), []).append(model)
+        if options['interactive'] and input(
+                f'Every table of the {", ".join(targets)} database(s) will be emptied and filled from the '
+                'SQLite file. Type "yes" to continue: ') != 'yes':
+            raise CommandError('Copy cancelled.')
+
+        for alias in targets:
+            call_command('migrate', database=alias, interactive=False, verbosity=0)
+            # Content types and permissions made by the migrations are replaced by the source's, ids included
+            call_command('flush', database=alias, interactive=False, inhibit_post_migrate=True, verbosity=0)
+
+        batch_size = options['batch_size']
+        with contextlib.ExitStack() as stack:
+            for alias in targets:
+                stack.enter_context(transaction.atomic(using=alias))
+            stack.enter_context(original_timestamps(models))
+            for model in models:
+                copied = copy_rows(model, SOURCE, router.db_for_write(model), batch_size)
+                self.stdout.write(f'{model._meta.label}: {copied} rows')
+            for alias, alias_models in targets.items():
+                reset_sequences(alias, alias_models)
+        connections[SOURCE].close()
+        self.stdout.write(self.style.SUCCESS(f'Copied {len(models)} tables from {options["source"]}.'))
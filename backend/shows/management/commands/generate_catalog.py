@@ -0,0 +1,233 @@
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from shows import counts, search
+from shows.cache import catalog_cache
+from shows.models import (Artist, Country, Favorite, Genre, HistoryEntry, Label, Language, Progress, Rating,
+                          RecentView, Show, WatchlistEntry)
+User = get_user_model()
+
+COUNTRIES = ['Egypt', 'United States', 'United Kingdom', 'France', 'Germany', 'Italy', 'Spain', 'Japan', 'South Korea',
+             'India', 'Brazil', 'Mexico', 'Canada', 'Australia', 'Turkey', 'Morocco', 'Nigeria', 'Sweden', 'Denmark',
+             'Norway', 'Argentina', 'China', 'Iran', 'Lebanon', 'Poland', 'Russia', 'Ireland', 'Belgium', 'Greece',
+             'Portugal']
+LANGUAGES = ['Arabic', 'English', 'French', 'German', 'Italian', 'Spanish', 'Japanese', 'Korean', 'Hindi',
+             'Portuguese', 'Turkish', 'Swedish', 'Danish', 'Norwegian', 'Mandarin', 'Persian', 'Polish', 'Russian',
+             'Greek', 'Dutch']
+GENRES = ['Drama', 'Comedy', 'Action', 'Thriller', 'Horror', 'Romance', 'Documentary', 'Animation', 'Crime',
+          'Mystery', 'Fantasy', 'Science Fiction', 'Adventure', 'Family', 'History', 'War', 'Western', 'Musical',
+          'Biography', 'Sport']
+RATINGS = ['G', 'PG', 'PG-13', 'R', 'NC-17', 'TV-MA']
+LABELS = ['Classic', 'Award Winner', 'Cult', 'Festival', 'Indie', 'Blockbuster', 'Remastered', 'Director\'s Cut',
+          'Limited Series', 'Staff Pick']
+ADJECTIVES = ['Silent', 'Crimson', 'Last', 'Hidden', 'Broken', 'Golden', 'Endless', 'Wild', 'Forgotten', 'Burning',
+              'Frozen', 'Midnight', 'Lost', 'Distant', 'Bright', 'Dark', 'Hollow', 'Restless', 'Secret', 'Northern',
+              'Electric', 'Quiet', 'Savage', 'Eternal', 'Fallen', 'Velvet', 'Iron', 'Paper', 'Glass', 'Southern']
+NOUNS = ['River', 'Empire', 'Garden', 'Road', 'City', 'Harbor', 'Kingdom', 'Storm', 'Shadow', 'Mirror', 'Desert',
+         'Island', 'Station', 'Letter', 'Promise', 'Horizon', 'Frontier', 'Orchard', 'Tide', 'Lantern', 'Signal',
+         'Winter', 'Summer', 'Bridge', 'House', 'Witness', 'Dream', 'Circle', 'Valley', 'Engine']
+FIRST_NAMES = ['Youssef', 'Amira', 'John', 'Maria', 'Omar', 'Sara', 'Liam', 'Emma', 'Karim', 'Nour', 'Hiro', 'Yuki',
+               'Pierre', 'Claire', 'Lukas', 'Anna', 'Diego', 'Lucia', 'Ravi', 'Priya', 'Min-jun', 'Ji-woo', 'Ahmed',
+               'Laila', 'Noah', 'Olivia', 'Mateo', 'Sofia', 'Elif', 'Can']
+LAST_NAMES = ['Hassan', 'Smith', 'Garcia', 'Tanaka', 'Martin', 'Muller', 'Rossi', 'Kim', 'Patel', 'Silva', 'Ibrahim',
+              'Johnson', 'Dubois', 'Schmidt', 'Lopez', 'Sato', 'Lee', 'Sharma', 'Costa', 'Yilmaz', 'Nasser',
+              'Brown', 'Moreau', 'Fischer', 'Romano', 'Park', 'Singh', 'Santos', 'Demir', 'Khalil']
+WORDS = ['family', 'secret', 'journey', 'city', 'love', 'war', 'detective', 'village', 'memory', 'island', 'brothers',
+         'sisters', 'truth', 'revenge', 'friendship', 'storm', 'crime', 'music', 'dream', 'escape', 'past', 'future',
+         'night', 'letter', 'home', 'stranger', 'heist', 'kingdom', 'doctor', 'teacher', 'summer', 'winter']
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with a synthetic catalog and user activity, for benchmarks and load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shows', type=int, default=10000)
+        parser.add_argument('--artists', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--artists-per-show', type=int, default=8, help='Average cast size')
+        parser.add_argument('--favorites', type=int, default=20, help='Average favorites per user')
+        parser.add_argument('--watchlist', type=int, default=15, help='Average watchlist entries per user')
+        parser.add_argument('--progress', type=int, default=60, help='Average progress rows (watched episodes) per user')
+        parser.add_argument('--history', type=int, default=200, help='Average history entries per user')
+        parser.add_argument('--password', default='synthetic', help='Password of every generated user')
+        parser.add_argument('--user-prefix', default='viewer', help='Generated usernames are <prefix><n>')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+
+        taxonomy = self.taxonomy()
+        artist_ids = self.artists(options['artists'], taxonomy['countries'])
+        self.shows(options['shows'], taxonomy, artist_ids, options['artists_per_show'])
+        # Users watch every show, generated or not
+        show_ids = list(Show.objects.values_list('id', flat=True))
+        if options['users'] and not show_ids:
+            raise CommandError('There are no shows for the users to watch.')
+        self.users(options, taxonomy['countries'], show_ids)
+
+        # Rows were inserted in bulk, without the signals that keep these up to date
+        self.stdout.write('Recounting relations and rebuilding the search index...')
+        counts.refresh_all()
+        search.rebuild()
+        catalog_cache.cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {options["shows"]} shows, {options["artists"]} artists and {options["users"]} users. '
+            'Running workers pick up the new names for suggestions within TYPEAHEAD_MAX_AGE.'))
+
+    # ----- Helpers -----
+    def count(self, low, average):
+        # Around average, at least low
+        return max(low, round(self.random.expovariate(1 / average))) if average else 0
+
+    def sample(self, population, size):
+        return self.random.sample(population, min(size, len(population)))
+
+    def created(self, model, rows):
+        # bulk_create in batches; returns the ids of the new rows
+        ids = []
+        for start in range(0, len(rows), self.batch_size):
+            batch = model.objects.bulk_create(rows[start:start + self.batch_size])
+            ids += [row.pk for row in batch]
+        if ids and ids[0] is None:
+            raise CommandError(f'The database does not return the ids of bulk inserted {model._meta.verbose_name_plural}.')
+        return ids
+
+    def linked(self, through, rows):
+        for start in range(0, len(rows), self.batch_size):
+            through.objects.bulk_create(rows[start:start + self.batch_size], ignore_conflicts=True)
+        rows.clear()
+
+    def sentence(self, words):
+        return ' '.join(self.random.choices(WORDS, k=words)).capitalize() + '.'
+
+    # ----- Catalog -----
+    def taxonomy(self):
+        # The same small vocabularies every time, created once
+        def named(model, names):
+            existing = dict(model.objects.filter(name__in=names).values_list('name', 'id'))
+            missing = [model(name=name) for name in names if name not in existing]
+            return list(existing.values()) + self.created(model, missing)
+        taxonomy = {
+            'languages': named(Language, LANGUAGES),
+            'countries': named(Country, COUNTRIES),
+            'genres': named(Genre, GENRES),
+            'ratings': named(Rating, RATINGS),
+            'labels': named(Label, LABELS),
+        }
+        self.linked(Country.languages.through, [
+            Country.languages.through(country_id=country_id, language_id=language_id)
+            for country_id in taxonomy['countries'] for language_id in self.sample(taxonomy['languages'], 2)])
+        return taxonomy
+
+    def artists(self, number, country_ids):
+        self.stdout.write(f'Generating {number} artists...')
+        return self.created(Artist, [Artist(
+            name=f'{self.random.choice(FIRST_NAMES)} {self.random.choice(LAST_NAMES)}',
+            birthYear=self.random.randint(1930, 2005),
+            nationality_id=self.random.choice(country_ids),
+            description=self.sentence(12),
+        ) for _ in range(number)])
+
+    def episodes(self, kind):
+        # {season: episodes}; films have none
+        if kind == 'film':
+            return {}
+        seasons, low, high = (self.random.randint(1, 8), 6, 24) if kind == 'series' else (self.random.randint(1, 3), 20, 60)
+        return {str(season): self.random.randint(low, high) for season in range(1, seasons + 1)}
+
+    def shows(self, number, taxonomy, artist_ids, artists_per_show):
+        self.stdout.write(f'Generating {number} shows...')
+        if not artist_ids:
+            artist_ids = list(Artist.objects.values_list('id', flat=True))
+        for start in range(0, number, self.batch_size):
+            rows = []
+            for _ in range(min(self.batch_size, number - start)):
+                kind = self.random.choices(['film', 'series', 'program'], [55, 35, 10])[0]
+                name = f'The {self.random.choice(ADJECTIVES)} {self.random.choice(NOUNS)}'
+                if self.random.random() < 0.3:
+                    name += f' {self.random.choice(["II", "III", "Returns", "Rising", "Chronicles"])}'
+                rows.append(Show(
+                    name=name, year=str(self.random.randint(1950, self.now.year)), kind=kind,
+                    captions=self.random.random() < 0.6, description=self.sentence(30),
+                    rating_id=self.random.choice(taxonomy['ratings']), episodes=self.episodes(kind),
+                    finalized=True,
+                ))
+            ids = self.created(Show, rows)
+            links = {field: [] for field in ('countries', 'languages', 'genres', 'labels', 'artists')}
+            for show_id in ids:
+                for field, targets, size in (
+                        ('countries', taxonomy['countries'], self.count(1, 1.5)),
+                        ('languages', taxonomy['languages'], self.count(1, 1.5)),
+                        ('genres', taxonomy['genres'], self.count(1, 2.5)),
+                        ('labels', taxonomy['labels'], self.count(0, 0.7)),
+                        ('artists', artist_ids, self.count(1, artists_per_show))):
+                    field = getattr(Show, field).field
+                    links[field.name] += [field.remote_field.through(**{
+                        f'{field.m2m_field_name()}_id': show_id, f'{field.m2m_reverse_field_name()}_id': target,
+                    }) for target in self.sample(targets, size)]
+            for field, rows in links.items():
+                self.linked(getattr(Show, field).through, rows)
+
+    # ----- Users and their activity -----
+    def users(self, options, country_ids, show_ids):
+        number = options['users']
+        if not number:
+            return
+        self.stdout.write(f'Generating {number} users and their activity...')
+        prefix = options['user_prefix']
+        first = User.objects.filter(username__startswith=prefix).count()
+        password = make_password(options['password'])
+        episodic = list(Show.objects.filter(id__in=show_ids).exclude(kind='film').values_list('id', 'episodes'))
+        for start in range(0, number, self.batch_size):
+            user_ids = self.created(User, [User(
+                username=f'{prefix}{n}', email=f'{prefix}{n}@example.com', password=password,
+                nationality_id=self.random.choice(country_ids), shows_per_page=self.random.choice([5, 10, 20]),
+            ) for n in range(first + start, first + min(start + self.batch_size, number))])
+            activity = {model: [] for model in (Favorite, WatchlistEntry, Progress, HistoryEntry, RecentView)}
+            for user_id in user_ids:
+                activity[Favorite] += [Favorite(user_id=user_id, show_id=show_id)
+                                       for show_id in self.sample(show_ids, self.count(0, options['favorites']))]
+                activity[WatchlistEntry] += [WatchlistEntry(user_id=user_id, show_id=show_id)
+                                             for show_id in self.sample(show_ids, self.count(0, options['watchlist']))]
+                activity[Progress] += self.progress(user_id, episodic, self.count(0, options['progress']))
+                history, recent = self.history(user_id, show_ids, self.count(0, options['history']))
+                activity[HistoryEntry] += history
+                activity[RecentView] += recent
+            for model, rows in activity.items():
+                self.linked(model, rows)
+
+    def progress(self, user_id, episodic, budget):
+        # Runs of episodes watched in order from the start of a few shows, the latest run most recently
+        rows = {}
+        moment = self.now - timedelta(days=365)
+        for _ in range(budget):
+            if len(rows) >= budget or not episodic:
+                break
+            show_id, episodes = self.random.choice(episodic)
+            order = [(int(season), episode) for season, count in sorted(episodes.items(), key=lambda item: int(item[0]))
+                     for episode in range(1, count + 1)]
+            for season, episode in order[:self.random.randint(1, budget - len(rows))]:
+                moment = min(moment + timedelta(minutes=self.random.randint(20, 600)), self.now)
+                rows[(show_id, season, episode)] = Progress(user_id=user_id, show_id=show_id, season=season,
+                                                            episode=episode, time=self.random.randint(60, 3000),
+                                                            updated=moment)
+        return list(rows.values())
+
+    def history(self, user_id, show_ids, size):
+        # (history entries, recent views): page views over the last year and the latest distinct ones
+        moments = sorted(self.now - timedelta(seconds=self.random.randint(0, 365 * 24 * 3600)) for _ in range(size))
+        entries = [HistoryEntry(user_id=user_id, show_id=self.random.choice(show_ids), viewed_at=moment)
+                   for moment in moments]
+        recent = {}
+        for entry in reversed(entries):
+            if len(recent) == settings.RECENT_VIEWS_LIMIT:
+                break
+            recent.setdefault(entry.show_id, RecentView(user_id=user_id, show_id=entry.show_id, viewed_at=entry.viewed_at))
+        return entries, list(recent.values())
@@ -0,0 +1,29 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from shows import renditions
+
+
+class Command(BaseCommand):
+    help = 'Makes the missing renditions of every uploaded image'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Make them again even where they exist')
+
+    def handle(self, *args, **options):
+        images = written = failed = 0
+        for model_name in renditions.MODELS:
+            model = apps.get_model(model_name)
+            fields = renditions.image_fields(model)
+            for instance in model.objects.only('id', *fields).iterator():
+                for name in fields:
+                    field_file = getattr(instance, name)
+                    if not field_file:
+                        continue
+                    images += 1
+                    try:
+                        written += renditions.generate(field_file, force=options['force'])
+                    except Exception as error:
+                        failed += 1
+                        self.stderr.write(f'{model_name} {instance.id} {name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {images} images, wrote {written} renditions, {failed} images failed.'))
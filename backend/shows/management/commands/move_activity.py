@@ -0,0 +1,38 @@
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from core.routers import ACTIVITY, ACTIVITY_MODELS
+from shows.management.commands.copy_database import copy_rows, original_timestamps, reset_sequences
+
+
+class Command(BaseCommand):
+    help = 'Moves the user activity rows from the default database to the activity database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--keep', action='store_true', help='Leave the rows in the default database')
+
+    def handle(self, *args, **options):
+        if ACTIVITY not in connections.settings:
+            raise CommandError('No activity database is configured; set ACTIVITY_DB first')
+        models = [apps.get_model(label) for label in sorted(ACTIVITY_MODELS)]
+        call_command('migrate', database=ACTIVITY, interactive=False, verbosity=0)
+        default = connections[DEFAULT_DB_ALIAS]
+        tables = default.introspection.table_names()
+        with transaction.atomic(using=ACTIVITY), original_timestamps(models):
+            for model in models:
+                if model._base_manager.using(ACTIVITY).exists():
+                    raise CommandError(f'{model._meta.db_table} already has rows in the activity database')
+                if model._meta.db_table not in tables:
+                    continue
+                copied = copy_rows(model, DEFAULT_DB_ALIAS, ACTIVITY, options['batch_size'])
+                self.stdout.write(f'{model._meta.label}: {copied} rows')
+            reset_sequences(ACTIVITY, models)
+        if not options['keep']:
+            # Only the activity database is read from now on
+            with transaction.atomic(using=DEFAULT_DB_ALIAS), default.cursor() as cursor:
+                for model in models:
+                    if model._meta.db_table in tables:
+                        cursor.execute(f'DELETE FROM {default.ops.quote_name(model._meta.db_table)}')
+        self.stdout.write(self.style.SUCCESS(f'Moved {len(models)} tables to the activity database.'))
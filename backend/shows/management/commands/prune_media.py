@@ -0,0 +1,85 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from shows import renditions
+from shows.storage import BLOBS, blob_hash
+
+
+class Command(BaseCommand):
+    help = 'Deletes the uploaded images and renditions no row refers to anymore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rehash', action='store_true',
+                            help='First move images saved under their old names to content-addressed ones')
+        parser.add_argument('--grace-minutes', type=int, default=int(settings.MEDIA_PRUNE_GRACE.total_seconds() // 60),
+                            help='Keep unreferenced files younger than this many minutes')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be deleted')
+
+    def images(self):
+        # (instance, field name) of every uploaded image
+        for model_name in renditions.MODELS:
+            model = apps.get_model(model_name)
+            fields = renditions.image_fields(model)
+            for instance in model.objects.only('id', *fields).iterator():
+                for name in fields:
+                    if getattr(instance, name):
+                        yield instance, name
+
+    def rehash(self, dry_run):
+        moved, legacy = 0, set()
+        for instance, name in self.images():
+            field_file = getattr(instance, name)
+            if blob_hash(field_file.name) is not None:
+                continue
+            if dry_run:
+                moved += 1
+                continue
+            legacy.add(field_file.name)
+            with field_file.storage.open(field_file.name, 'rb') as original:
+                new_name = field_file.storage.save(field_file.name, original)
+            setattr(instance, name, new_name)
+            # Saved through the model, so cached representations and the search index follow
+            instance.save(update_fields=[name])
+            renditions.generate(getattr(instance, name), force=False)
+            moved += 1
+        return moved, legacy
+
+    def walk(self, directory):
+        # Names of every file under a directory of the media storage
+        if not default_storage.exists(directory):
+            return
+        directories, files = default_storage.listdir(directory)
+        for file_name in files:
+            yield f'{directory}/{file_name}'
+        for subdirectory in directories:
+            yield from self.walk(f'{directory}/{subdirectory}')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        moved, legacy = self.rehash(dry_run) if options['rehash'] else (0, set())
+        referenced = {getattr(instance, name).name for instance, name in self.images()}
+        hashes = {blob_hash(name) for name in referenced} - {None}
+
+        deleted = 0
+        for name in legacy - referenced:
+            deleted += 1
+            default_storage.delete(name)
+            renditions.delete(name)
+
+        cutoff = timezone.now() - timezone.timedelta(minutes=options['grace_minutes'])
+        # Renditions are matched by the hash in their names, so the ones of a deleted blob go with it
+        unreferenced = [name for name in self.walk(BLOBS) if name not in referenced] + [
+            name for name in self.walk(f'{renditions.ROOT}/{BLOBS}')
+            if blob_hash(name.removeprefix(f'{renditions.ROOT}/')) not in hashes]
+        for name in unreferenced:
+            if default_storage.get_modified_time(name) > cutoff:
+                continue
+            deleted += 1
+            if not dry_run:
+                default_storage.delete(name)
+
+        verb = 'would be' if dry_run else 'were'
+        self.stdout.write(self.style.SUCCESS(
+            f'{moved} images {verb} moved to content-addressed names, {deleted} unreferenced files {verb} deleted.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand, CommandError
+from shows import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index from the database'
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('The search index is only available on SQLite with FTS5; searches use the fallback.')
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,362 @@
+import asyncio
+import contextlib
+import json
+import os
+import random
+import re
+import resource
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from knox.models import AuthToken
+from core.exceptions import DatabaseBusy
+from shows.models import Show
+from users.models import OutboxEmail
+from .benchmark import percentile
+User = get_user_model()
+
+# The tabs of the home page (Homepage.jsx)
+HOME_TABS = ('favorites', 'watchlist', 'new', 'history', 'random')
+CONFIGURATION = re.compile(r'^(wsgi|asgi):(\d+)$')
+LOCKED = 'database locked'
+LOGIN = 'POST /users/login/'
+
+
+class Connection:
+    # One keep-alive HTTP/1.1 connection per session, opened again whenever the server closes it
+    def __init__(self, host, port, timeout):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, token=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        head = [f'{method} {path} HTTP/1.1', f'Host: {self.host}', 'Accept: application/json',
+                f'Content-Length: {len(payload)}']
+        if body is not None:
+            head.append('Content-Type: application/json')
+        if token:
+            head.append(f'Authorization: Token {token}')
+        message = ('\r\n'.join(head) + '\r\n\r\n').encode() + payload
+        return await asyncio.wait_for(self._send(message), self.timeout)
+
+    async def _send(self, message):
+        # A kept-alive connection may have been closed by the server while the session was idle
+        reused = self.writer is not None
+        try:
+            return await self._exchange(message)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            if not reused:
+                raise
+        return await self._exchange(message)
+
+    async def _exchange(self, message):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(message)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b'', None)
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = b''
+            while size := int((await self.reader.readline()).split(b';')[0], 16):
+                body += await self.reader.readexactly(size)
+                await self.reader.readline()
+            await self.reader.readline()
+        else:
+            body = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Simulation:
+    '''
+    Viewers that log in, browse the home tabs, open shows and watch them,
+    reporting progress while they play and moving through the episodes, the
+    way the frontend drives the API. Every request is timed per endpoint.
+    '''
+
+    def __init__(self, host, port, usernames, show_ids, options):
+        self.host, self.port = host, port
+        self.usernames, self.show_ids = usernames, show_ids
+        self.options = options
+        self.latencies, self.errors = {}, {}
+
+    async def run(self):
+        options = self.options
+        sessions = options['sessions']
+        # Sessions start evenly over the ramp-up, so logins do not all arrive at once. Only logins are
+        # measured during it; everything else once every session is browsing.
+        self.started = time.monotonic()
+        self.measured_from = self.started + options['ramp_up']
+        self.stop = self.measured_from + options['duration']
+        await asyncio.gather(*(self.session(n, options['ramp_up'] * n / sessions) for n in range(sessions)))
+
+    async def session(self, n, delay):
+        await asyncio.sleep(delay)
+        connection = Connection(self.host, self.port, self.options['timeout'])
+        token = None
+        try:
+            while self.running():
+                try:
+                    if token is None:
+                        login = await self.call(connection, None, 'POST', '/users/login/', LOGIN, {
+                            'username': self.usernames[n % len(self.usernames)], 'password': self.options['password']})
+                        if login is None:
+                            await self.think()
+                            continue
+                        token = login['token']
+                    await self.browse(connection, token)
+                except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    # Counted by call(); the viewer reloads the home page after a while
+                    connection.close()
+                    await self.think()
+        finally:
+            connection.close()
+
+    async def browse(self, connection, token):
+        await self.call(connection, token, 'GET', '/users/current/', 'GET /users/current/')
+        found = []
+        for tab in random.sample(HOME_TABS, random.randint(1, 3)):
+            page = await self.call(connection, token, 'GET', f'/shows/{tab}/', f'GET /shows/{tab}/')
+            results = page.get('results', []) if isinstance(page, dict) else page or []
+            found += [show['id'] for show in results if isinstance(show, dict) and 'id' in show]
+            await self.think()
+        if not self.running():
+            return
+        show_id = random.choice(found or self.show_ids)
+        show = await self.call(connection, token, 'GET', f'/shows/{show_id}/', 'GET /shows/{pk}/')
+        if show is not None:
+            await self.watch(connection, token, show)
+
+    async def watch(self, connection, token, show):
+        options = self.options
+        show_id = show['id']
+        season, episode = show.get('season_reached') or 1, show.get('episode_reached') or 1
+        position = show.get('time_reached') or 0
+        for _ in range(random.randint(1, options['episodes'])):
+            for _ in range(options['heartbeats']):
+                await self.sleep(random.uniform(0.5, 1.5) * options['heartbeat_interval'])
+                if not self.running():
+                    return
+                position += options['heartbeat_interval']
+                progress = {'season': season, 'episode': episode, 'time_reached': int(position)}
+                if options['progress'] == 'heartbeat':
+                    progress['seq'] = time.time_ns() // 1000000
+                await self.call(connection, token, 'POST', f'/shows/{show_id}/{options["progress"]}/',
+                                f'POST /shows/{{pk}}/{options["progress"]}/', progress)
+            if show.get('kind') != 'series':
+                return
+            # Mostly on to the next episode once this one ends, sometimes back to the previous one
+            action = 'previous' if random.random() < options['previous'] else 'next'
+            changed = await self.call(connection, token, 'POST', f'/shows/{show_id}/{action}_episode/',
+                                      f'POST /shows/{{pk}}/{action}_episode/',
+                                      {'season': season, 'episode': episode, 'finished': action == 'next'})
+            if not changed or not changed.get('changed'):
+                return
+            season, episode = changed['new_season'], changed['new_episode']
+            position = changed.get('starting_time') or 0
+
+    async def call(self, connection, token, method, path, endpoint, body=None):
+        # The response's JSON, or None for an error, which is counted for the endpoint
+        start = time.monotonic()
+        if endpoint == LOGIN or start >= self.measured_from:
+            errors = self.errors.setdefault(endpoint, Counter())
+            latencies = self.latencies.setdefault(endpoint, [])
+        else:
+            errors, latencies = Counter(), []
+        try:
+            status, content = await connection.request(method, quote(path), body, token)
+        except asyncio.TimeoutError:
+            connection.close()
+            errors['timeout'] += 1
+            raise
+        except (OSError, asyncio.IncompleteReadError) as exc:
+            errors[type(exc).__name__] += 1
+            raise
+        latencies.append(time.monotonic() - start)
+        if status == DatabaseBusy.status_code and str(DatabaseBusy.default_detail).encode() in content:
+            errors[LOCKED] += 1
+        elif status >= 400:
+            errors[str(status)] += 1
+        else:
+            return json.loads(content) if content else {}
+        return None
+
+    def running(self):
+        return time.monotonic() < self.stop
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(max(0, min(seconds, self.stop - time.monotonic())))
+
+    async def think(self):
+        await self.sleep(random.expovariate(1 / self.options['think_time']))
+
+    def report(self):
+        endpoints = {}
+        measured = self.stop - self.measured_from
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            latencies, errors = self.latencies.get(endpoint, []), self.errors.get(endpoint, Counter())
+            requests = len(latencies) + sum(count for error, count in errors.items() if not error.isdigit()
+                                            and error != LOCKED)
+            elapsed = self.stop - self.started if endpoint == LOGIN else measured
+            endpoints[endpoint] = {
+                'requests': requests,
+                'per_second': round(requests / elapsed, 1),
+                'p50_ms': round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+                'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+                'max_ms': round(max(latencies) * 1000, 1) if latencies else None,
+                'error_rate': round(sum(errors.values()) / requests, 4) if requests else 0,
+                'errors': dict(errors),
+            }
+        # Totals are for the measured window, so without the ramp-up's logins
+        requests = sum(stats['requests'] for endpoint, stats in endpoints.items() if endpoint != LOGIN)
+        return {
+            'requests': requests,
+            'per_second': round(requests / measured, 1),
+            'errors': sum(sum(stats['errors'].values()) for endpoint, stats in endpoints.items() if endpoint != LOGIN),
+            'database_locked': sum(stats['errors'].get(LOCKED, 0) for stats in endpoints.values()),
+            'endpoints': endpoints,
+        }
+
+
+class Command(BaseCommand):
+    help = ('Drives a server with concurrent simulated viewers and reports throughput, tail latency and errors, '
+            'database locks included, per endpoint and server configuration')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server to load, unless --serve is given')
+        parser.add_argument('--serve', nargs='+', metavar='MODE:WORKERS',
+                            help='Start gunicorn (gunicorn.conf.py) in each configuration in turn and load it, '
+                                 'e.g. wsgi:4 asgi:4')
+        parser.add_argument('--port', type=int, default=8765, help='Port of the servers started by --serve')
+        parser.add_argument('--sessions', type=int, default=1000, help='Concurrent viewers')
+        parser.add_argument('--duration', type=float, default=60,
+                            help='Seconds of load measured per configuration, after the ramp-up')
+        parser.add_argument('--ramp-up', type=float, default=60,
+                            help='Seconds over which the sessions start and log in')
+        parser.add_argument('--think-time', type=float, default=2, help='Average seconds between page views')
+        parser.add_argument('--progress', choices=['heartbeat', 'update_time_reached'], default='heartbeat',
+                            help='Endpoint a playing video reports progress to')
+        parser.add_argument('--heartbeat-interval', type=float, default=5, help='Seconds between progress reports')
+        parser.add_argument('--heartbeats', type=int, default=6, help='Progress reports per episode watched')
+        parser.add_argument('--episodes', type=int, default=3, help='Most episodes watched per show opened')
+        parser.add_argument('--previous', type=float, default=0.1,
+                            help='Share of episode changes that go back to the previous episode')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request counts as failed')
+        parser.add_argument('--user-prefix', default='viewer', help='Sessions log in as the users generate_catalog made')
+        parser.add_argument('--password', default='synthetic')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='JSON file for the results; data/benchmarks/load-<time>.json by default')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        usernames = list(User.objects.filter(username__startswith=options['user_prefix'])
+                         .order_by('id').values_list('username', flat=True)[:options['sessions']])
+        show_ids = list(Show.objects.values_list('id', flat=True))
+        if not usernames or not show_ids:
+            raise CommandError(f'There are no {options["user_prefix"]}* users or no shows; run generate_catalog first.')
+        # Every session holds a connection
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < options['sessions'] + 100:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+        if options['serve']:
+            configurations = []
+            for configuration in options['serve']:
+                match = CONFIGURATION.match(configuration)
+                if match is None:
+                    raise CommandError(f'{configuration} is not MODE:WORKERS with MODE wsgi or asgi')
+                configurations.append((configuration, match.group(1), int(match.group(2))))
+            host, port = '127.0.0.1', options['port']
+        else:
+            url = urlsplit(options['url'])
+            configurations = [(options['url'], None, None)]
+            host, port = url.hostname, url.port or 80
+
+        started = timezone.now()
+        results = {}
+        try:
+            for name, mode, workers in configurations:
+                self.stdout.write(f'{name}: {options["sessions"]} sessions, {options["ramp_up"]:g} s ramp-up, '
+                                  f'{options["duration"]:g} s measured')
+                with self.server(mode, workers, port, options['verbosity']) if mode else contextlib.nullcontext():
+                    simulation = Simulation(host, port, usernames, show_ids, options)
+                    asyncio.run(simulation.run())
+                    results[name] = simulation.report()
+                self.write_report(results[name])
+        finally:
+            # The logins' tokens and notification emails
+            users = User.objects.filter(username__in=usernames)
+            AuthToken.objects.filter(user__in=users, created__gte=started).delete()
+            OutboxEmail.objects.filter(to__in=users.values('email'), created__gte=started, sent=None).delete()
+
+        output = Path(options['output'] or
+                      settings.BASE_DIR.parent / 'data' / 'benchmarks' / f'load-{timezone.now():%Y%m%d-%H%M%S}.json')
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w') as file:
+            json.dump({
+                'created': started.isoformat(),
+                'options': {name: options[name] for name in (
+                    'sessions', 'duration', 'ramp_up', 'think_time', 'progress', 'heartbeat_interval', 'heartbeats',
+                    'episodes', 'previous', 'seed')},
+                'configurations': results,
+            }, file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results in {output}'))
+
+    @contextlib.contextmanager
+    def server(self, mode, workers, port, verbosity):
+        output = None if verbosity > 1 else subprocess.DEVNULL
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+             '--workers', str(workers)],
+            cwd=settings.BASE_DIR, env={**os.environ, 'SERVER_MODE': mode}, stdout=output, stderr=output)
+        try:
+            deadline = time.monotonic() + 60
+            while True:
+                if process.poll() is not None:
+                    raise CommandError(f'gunicorn exited with {process.returncode}; run with -v 2 to see why')
+                with contextlib.suppress(OSError), socket.create_connection(('127.0.0.1', port), timeout=1):
+                    break
+                if time.monotonic() > deadline:
+                    raise CommandError(f'gunicorn is not listening on port {port} after 60 s')
+                time.sleep(0.2)
+            yield
+        finally:
+            process.terminate()
+            try:
+                process.wait(30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def write_report(self, result):
+        self.stdout.write(f'  {result["requests"]} requests, {result["per_second"]} per second, '
+                          f'{result["errors"]} errors ({result["database_locked"]} database locked)')
+        for endpoint, stats in result['endpoints'].items():
+            latency = (f'p50 {stats["p50_ms"]:8.1f}  p95 {stats["p95_ms"]:8.1f}  p99 {stats["p99_ms"]:8.1f} ms'
+                       if stats['p50_ms'] is not None else ' ' * 42)
+            errors = ', '.join(f'{error}: {count}' for error, count in sorted(stats['errors'].items()))
+            self.stdout.write(f'  {endpoint:42} {stats["requests"]:>7} {stats["per_second"]:>7}/s  {latency}  '
+                              f'{stats["error_rate"]:6.1%}  {errors}')
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:20
+
+import datetime
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models, router
+
+import shows.operations
+
+
+def _to_int(value, default=0):
+    try:
+        return max(int(float(value)), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+def reached_to_progress(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    # Runs where the users are; an activity database gets its rows from move_activity
+    if not router.allow_migrate_model(schema_editor.connection.alias, User):
+        return
+    Show = apps.get_model('shows', 'Show')
+    Progress = apps.get_model('shows', 'Progress')
+    show_ids = set(Show.objects.values_list('id', flat=True))
+    now = django.utils.timezone.now()
+    before = now - datetime.timedelta(seconds=1)
+    rows = []
+    for user in User.objects.exclude(reached={}).only('id', 'reached').iterator():
+        for show_id, reached in (user.reached or {}).items():
+            show_id = _to_int(show_id, None)
+            if show_id not in show_ids or not isinstance(reached, dict):
+                continue
+            current = (_to_int(reached.get('s'), 1) or 1, _to_int(reached.get('e'), 1) or 1)
+            times = reached.get('t', 0)
+            if not isinstance(times, dict):
+                # Films only keep a single time
+                times = {'1': {'1': times}}
+                current = (1, 1)
+            episodes = {}
+            for season, season_times in times.items():
+                if not isinstance(season_times, dict):
+                    continue
+                for episode, time in season_times.items():
+                    episodes[(_to_int(season, 1), _to_int(episode, 1))] = _to_int(time)
+            episodes.setdefault(current, 0)
+            for (season, episode), time in episodes.items():
+                rows.append(Progress(
+                    user_id=user.id, show_id=show_id, season=season, episode=episode, time=time,
+                    updated=now if (season, episode) == current else before))
+        if len(rows) >= 1000:
+            Progress.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    Progress.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def progress_to_reached(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    if not router.allow_migrate_model(schema_editor.connection.alias, User):
+        return
+    Progress = apps.get_model('shows', 'Progress')
+    reached = {}
+    for row in Progress.objects.select_related('show').order_by('updated').iterator():
+        user_reached = reached.setdefault(row.user_id, {})
+        show_id = str(row.show_id)
+        if row.show.kind == 'film':
+            user_reached[show_id] = {'s': 1, 'e': 1, 't': row.time}
+            continue
+        entry = user_reached.setdefault(show_id, {'t': {}})
+        entry['s'], entry['e'] = row.season, row.episode
+        entry['t'].setdefault(str(row.season), {})[str(row.episode)] = row.time
+    for user_id, user_reached in reached.items():
+        User.objects.filter(id=user_id).update(reached=user_reached)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shows', '0007_alter_show_popup_alter_show_rating'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0007_customuser_shows_per_page'),
+    ]
+
+    operations = [
+        shows.operations.CreateActivityModel(
+            name='Progress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('season', models.PositiveIntegerField(default=1)),
+                ('episode', models.PositiveIntegerField(default=1)),
+                ('time', models.PositiveIntegerField(default=0)),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now)),
+                ('show', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='shows.show')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'show', 'updated'], name='progress_user_show_updated')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'show', 'season', 'episode'), name='unique_progress_episode')],
+            },
+        ),
+        migrations.RunPython(reached_to_progress, progress_to_reached),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:23
+
+import datetime
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models, router
+
+import shows.operations
+
+RECENT_VIEWS_LIMIT = 40
+
+
+def history_to_entries(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    # Runs where the users are; an activity database gets its rows from move_activity
+    if not router.allow_migrate_model(schema_editor.connection.alias, User):
+        return
+    Show = apps.get_model('shows', 'Show')
+    HistoryEntry = apps.get_model('shows', 'HistoryEntry')
+    RecentView = apps.get_model('shows', 'RecentView')
+    show_ids = set(Show.objects.values_list('id', flat=True))
+    entries, recent = [], []
+    for user in User.objects.exclude(history={}).only('id', 'history').iterator():
+        views = []
+        for date_str, times in (user.history or {}).items():
+            if not isinstance(times, dict):
+                continue
+            for time_str, show_id in times.items():
+                try:
+                    viewed_at = datetime.datetime.strptime(f'{date_str} {time_str}', '%Y-%m-%d %H:%M:%S')
+                    show_id = int(show_id)
+                except (TypeError, ValueError):
+                    continue
+                if show_id in show_ids:
+                    views.append((django.utils.timezone.make_aware(viewed_at), show_id))
+        views.sort(reverse=True)
+        seen = set()
+        for viewed_at, show_id in views:
+            entries.append(HistoryEntry(user_id=user.id, show_id=show_id, viewed_at=viewed_at))
+            if show_id not in seen and len(seen) < RECENT_VIEWS_LIMIT:
+                seen.add(show_id)
+                recent.append(RecentView(user_id=user.id, show_id=show_id, viewed_at=viewed_at))
+        if len(entries) >= 1000:
+            HistoryEntry.objects.bulk_create(entries)
+            RecentView.objects.bulk_create(recent)
+            entries, recent = [], []
+    HistoryEntry.objects.bulk_create(entries)
+    RecentView.objects.bulk_create(recent)
+
+
+def entries_to_history(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    if not router.allow_migrate_model(schema_editor.connection.alias, User):
+        return
+    HistoryEntry = apps.get_model('shows', 'HistoryEntry')
+    history = {}
+    for user_id, show_id, viewed_at in HistoryEntry.objects.order_by('viewed_at').values_list(
+            'user_id', 'show_id', 'viewed_at').iterator():
+        viewed_at = django.utils.timezone.localtime(viewed_at)
+        history.setdefault(user_id, {}).setdefault(
+            str(viewed_at.date()), {})[viewed_at.strftime('%H:%M:%S')] = show_id
+    for user_id, user_history in history.items():
+        User.objects.filter(id=user_id).update(history=user_history)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shows', '0008_progress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0008_remove_customuser_reached'),
+    ]
+
+    operations = [
+        shows.operations.CreateActivityModel(
+            name='HistoryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('viewed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('show', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history_entries', to='shows.show')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'history entries',
+                'indexes': [models.Index(fields=['user', 'viewed_at'], name='history_user_viewed_at')],
+            },
+        ),
+        shows.operations.CreateActivityModel(
+            name='RecentView',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('viewed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('show', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recent_views', to='shows.show')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recent_views', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'viewed_at'], name='recent_view_user_viewed_at')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'show'), name='unique_recent_view')],
+            },
+        ),
+        migrations.RunPython(history_to_entries, entries_to_history),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shows', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='show',
+            options={'ordering': ['-year', 'name', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='show',
+            index=models.Index(fields=['-year', 'name', 'id'], name='show_listing_order'),
+        ),
+    ]
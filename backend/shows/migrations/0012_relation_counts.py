@@ -0,0 +1,58 @@
+from django.db import migrations, models
+
+from shows import counts
+
+
+def fill_counts(apps, schema_editor):
+    counts.refresh_all(apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shows', '0011_show_listing_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='shows_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='language',
+            name='shows_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='language',
+            name='countries_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='country',
+            name='shows_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='country',
+            name='artists_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='shows_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='rating',
+            name='shows_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='label',
+            name='shows_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:49
+
+import shows.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shows', '0012_relation_counts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='artist',
+            name='image',
+            field=models.ImageField(blank=True, max_length=500, storage=shows.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='country',
+            name='flag',
+            field=models.ImageField(blank=True, max_length=500, storage=shows.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='country',
+            name='image',
+            field=models.ImageField(blank=True, max_length=500, storage=shows.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='genre',
+            name='image',
+            field=models.ImageField(blank=True, max_length=500, storage=shows.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='label',
+            name='image',
+            field=models.ImageField(blank=True, max_length=500, storage=shows.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='language',
+            name='image',
+            field=models.ImageField(blank=True, max_length=500, storage=shows.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='image',
+            field=models.ImageField(blank=True, max_length=500, storage=shows.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='show',
+            name='image',
+            field=models.ImageField(blank=True, max_length=500, storage=shows.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+    ]
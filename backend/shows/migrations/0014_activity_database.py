@@ -0,0 +1,77 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import shows.operations
+
+
+class CreateModelIfMissing(shows.operations.CreateActivityModel):
+    # The favorites and watchlist tables exist where their many-to-many fields made them,
+    # and are only created in a separate activity database
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.name)
+        if model._meta.db_table not in schema_editor.connection.introspection.table_names():
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if 'shows_show' not in schema_editor.connection.introspection.table_names():
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def through_model(name, db_table, **options):
+    # Same columns and constraints as the table the many-to-many field made
+    return CreateModelIfMissing(
+        name=name,
+        fields=[
+            ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ('show', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shows.show')),
+            ('user', models.ForeignKey(db_column='customuser_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+        ],
+        options={'db_table': db_table, 'unique_together': {('show', 'user')}, **options},
+    )
+
+
+def unconstrained(model_name, related_name):
+    return [
+        migrations.AlterField(
+            model_name=model_name,
+            name='show',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name=related_name, to='shows.show'),
+        ),
+        migrations.AlterField(
+            model_name=model_name,
+            name='user',
+            field=models.ForeignKey(db_column='customuser_id' if related_name == '+' else None, db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name=related_name, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shows', '0013_content_addressed_images'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        *unconstrained('progress', 'progress'),
+        *unconstrained('historyentry', 'history_entries'),
+        *unconstrained('recentview', 'recent_views'),
+        through_model('Favorite', 'shows_show_favorites'),
+        through_model('WatchlistEntry', 'shows_show_watchlist', verbose_name_plural='watchlist entries'),
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='show',
+                name='favorites',
+                field=models.ManyToManyField(blank=True, related_name='favorite_shows', through='shows.Favorite', to=settings.AUTH_USER_MODEL),
+            ),
+            migrations.AlterField(
+                model_name='show',
+                name='watchlist',
+                field=models.ManyToManyField(blank=True, related_name='watchlist_shows', through='shows.WatchlistEntry', to=settings.AUTH_USER_MODEL),
+            ),
+        ]),
+        *unconstrained('favorite', '+'),
+        *unconstrained('watchlistentry', '+'),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from datetime import date
-from .storage import OverwriteStorage, File_Rename
+from .storage import ContentAddressedStorage
 User = get_user_model()
 this_year = date.today().strftime('%Y')
 
@@ -13,9 +14,10 @@ class Artist(models.Model):
     birthYear = models.IntegerField()
     nationality = models.ForeignKey(
         'Country', on_delete=models.CASCADE, related_name='artists')
-    image = models.ImageField(upload_to=File_Rename(
-        'shows/artists/'), storage=OverwriteStorage(), blank=True, max_length=500)
+    image = models.ImageField(storage=ContentAddressedStorage(), blank=True, max_length=500)
     description = models.TextField(blank=True)
+    # Kept up to date by shows.signals
+    shows_count = models.PositiveIntegerField(default=0, editable=False)
 
     @property
     def age(self):
@@ -30,9 +32,11 @@ class Artist(models.Model):
 
 class Language(models.Model):
     name = models.CharField(max_length=50)
-    image = models.ImageField(upload_to=File_Rename(
-        'shows/languages/'), storage=OverwriteStorage(), blank=True, max_length=500)
+    image = models.ImageField(storage=ContentAddressedStorage(), blank=True, max_length=500)
     description = models.TextField(blank=True)
+    # Kept up to date by shows.signals
+    shows_count = models.PositiveIntegerField(default=0, editable=False)
+    countries_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -44,11 +48,12 @@ class Language(models.Model):
 class Country(models.Model):
     name = models.CharField(max_length=100)
     languages = models.ManyToManyField(Language, related_name='countries')
-    flag = models.ImageField(upload_to=File_Rename(
-        'shows/countries_flags/'), storage=OverwriteStorage(), blank=True, max_length=500)
-    image = models.ImageField(upload_to=File_Rename(
-        'shows/countries/'), storage=OverwriteStorage(), blank=True, max_length=500)
+    flag = models.ImageField(storage=ContentAddressedStorage(), blank=True, max_length=500)
+    image = models.ImageField(storage=ContentAddressedStorage(), blank=True, max_length=500)
     description = models.TextField(blank=True)
+    # Kept up to date by shows.signals
+    shows_count = models.PositiveIntegerField(default=0, editable=False)
+    artists_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -65,9 +70,10 @@ class Country(models.Model):
 
 class Genre(models.Model):
     name = models.CharField(max_length=50)
-    image = models.ImageField(upload_to=File_Rename(
-        'shows/genres/'), storage=OverwriteStorage(), blank=True, max_length=500)
+    image = models.ImageField(storage=ContentAddressedStorage(), blank=True, max_length=500)
     description = models.TextField(blank=True)
+    # Kept up to date by shows.signals
+    shows_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -78,9 +84,10 @@ class Genre(models.Model):
 
 class Rating(models.Model):
     name = models.CharField(max_length=50)
-    image = models.ImageField(upload_to=File_Rename(
-        'shows/ratings/'), storage=OverwriteStorage(), blank=True, max_length=500)
+    image = models.ImageField(storage=ContentAddressedStorage(), blank=True, max_length=500)
     description = models.TextField(blank=True)
+    # Kept up to date by shows.signals
+    shows_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -91,9 +98,10 @@ class Rating(models.Model):
 
 class Label(models.Model):
     name = models.CharField(max_length=50)
-    image = models.ImageField(upload_to=File_Rename(
-        'shows/labels/'), storage=OverwriteStorage(), blank=True, max_length=500)
+    image = models.ImageField(storage=ContentAddressedStorage(), blank=True, max_length=500)
     description = models.TextField(blank=True)
+    # Kept up to date by shows.signals
+    shows_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -109,8 +117,7 @@ class Show(models.Model):
         'film', 'Film'), ('series', 'Series'), ('program', 'Program')], default='film')
     sample = models.BooleanField(default=False)
     captions = models.BooleanField(default=False)
-    image = models.ImageField(upload_to=File_Rename(
-        'shows/shows/'), storage=OverwriteStorage(), blank=True, max_length=500)
+    image = models.ImageField(storage=ContentAddressedStorage(), blank=True, max_length=500)
     imdb = models.TextField(
         default='<small class="text-muted">IMDB Rating Not Available</small>')
     description = models.TextField(blank=True)
@@ -129,9 +136,9 @@ class Show(models.Model):
         encoder=None, decoder=None, default=dict, blank=True)
 
     favorites = models.ManyToManyField(
-        User, related_name='favorite_shows', blank=True)
+        User, related_name='favorite_shows', blank=True, through='Favorite')
     watchlist = models.ManyToManyField(
-        User, related_name='watchlist_shows', blank=True)
+        User, related_name='watchlist_shows', blank=True, through='WatchlistEntry')
 
     finalized = models.BooleanField(default=False)
 
@@ -152,4 +159,90 @@ class Show(models.Model):
         return self.name
 
     class Meta:
-        ordering = ['-year', 'name']
+        # id breaks ties so that keyset pagination never skips or repeats a show
+        ordering = ['-year', 'name', 'id']
+        indexes = [models.Index(fields=['-year', 'name', 'id'], name='show_listing_order')]
+
+
+# User activity can live in a database of its own (see core.routers), so its foreign keys have no
+# constraints and its rows are deleted with their user or show by shows.signals. Favorites and watchlist
+# are read through Favorite and WatchlistEntry, since Show.favorites would join across the databases
+
+
+class Favorite(models.Model):
+    # Through table of Show.favorites
+    show = models.ForeignKey(Show, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+                             db_column='customuser_id')
+
+    class Meta:
+        db_table = 'shows_show_favorites'
+        unique_together = [('show', 'user')]
+
+
+class WatchlistEntry(models.Model):
+    # Through table of Show.watchlist
+    show = models.ForeignKey(Show, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+                             db_column='customuser_id')
+
+    class Meta:
+        db_table = 'shows_show_watchlist'
+        unique_together = [('show', 'user')]
+        verbose_name_plural = 'watchlist entries'
+
+
+class Progress(models.Model):
+    # One row per (user, show, season, episode); films are stored as season 1 episode 1.
+    # The most recently updated row of a show is where the user currently is.
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='progress')
+    show = models.ForeignKey(Show, on_delete=models.DO_NOTHING, db_constraint=False, related_name='progress')
+    season = models.PositiveIntegerField(default=1)
+    episode = models.PositiveIntegerField(default=1)
+    time = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.user} - {self.show} S{self.season}E{self.episode} @ {self.time}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'show', 'season', 'episode'], name='unique_progress_episode'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'show', 'updated'], name='progress_user_show_updated'),
+        ]
+
+
+class HistoryEntry(models.Model):
+    # Append-only log of show page views, trimmed by the compact_history command
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='history_entries')
+    show = models.ForeignKey(Show, on_delete=models.DO_NOTHING, db_constraint=False, related_name='history_entries')
+    viewed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.user} - {self.show} @ {self.viewed_at}'
+
+    class Meta:
+        verbose_name_plural = 'history entries'
+        indexes = [
+            models.Index(fields=['user', 'viewed_at'], name='history_user_viewed_at'),
+        ]
+
+
+class RecentView(models.Model):
+    # Last distinct shows viewed by each user, kept to RECENT_VIEWS_LIMIT rows per user
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='recent_views')
+    show = models.ForeignKey(Show, on_delete=models.DO_NOTHING, db_constraint=False, related_name='recent_views')
+    viewed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.user} - {self.show} @ {self.viewed_at}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'show'], name='unique_recent_view'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'viewed_at'], name='recent_view_user_viewed_at'),
+        ]
@@ -0,0 +1,27 @@
+'''
+Migration operations for the models core.routers can keep in the activity database.
+'''
+import contextlib
+from django.db import migrations, router
+
+
+@contextlib.contextmanager
+def constraints_within(model, using):
+    # Foreign keys to tables migrated in another database get no constraint, which
+    # PostgreSQL could not create; the rows are kept consistent by shows.signals
+    dropped = [field for field in model._meta.local_fields if field.is_relation and field.db_constraint
+               and not router.allow_migrate_model(using, field.related_model)]
+    for field in dropped:
+        field.db_constraint = False
+    try:
+        yield
+    finally:
+        for field in dropped:
+            field.db_constraint = True
+
+
+class CreateActivityModel(migrations.CreateModel):
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.name)
+        with constraints_within(model, schema_editor.connection.alias):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
@@ -0,0 +1,103 @@
+import base64
+import binascii
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+MAX_PAGE_SIZE = 100
+# Same as the default of CustomUser.shows_per_page, for anonymous readers
+DEFAULT_PAGE_SIZE = 5
+
+
+class KeysetPagination(BasePagination):
+    '''
+    Cursor pagination on a full sort key.
+
+    The cursor holds the sort values of the row a page ends on and the next page
+    is fetched with a WHERE on them, so every page costs the same as the first.
+    The last ordering field has to be unique. The page size is the user's
+    shows_per_page preference.
+    '''
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        self.ordering = ordering
+
+    def get_ordering(self, queryset):
+        if self.ordering:
+            return list(self.ordering)
+        ordering = list(queryset.model._meta.ordering)
+        return ordering if 'id' in ordering or 'pk' in ordering else ordering + ['id']
+
+    def get_page_size(self, request):
+        page_size = getattr(request.user, 'shows_per_page', None) or DEFAULT_PAGE_SIZE
+        return min(max(int(page_size), 1), MAX_PAGE_SIZE)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = self.get_ordering(queryset)
+        position, reverse = self.decode_cursor(request)
+
+        # A previous page is read backwards from its cursor, then flipped
+        ordering = [field[1:] if field.startswith('-') else '-' + field for field in self.fields] if reverse else self.fields
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        has_next, has_previous = (position is not None, has_more) if reverse else (has_more, position is not None)
+        self.next_position = self._position(rows[-1]) if rows and has_next else None
+        self.previous_position = self._position(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.encode_cursor(self.next_position, False),
+            'previous': self.encode_cursor(self.previous_position, True),
+            'results': data,
+        })
+
+    def _position(self, row):
+        return [getattr(row, field.lstrip('-')) for field in self.fields]
+
+    def _after(self, ordering, position):
+        # (a, b, c) after (x, y, z): a > x, or a = x and b > y, or a = x and b = y and c > z
+        condition = Q()
+        for index, field in enumerate(ordering):
+            equal = {name.lstrip('-'): value for name, value in zip(ordering[:index], position)}
+            lookup = field.lstrip('-') + ('__lt' if field.startswith('-') else '__gt')
+            condition |= Q(**equal, **{lookup: position[index]})
+        # Implied by the terms above, but a range on the leading column lets the database seek
+        # into the index instead of scanning it up to the cursor
+        lead = ordering[0]
+        return Q(**{lead.lstrip('-') + ('__lte' if lead.startswith('-') else '__gte'): position[0]}) & condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        if position is None:
+            return None
+        cursor = {'p': position, 'r': 1} if reverse else {'p': position}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':'), cls=DjangoJSONEncoder).encode()).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
@@ -0,0 +1,76 @@
+'''
+Random picks of shows without loading every primary key on each request.
+
+The ids matching a filter are kept as a compact array in the catalog cache,
+rebuilt when a show changes, and every worker holds on to the arrays it read
+until their version moves. A pick samples positions of the array and skips
+what the user was given lately, so repeated clicks bring new titles.
+'''
+import random
+from array import array
+from .cache import catalog_cache
+from .models import Progress, Show
+
+# Picks are not given to the same user again until this many others were, per filter
+NO_REPEAT = 100
+# Seconds a user's recent picks are remembered
+NO_REPEAT_TIMEOUT = 60 * 60
+# Filters whose arrays a worker holds at most
+MAX_ARRAYS = 256
+
+
+class RandomPicker:
+    def __init__(self):
+        # variant -> (version, ids)
+        self._arrays = {}
+
+    def ids(self, variant, kind=None, genre_id=None):
+        version = catalog_cache.versions('show')
+        held = self._arrays.get(variant)
+        if held is None or held[0] != version:
+            def build():
+                shows = Show.objects.order_by()
+                if kind is not None:
+                    shows = shows.filter(kind=kind)
+                if genre_id is not None:
+                    shows = shows.filter(genres=genre_id)
+                return array('q', shows.values_list('id', flat=True))
+            if len(self._arrays) >= MAX_ARRAYS:
+                self._arrays.clear()
+            held = self._arrays[variant] = (version, catalog_cache.get_list('show', variant, build, version))
+        return held[1]
+
+    def _sample(self, ids, count, excluded):
+        picks = []
+        # Random positions while most of the array is available, the remainder itself otherwise
+        if len(excluded) * 2 < len(ids):
+            chosen = set(excluded)
+            for _ in range(count * 8):
+                show_id = ids[random.randrange(len(ids))]
+                if show_id not in chosen:
+                    chosen.add(show_id)
+                    picks.append(show_id)
+                    if len(picks) == count:
+                        return picks
+            excluded = chosen
+        remaining = [show_id for show_id in ids if show_id not in excluded]
+        return picks + random.sample(remaining, min(count - len(picks), len(remaining)))
+
+    def pick(self, user, count, kind=None, genre_id=None, unwatched=False):
+        variant = catalog_cache.variant('random', kind, genre_id)
+        ids = self.ids(variant, kind, genre_id)
+        excluded = set()
+        if unwatched:
+            excluded = set(Progress.objects.filter(user=user).values_list('show_id', flat=True).distinct())
+        seen_key = f'random:{user.id}:{variant}'
+        seen = catalog_cache.cache.get(seen_key, [])
+        picks = self._sample(ids, count, excluded | set(seen))
+        if len(picks) < count:
+            # Everything left was given lately, so the round starts over
+            seen = []
+            picks += self._sample(ids, count - len(picks), excluded | set(picks))
+        catalog_cache.cache.set(seen_key, (seen + picks)[-NO_REPEAT:], NO_REPEAT_TIMEOUT)
+        return picks
+
+
+random_shows = RandomPicker()
@@ -0,0 +1,167 @@
+'''
+Query plans derived from serializers.
+
+The planner walks the fields a serializer will read (nested serializers, the
+ones `depth` builds, related fields and SerializerMethodFields declaring what
+they read with @uses) and turns them into select_related, prefetch_related and
+only() calls. A view can also declare how many queries each action may run;
+with QUERY_BUDGETS_CHECKED on, going over the budget is logged, and with
+QUERY_BUDGETS_ENFORCED on it fails the request. The budgets are asserted over
+a generated catalog by shows.tests.QueryBudgetTests.
+'''
+import contextlib
+import functools
+import logging
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import ManyRelatedField, RelatedField
+from .sparse import requested
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def uses(*paths):
+    # Declares the model fields (relations spelled with __) a SerializerMethodField reads
+    def decorator(method):
+        method.uses = paths
+        return method
+    return decorator
+
+
+class QueryPlan:
+    def __init__(self, model):
+        self.model = model
+        self.select = set()
+        self.prefetch = set()
+        # The ordering fields are read by keyset pagination
+        self.only = {model._meta.pk.name} | {
+            field.lstrip('-') for field in model._meta.ordering if '__' not in field}
+        # only() is applied when every field read is known
+        self.complete = True
+
+    def apply(self, queryset):
+        if self.select:
+            queryset = queryset.select_related(*sorted(self.select))
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*sorted(self.prefetch))
+        if self.complete:
+            # Related managers set the object they come from on every row, which reads its foreign key
+            known = [field.name for field in queryset._known_related_objects]
+            queryset = queryset.only(*sorted(self.only), *known)
+        return queryset
+
+    def add(self, model, path, prefetched, attrs, pk_only=False):
+        # Follows attrs from model, reached through path; returns where it ended for nested serializers
+        for index, attr in enumerate(attrs):
+            try:
+                field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # A property or an annotation; its needs are unknown
+                self.complete = False
+                return None
+            last = index == len(attrs) - 1
+            if not field.is_relation:
+                if not prefetched:
+                    self.only.add('__'.join(path + [field.name]))
+                return None
+            if field.many_to_one or (field.one_to_one and field.concrete):
+                if not prefetched:
+                    self.only.add('__'.join(path + [field.name]))
+                if last and pk_only:
+                    # The foreign key column is all a primary key field needs
+                    return None
+            path = path + [field.name]
+            if field.many_to_many or field.one_to_many:
+                prefetched = True
+            if prefetched:
+                self.prefetch.add('__'.join(path))
+            else:
+                self.select.add('__'.join(path))
+                self.only.add('__'.join(path + [field.related_model._meta.pk.name]))
+            model = field.related_model
+        return model, path, prefetched
+
+    def walk(self, serializer, model, path=(), prefetched=False):
+        path = list(path)
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                method = getattr(serializer, field.method_name)
+                if not hasattr(method, 'uses'):
+                    self.complete = False
+                for dependency in getattr(method, 'uses', ()):
+                    self.add(model, path, prefetched, dependency.split('__'))
+                continue
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if field.source == '*':
+                if isinstance(nested, serializers.BaseSerializer):
+                    self.walk(nested, model, path, prefetched)
+                else:
+                    self.complete = False
+                continue
+            pk_only = isinstance(field, (RelatedField, ManyRelatedField))
+            reached = self.add(model, path, prefetched, field.source_attrs, pk_only)
+            if reached and isinstance(nested, serializers.BaseSerializer):
+                self.walk(nested, *reached)
+
+
+# Bounded, since sparse fieldsets come from query strings
+@functools.lru_cache(maxsize=256)
+def plan(serializer_class, model, sparse=(None, None)):
+    query_plan = QueryPlan(model)
+    query_plan.walk(serializer_class(context={'sparse': sparse}), model)
+    return query_plan
+
+
+def plan_queryset(queryset, serializer_class, sparse=(None, None)):
+    return plan(serializer_class, queryset.model, sparse).apply(queryset)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class PlannedQueryMixin:
+    '''
+    Plans the queryset of read requests from the serializer of the action and
+    checks the action against `query_budgets` ({action: maximum queries}), the
+    worst case: a token the worker has not verified lately and nothing cached.
+    '''
+    query_budgets = {}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Writes save the instances they load, so they keep every column
+        if self.request.method in SAFE_METHODS:
+            queryset = plan_queryset(queryset, self.get_serializer_class(), requested(self.request))
+        return queryset
+
+    def dispatch(self, request, *args, **kwargs):
+        if not (settings.QUERY_BUDGETS_CHECKED or settings.QUERY_BUDGETS_ENFORCED):
+            return super().dispatch(request, *args, **kwargs)
+        counter = QueryCounter()
+        # Counted on every database, replicas included
+        with contextlib.ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            response = super().dispatch(request, *args, **kwargs)
+        budget = self.query_budgets.get(getattr(self, 'action', None))
+        if budget is not None and counter.count > budget:
+            message = f'{type(self).__name__}.{self.action} ran {counter.count} queries, its budget is {budget}'
+            if settings.QUERY_BUDGETS_ENFORCED:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,114 @@
+'''
+Resized and re-encoded copies of uploaded images.
+
+Every image gets one rendition per width in IMAGE_RENDITION_WIDTHS and format
+in IMAGE_RENDITION_FORMATS, stored under renditions/ with names derived from
+the original's, so their URLs are known without touching the disk. Signals make
+them on upload and the generate_renditions command backfills existing media.
+Originals are content-addressed, so their renditions never change either.
+'''
+import io
+import logging
+import os
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models
+from PIL import Image, ImageOps, features
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+ROOT = 'renditions'
+MODELS = ['shows.Show', 'shows.Artist', 'shows.Country', 'shows.Language', 'shows.Genre', 'shows.Rating',
+          'shows.Label', settings.AUTH_USER_MODEL]
+SAVE_OPTIONS = {
+    'avif': {'quality': 55, 'speed': 6},
+    'webp': {'quality': 80, 'method': 4},
+}
+
+
+def image_fields(model):
+    return [field.name for field in model._meta.concrete_fields if isinstance(field, models.ImageField)]
+
+
+def formats():
+    # Best first; the ones this Pillow cannot write are left out
+    return [fmt for fmt in settings.IMAGE_RENDITION_FORMATS if features.check(fmt)]
+
+
+def rendition_name(name, width, fmt):
+    return f'{ROOT}/{os.path.splitext(name)[0]}.{width}w.{fmt}'
+
+
+def names(name):
+    return [rendition_name(name, width, fmt) for fmt in formats() for width in settings.IMAGE_RENDITION_WIDTHS]
+
+
+def generate(field_file, force=True):
+    # Writes the renditions of an image; returns how many were written
+    # Renditions keep the names they are given, which the storage of the originals would not
+    storage = default_storage
+    pending = [(width, fmt) for fmt in formats() for width in settings.IMAGE_RENDITION_WIDTHS
+               if force or not storage.exists(rendition_name(field_file.name, width, fmt))]
+    if not pending:
+        return 0
+    with field_file.storage.open(field_file.name, 'rb') as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    for width, fmt in pending:
+        # Never upscaled; a smaller original stands in for the wider sizes
+        resized = image if image.width <= width else image.resize(
+            (width, round(image.height * width / image.width)), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, fmt.upper(), **SAVE_OPTIONS.get(fmt, {}))
+        name = rendition_name(field_file.name, width, fmt)
+        storage.delete(name)
+        storage.save(name, ContentFile(buffer.getvalue()))
+    return len(pending)
+
+
+def delete(name):
+    for rendition in names(name):
+        default_storage.delete(rendition)
+
+
+def srcset(field_file, request=None):
+    # {'thumbnail': url, format: srcset, ...} for an image, None without one
+    if not field_file:
+        return None
+
+    def url(name):
+        url = default_storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    widths = settings.IMAGE_RENDITION_WIDTHS
+    available = formats()
+    if not available:
+        return None
+    result = {'thumbnail': url(rendition_name(field_file.name, widths[0], 'webp' if 'webp' in available else available[0]))}
+    for fmt in available:
+        result[fmt] = ', '.join(f'{url(rendition_name(field_file.name, width, fmt))} {width}w' for width in widths)
+    return result
+
+
+class RenditionsField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return srcset(value, self.context.get('request'))
+
+
+class RenditionsMixin:
+    '''
+    Adds `<field>_renditions` next to every image field of a model serializer,
+    with srcset strings by format and the URL of a small thumbnail.
+    '''
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name, field in list(fields.items()):
+            if isinstance(field, serializers.ImageField):
+                fields[f'{name}_renditions'] = RenditionsField(source=field.source or name)
+        return fields
@@ -0,0 +1,205 @@
+'''
+Unified full-text search over every searchable entity.
+
+On SQLite everything lives in one FTS5 table; the rowid packs the entity id and
+its result type so a document can be replaced without scanning the index. The
+display payload is stored next to the text, so a search is a single query.
+Other databases fall back to bounded icontains lookups.
+'''
+import json
+import re
+from datetime import date
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+from . import renditions
+
+TABLE = 'shows_search'
+# Result types in the order they are listed in search results
+RESULT_TYPES = ['country', 'language', 'genre', 'label', 'rating', 'user', 'show', 'artist']
+MODELS = {
+    'country': 'shows.Country',
+    'language': 'shows.Language',
+    'genre': 'shows.Genre',
+    'label': 'shows.Label',
+    'rating': 'shows.Rating',
+    'user': settings.AUTH_USER_MODEL,
+    'show': 'shows.Show',
+    'artist': 'shows.Artist',
+}
+TYPES_SLOTS = 16
+# Database alias -> whether it has the index
+_available = {}
+
+
+def _excerpt(text):
+    return text[:100] + '...' if len(text) > 100 else text
+
+
+def _url(field):
+    return field.url if field else None
+
+
+def _rowid(result_type, object_id):
+    return object_id * TYPES_SLOTS + RESULT_TYPES.index(result_type)
+
+
+def document(result_type, instance):
+    # Returns (name, searchable body, payload) for an instance of the given result type
+    body = ''
+    image = getattr(instance, 'image', None)
+    match result_type:
+        case 'country':
+            image = instance.flag or instance.image
+            payload = {}
+        case 'user':
+            image = instance.profile_picture
+            payload = {
+                'name': instance.username,
+                'description': _excerpt(instance.bio) if instance.bio else 'No bio provided',
+                'nationality': instance.nationality.name if instance.nationality_id else None,
+            }
+        case 'show':
+            # Shows are the only entity also matched on their description
+            body = instance.description
+            payload = {
+                'kind': instance.kind,
+                'year': instance.year,
+                'rating': instance.rating.name if instance.rating_id else None,
+            }
+        case 'artist':
+            payload = {
+                'birthYear': instance.birthYear,
+                'nationality': instance.nationality.name if instance.nationality_id else None,
+            }
+        case _:
+            payload = {}
+    payload = {
+        'result_type': result_type,
+        'id': instance.id,
+        'name': instance.name if result_type != 'user' else instance.username,
+        'image': _url(image),
+        'image_renditions': renditions.srcset(image),
+        'description': _excerpt(instance.description) if result_type != 'user' else None,
+    } | payload
+    return payload['name'], body, payload
+
+
+def _finish(payload):
+    # Age changes every year, so it is not stored in the index
+    if payload['result_type'] == 'artist':
+        payload['age'] = int(date.today().strftime('%Y')) - int(payload['birthYear'])
+    return payload
+
+
+def _connection(write=False):
+    # The index is kept next to the shows, so it is read and written where they are
+    show = global_apps.get_model('shows', 'Show')
+    return connections[router.db_for_write(show) if write else router.db_for_read(show)]
+
+
+def available(connection=None):
+    connection = connection or _connection()
+    if connection.alias not in _available:
+        _available[connection.alias] = connection.vendor == 'sqlite' and TABLE in connection.introspection.table_names()
+    return _available[connection.alias]
+
+
+def index(result_type, instances):
+    connection = _connection(write=True)
+    if not available(connection):
+        return
+    rows = []
+    for instance in instances:
+        name, body, payload = document(result_type, instance)
+        rows.append((_rowid(result_type, instance.id), name, body, json.dumps(payload)))
+    if rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [row[:1] for row in rows])
+            cursor.executemany(f'INSERT INTO {TABLE} (rowid, name, body, payload) VALUES (%s, %s, %s, %s)', rows)
+
+
+def unindex(result_type, object_ids):
+    connection = _connection(write=True)
+    if not available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                           [(_rowid(result_type, object_id),) for object_id in object_ids])
+
+
+def queryset(result_type, get_model=global_apps.get_model):
+    queryset = get_model(MODELS[result_type]).objects.all()
+    if result_type in ('user', 'artist'):
+        queryset = queryset.select_related('nationality')
+    elif result_type == 'show':
+        queryset = queryset.select_related('rating')
+    return queryset
+
+
+def rebuild(batch_size=1000):
+    connection = _connection(write=True)
+    if not available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    for result_type in RESULT_TYPES:
+        batch = []
+        for instance in queryset(result_type).iterator(chunk_size=batch_size):
+            batch.append(instance)
+            if len(batch) >= batch_size:
+                index(result_type, batch)
+                batch = []
+        index(result_type, batch)
+
+
+def migrated(using, **kwargs):
+    # The migration creating the index leaves it empty; it is filled from the current models once every
+    # migration has run, and again whenever a migrate finds it empty
+    _available.pop(using, None)
+    connection = connections[using]
+    if using != _connection(write=True).alias or not available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT 1 FROM {TABLE} LIMIT 1')
+        if cursor.fetchone() is None:
+            rebuild()
+
+
+def _match_expression(query):
+    # Every word must match, each one as a prefix
+    words = re.findall(r'\w+', query)
+    return ' '.join('"%s"*' % word for word in words)
+
+
+def search(query, limit):
+    # Returns at most `limit` payloads grouped by result type, best matches first
+    connection = _connection()
+    if not available(connection):
+        return _search_fallback(query, limit)
+    expression = _match_expression(query)
+    if not expression:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT payload FROM {TABLE} WHERE {TABLE} MATCH %s '
+            f'ORDER BY rowid %% {TYPES_SLOTS}, bm25({TABLE}, 10.0, 1.0, 0.0) LIMIT %s',
+            [expression, limit])
+        return [_finish(json.loads(payload)) for payload, in cursor.fetchall()]
+
+
+def _search_fallback(query, limit):
+    results = []
+    for result_type in RESULT_TYPES:
+        if result_type == 'show':
+            condition = Q(name__icontains=query) | Q(description__icontains=query)
+        elif result_type == 'user':
+            condition = Q(username__icontains=query)
+        else:
+            condition = Q(name__icontains=query)
+        for instance in queryset(result_type).filter(condition)[:limit - len(results)]:
+            results.append(_finish(document(result_type, instance)[2]))
+        if len(results) >= limit:
+            break
+    return results
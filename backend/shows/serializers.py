@@ -1,47 +1,107 @@
+import functools
 from django.contrib.auth import get_user_model
+from django.db import models
 from rest_framework import serializers
 from .models import Artist, Language, Country, Genre, Rating, Label, Show
+from .cache import catalog_cache
+from .prefetch import plan_queryset, uses
+from .renditions import RenditionsMixin
+from .sparse import SparseFieldsMixin, requested
 from datetime import date
 current_year = date.today().strftime('%Y')
 User = get_user_model()
+# Fields that need the user's progress
+REACHED_FIELDS = {'season_reached', 'episode_reached', 'time_reached', 'reached_times'}
+# Fields of a show that depend on who is asking; the others are shared and can be cached
+USER_FIELDS = REACHED_FIELDS | {'in_favorites', 'in_watchlist', 'view_captions'}
+
+
+@functools.cache
+def field_names(serializer_class):
+    # Top-level fields in the order the serializer renders them
+    return tuple(serializer_class(context={'sparse': (None, None)}).fields)
+
+
+class ShowOverlay:
+    '''
+    The fields of shows that depend on the user, from the ids of the user's
+    favorites and watchlist and from the user's progress. Loading any number of
+    shows costs one query for the lists and one for the progress, each only when
+    a requested field needs it.
+    '''
+
+    def __init__(self, user, fields=USER_FIELDS):
+        self.user = user if user is not None and user.is_authenticated else None
+        self.fields = [name for name in fields if name in USER_FIELDS]
+        self.loaded = set()
+        self.favorites, self.watchlist, self.reached = set(), set(), {}
+
+    def load(self, show_ids):
+        missing = set(show_ids) - self.loaded
+        self.loaded |= missing
+        if not missing or self.user is None:
+            return
+        lists = [name for name in ('favorites', 'watchlist') if f'in_{name}' in self.fields]
+        if lists:
+            # Both lists in one query, straight from their tables
+            links = None
+            for name in lists:
+                field = getattr(Show, name).field
+                rows = field.remote_field.through.objects.filter(**{
+                    field.m2m_reverse_field_name(): self.user, f'{field.m2m_field_name()}__in': missing,
+                }).annotate(list_name=models.Value(name)).values_list(field.m2m_column_name(), 'list_name')
+                links = rows if links is None else links.union(rows, all=True)
+            for show_id, name in links:
+                getattr(self, name).add(show_id)
+        if REACHED_FIELDS & set(self.fields):
+            self.reached.update(self.user.reached_for(missing))
+
+    def value(self, name, show_id, kind):
+        self.load([show_id])
+        match name:
+            case 'in_favorites':
+                return show_id in self.favorites
+            case 'in_watchlist':
+                return show_id in self.watchlist
+            case 'view_captions':
+                return self.user.view_captions if self.user is not None else True
+        reached = self.reached.get(show_id, {})
+        if name == 'reached_times':
+            return reached.get('t', {})
+        # Films are kept as season 1 episode 1
+        season, episode = (None, None) if kind == 'film' else (reached.get('s', 1), reached.get('e', 1))
+        match name:
+            case 'season_reached':
+                return season
+            case 'episode_reached':
+                return episode
+            case 'time_reached':
+                return reached.get('t', {}).get(str(season or 1), {}).get(str(episode or 1), 0)
+
+    def render(self, show_id, kind):
+        return {name: self.value(name, show_id, kind) for name in self.fields}
 
 
-# A simple function to determine if a show is registered in Favorites or Watchlist for the current user
-def get_in_f_or_w(user, show, change_type):
-    if user.is_authenticated:
-        match change_type:
-            case 'f':
-                return show.favorites.filter(id=user.id).exists()
-            case 'w':
-                return show.watchlist.filter(id=user.id).exists()
-    return False
+# Serializers start here
+class ShowListSerializer(serializers.ListSerializer):
+    # Loads the user's fields for every show of the list at once before the children need them
+    def to_representation(self, data):
+        shows = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if hasattr(self.child, 'get_overlay'):
+            self.child.get_overlay().load([show.id for show in shows])
+        return super().to_representation(shows)
 
 
-# Serializers start here
-class ShowSerializer(serializers.ModelSerializer):
+# The part of a show that is the same for every user, which is what the catalog cache holds
+class ShowDocumentSerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
     age = serializers.SerializerMethodField()
     episodes_count = serializers.SerializerMethodField()
-    season_reached = serializers.SerializerMethodField()
-    episode_reached = serializers.SerializerMethodField()
-    time_reached = serializers.SerializerMethodField()
-    in_favorites = serializers.SerializerMethodField()
-    in_watchlist = serializers.SerializerMethodField()
-    view_captions = serializers.SerializerMethodField()
-    reached_times = serializers.SerializerMethodField()
 
+    @uses('year')
     def get_age(self, show):
         return int(current_year) - int(show.year[0:4])
 
-    # Helper function to stay DRY
-    def _get_x_reached(self, show, key_type, default_value=0):
-        user = self.context.get('request').user
-        if not user or not user.is_authenticated:
-            return default_value
-        show_id = str(show.id)
-        # return from memory; initialization in DB should happen on write, not read
-        user_reached = user.reached.get(show_id, {})
-        return user_reached.get(key_type, default_value)
-
+    @uses('episodes')
     def get_episodes_count(self, show):
         try:
             episodes_count = sum(show.episodes.values()) if sum(
@@ -50,60 +110,117 @@ class ShowSerializer(serializers.ModelSerializer):
             episodes_count = 'N/A'
         return episodes_count
 
+    class Meta:
+        model = Show
+        exclude = ['favorites', 'watchlist']
+        depth = 2
+        list_serializer_class = ShowListSerializer
+
+
+class ShowLiteDocumentSerializer(ShowDocumentSerializer):
+    class Meta:
+        model = Show
+        exclude = ['artists', 'languages', 'countries',
+                   'genres', 'labels', 'favorites', 'watchlist']
+        depth = 1
+        list_serializer_class = ShowListSerializer
+
+
+class ShowSerializer(ShowDocumentSerializer):
+    document_serializer_class = ShowDocumentSerializer
+    season_reached = serializers.SerializerMethodField()
+    episode_reached = serializers.SerializerMethodField()
+    time_reached = serializers.SerializerMethodField()
+    in_favorites = serializers.SerializerMethodField()
+    in_watchlist = serializers.SerializerMethodField()
+    view_captions = serializers.SerializerMethodField()
+    reached_times = serializers.SerializerMethodField()
+
+    # One overlay per response, shared by every show in it
+    def get_overlay(self):
+        if 'overlay' not in self.context:
+            request = self.context.get('request')
+            self.context['overlay'] = ShowOverlay(request and request.user, USER_FIELDS & set(self.fields))
+        return self.context['overlay']
+
+    @uses('kind')
     def get_season_reached(self, show):
-        return None if show.kind == 'film' else self._get_x_reached(show, 's', 1)
+        return self.get_overlay().value('season_reached', show.id, show.kind)
 
+    @uses('kind')
     def get_episode_reached(self, show):
-        return None if show.kind == 'film' else self._get_x_reached(show, 'e', 1)
+        return self.get_overlay().value('episode_reached', show.id, show.kind)
 
+    @uses('kind')
     def get_time_reached(self, show):
-        user = self.context.get('request').user
-        if show.kind == 'film':
-            return self._get_x_reached(show, 't', 0)
-        # Nested logic for series
-        s, e = self.get_season_reached(show), self.get_episode_reached(show)
-        return user.reached.get(str(show.id), {}).get('t', {}).get(str(s), {}).get(str(e), 0)
+        return self.get_overlay().value('time_reached', show.id, show.kind)
 
+    @uses()
     def get_in_favorites(self, show):
-        # Optimization: Use annotated value if available to avoid N+1 queries
-        if hasattr(show, 'in_favorites_annotated'):
-            return show.in_favorites_annotated
-        return get_in_f_or_w(self.context['request'].user, show, 'f')
+        return self.get_overlay().value('in_favorites', show.id, None)
 
+    @uses()
     def get_in_watchlist(self, show):
-        # Optimization: Use annotated value if available to avoid N+1 queries
-        if hasattr(show, 'in_watchlist_annotated'):
-            return show.in_watchlist_annotated
-        return get_in_f_or_w(self.context['request'].user, show, 'w')
+        return self.get_overlay().value('in_watchlist', show.id, None)
 
+    @uses()
     def get_view_captions(self, show):
-        user = self.context.get('request').user
-        return user.view_captions if user.is_authenticated else True
+        return self.get_overlay().value('view_captions', show.id, None)
 
+    @uses()
     def get_reached_times(self, show):
-        user = self.context.get('request').user
-        if not user or not user.is_authenticated:
-            return {}
-        return user.reached.get(str(show.id), {}).get('t', {})
-
-    class Meta:
-        model = Show
-        exclude = ['favorites', 'watchlist']
-        depth = 2
+        return self.get_overlay().value('reached_times', show.id, None)
 
 
 class ShowLiteSerializer(ShowSerializer):
-    class Meta:
-        model = Show
-        exclude = ['artists', 'languages', 'countries',
-                   'genres', 'labels', 'favorites', 'watchlist']
-        depth = 1
-
-
-class ArtistSerializer(serializers.ModelSerializer):
-    shows = ShowLiteSerializer(many=True, read_only=True)
+    document_serializer_class = ShowLiteDocumentSerializer
+
+    class Meta(ShowLiteDocumentSerializer.Meta):
+        pass
+
+
+def render_shows(serializer_class, show_ids, request, versions=None):
+    '''
+    The shows as serializer_class renders them, in the order of show_ids and
+    leaving out the ones that do not exist. The part shared by every user comes
+    from the catalog cache and the user's fields are laid over it.
+    '''
+    document_class = serializer_class.document_serializer_class
+    fields, expand = requested(request)
+    user_fields = [name for name in (field_names(serializer_class) if fields is None else fields) if name in USER_FIELDS]
+    internal = set()
+    catalog_fields = None
+    if fields is not None:
+        catalog_fields = {name for name in fields if name.split('.')[0] not in USER_FIELDS}
+        # The progress fields depend on the kind of the show
+        if REACHED_FIELDS & set(user_fields) and 'kind' not in catalog_fields:
+            internal.add('kind')
+        catalog_fields = tuple(sorted(catalog_fields | internal))
+    sparse = (catalog_fields, expand)
+
+    def build(missing):
+        shows = list(plan_queryset(Show.objects.filter(id__in=missing), document_class, sparse))
+        data = document_class(shows, many=True, context={'request': request, 'sparse': sparse}).data
+        return {show.id: row for show, row in zip(shows, data)}
+    # Image URLs are absolute, so the host is part of the representation
+    variant = catalog_cache.variant(document_class.__name__, sparse, request.get_host())
+    catalog = catalog_cache.get_many('show', show_ids, variant, build, versions)
+
+    show_ids = [show_id for show_id in show_ids if show_id in catalog]
+    overlay = ShowOverlay(request.user, user_fields)
+    overlay.load(show_ids)
+    order = field_names(serializer_class)
+    rendered = []
+    for show_id in show_ids:
+        row = {**catalog[show_id], **overlay.render(show_id, catalog[show_id].get('kind'))}
+        rendered.append({name: row[name] for name in order if name in row and name not in internal})
+    return rendered
+
+
+class ArtistSerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
     age = serializers.SerializerMethodField()
 
+    @uses('birthYear')
     def get_age(self, artist):
         return int(current_year) - int(artist.birthYear)
 
@@ -113,54 +230,87 @@ class ArtistSerializer(serializers.ModelSerializer):
         depth = 1
 
 
-class LabelSerializer(serializers.ModelSerializer):
-    shows = ShowLiteSerializer(many=True, read_only=True)
-
+class LabelSerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
     class Meta:
         model = Label
         fields = '__all__'
 
 
-class CountrySerializer(serializers.ModelSerializer):
-    shows = ShowLiteSerializer(many=True, read_only=True)
-    artists = ArtistSerializer(many=True, read_only=True)
-
+class CountrySerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
     class Meta:
         model = Country
         fields = '__all__'
         depth = 2
 
 
-class GenreSerializer(serializers.ModelSerializer):
-    shows = ShowLiteSerializer(many=True, read_only=True)
-
+class GenreSerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
     class Meta:
         model = Genre
         fields = '__all__'
 
 
-class RatingSerializer(serializers.ModelSerializer):
-    shows = ShowLiteSerializer(many=True, read_only=True)
-
+class RatingSerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
     class Meta:
         model = Rating
         fields = '__all__'
 
 
-class LanguageSerializer(serializers.ModelSerializer):
-    shows = ShowLiteSerializer(many=True, read_only=True)
-    countries = CountrySerializer(many=True, read_only=True)
-
+class LanguageSerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
     class Meta:
         model = Language
         fields = '__all__'
 
 
+# Compact rows for lists; the counts are columns kept up to date by signals
+class ArtistSummarySerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
+    # What an artist card shows
+    age = serializers.SerializerMethodField()
+
+    @uses('birthYear')
+    def get_age(self, artist):
+        return int(current_year) - int(artist.birthYear)
+
+    class Meta:
+        model = Artist
+        fields = ['id', 'name', 'image', 'birthYear', 'age', 'shows_count']
+
+
+class LabelSummarySerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Label
+        fields = ['id', 'name', 'image', 'shows_count']
+
+
+class CountrySummarySerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Country
+        fields = ['id', 'name', 'image', 'flag', 'shows_count', 'artists_count']
+
+
+class GenreSummarySerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Genre
+        fields = ['id', 'name', 'image', 'shows_count']
+
+
+class RatingSummarySerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Rating
+        fields = ['id', 'name', 'image', 'shows_count']
+
+
+class LanguageSummarySerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Language
+        fields = ['id', 'name', 'image', 'shows_count', 'countries_count']
+
+
 class SearchResultSerializer(serializers.Serializer):
     result_type = serializers.CharField()
     id = serializers.IntegerField()
     name = serializers.CharField()
     image = serializers.CharField(allow_null=True)
+    image_renditions = serializers.DictField(allow_null=True, required=False)
     description = serializers.CharField(allow_blank=True, allow_null=True)
 
     # Specific fields for Shows
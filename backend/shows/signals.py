@@ -0,0 +1,257 @@
+from django.apps import apps
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
+from . import cache, counts, renditions, search, typeahead
+from .cache import catalog_cache, USER_STATE
+from .serializers import (ArtistSerializer, LanguageSerializer, CountrySerializer, GenreSerializer, RatingSerializer,
+                          LabelSerializer, ShowDocumentSerializer, ShowLiteDocumentSerializer)
+
+# Fields of a user that appear in search results; preference saves do not touch the index
+USER_SEARCH_FIELDS = {'username', 'bio', 'profile_picture', 'nationality'}
+# Preferences that show up in the user's fields of shows
+USER_STATE_FIELDS = {'view_captions'}
+
+
+def search_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    result_type = sender._search_result_type
+    if result_type == 'user' and update_fields is not None and not USER_SEARCH_FIELDS & set(update_fields):
+        return
+    search.index(result_type, [instance])
+    # Entries showing this instance's name next to their own
+    if result_type == 'country':
+        search.index('artist', search.queryset('artist').filter(nationality=instance))
+        search.index('user', search.queryset('user').filter(nationality=instance))
+    elif result_type == 'rating':
+        search.index('show', search.queryset('show').filter(rating=instance))
+
+
+def search_deleted(sender, instance, **kwargs):
+    search.unindex(sender._search_result_type, [instance.id])
+
+
+for result_type, model_name in search.MODELS.items():
+    model = apps.get_model(model_name)
+    model._search_result_type = result_type
+    post_save.connect(search_saved, sender=model, dispatch_uid=f'search_saved_{result_type}')
+    post_delete.connect(search_deleted, sender=model, dispatch_uid=f'search_deleted_{result_type}')
+
+
+def typeahead_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        typeahead.typeahead.update(sender._typeahead_result_type, instance)
+
+
+def typeahead_deleted(sender, instance, **kwargs):
+    typeahead.typeahead.remove(sender._typeahead_result_type, instance.id)
+
+
+for result_type, model_name in typeahead.MODELS.items():
+    model = apps.get_model(model_name)
+    model._typeahead_result_type = result_type
+    post_save.connect(typeahead_saved, sender=model, dispatch_uid=f'typeahead_saved_{result_type}')
+    post_delete.connect(typeahead_deleted, sender=model, dispatch_uid=f'typeahead_deleted_{result_type}')
+
+
+def counts_changed(model, relation, object_ids):
+    counts.refresh(model, relation, object_ids)
+    catalog_cache.changed(model, object_ids)
+    # Suggestions are ranked by the number of shows
+    if relation == 'shows':
+        typeahead.typeahead.recount(model._typeahead_result_type, object_ids)
+
+
+def counted_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Saving a whole instance writes back the counts it was loaded with, which may be stale by now
+    if raw or created or update_fields is not None:
+        return
+    for relation in sender._counted_relations:
+        counts.refresh(sender, relation, [instance.id])
+
+
+def links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    owner, counted, relation, field = sender._counted_link
+    if action == 'pre_clear':
+        # The cleared ids are gone by post_clear
+        if reverse:
+            cleared = {instance.id}, set(getattr(instance, relation).values_list('id', flat=True))
+        else:
+            cleared = set(getattr(instance, field).values_list('id', flat=True)), {instance.id}
+        instance.__dict__.setdefault('_cleared_links', {})[field] = cleared
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if action == 'post_clear':
+            object_ids, owner_ids = instance.__dict__.get('_cleared_links', {}).pop(field, (set(), set()))
+        elif reverse:
+            object_ids, owner_ids = {instance.id}, pk_set
+        else:
+            object_ids, owner_ids = pk_set, {instance.id}
+        counts_changed(counted, relation, object_ids)
+        catalog_cache.changed(owner, owner_ids)
+
+
+def owner_deleting(sender, instance, **kwargs):
+    # Deleting the owner of many-to-many links drops them without m2m_changed
+    instance._deleted_links = {
+        field: set(getattr(instance, field).values_list('id', flat=True)) for field in sender._counted_links}
+
+
+def owner_deleted(sender, instance, **kwargs):
+    for field, object_ids in instance.__dict__.pop('_deleted_links', {}).items():
+        _, counted, relation, _ = sender._counted_links[field]
+        counts_changed(counted, relation, object_ids)
+
+
+def foreign_key_saving(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    attnames = [attname for attname, _, _ in sender._counted_foreign_keys]
+    instance._previous_links = sender._base_manager.filter(pk=instance.pk).values(*attnames).first() or {}
+
+
+def foreign_key_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance.__dict__.pop('_previous_links', {})
+    for attname, counted, relation in sender._counted_foreign_keys:
+        object_ids = {getattr(instance, attname), previous.get(attname)}
+        if created or len(object_ids) > 1:
+            counts_changed(counted, relation, object_ids)
+
+
+def foreign_key_deleted(sender, instance, **kwargs):
+    for attname, counted, relation in sender._counted_foreign_keys:
+        counts_changed(counted, relation, {getattr(instance, attname)})
+
+
+for model_name, relations in counts.COUNTED.items():
+    model = apps.get_model(model_name)
+    model._counted_relations = relations
+    post_save.connect(counted_saved, sender=model, dispatch_uid=f'counted_saved_{model_name}')
+
+Show = apps.get_model('shows.Show')
+Artist = apps.get_model('shows.Artist')
+Country = apps.get_model('shows.Country')
+# Many-to-many fields of an owner model whose links are counted on the other side
+for owner, fields in ((Show, ['artists', 'genres', 'countries', 'languages', 'labels']), (Country, ['languages'])):
+    owner._counted_links = {}
+    for field in fields:
+        descriptor = getattr(owner, field)
+        counted_link = (owner, descriptor.field.related_model, descriptor.field.remote_field.related_name, field)
+        descriptor.through._counted_link = owner._counted_links[field] = counted_link
+        m2m_changed.connect(links_changed, sender=descriptor.through,
+                            dispatch_uid=f'links_changed_{owner.__name__}_{field}')
+    pre_delete.connect(owner_deleting, sender=owner, dispatch_uid=f'owner_deleting_{owner.__name__}')
+    post_delete.connect(owner_deleted, sender=owner, dispatch_uid=f'owner_deleted_{owner.__name__}')
+# Foreign keys counted on the model they point to
+for model, field in ((Show, 'rating'), (Artist, 'nationality')):
+    remote = model._meta.get_field(field)
+    model._counted_foreign_keys = [(remote.attname, remote.related_model, remote.remote_field.related_name)]
+    pre_save.connect(foreign_key_saving, sender=model, dispatch_uid=f'foreign_key_saving_{model.__name__}')
+    post_save.connect(foreign_key_saved, sender=model, dispatch_uid=f'foreign_key_saved_{model.__name__}')
+    post_delete.connect(foreign_key_deleted, sender=model, dispatch_uid=f'foreign_key_deleted_{model.__name__}')
+
+
+def catalog_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        catalog_cache.changed(sender, [instance.id])
+
+
+def catalog_deleting(sender, instance, **kwargs):
+    # What nests the instance can only be found before its links are gone
+    catalog_cache.changed(sender, [instance.id])
+
+
+def catalog_deleted(sender, instance, **kwargs):
+    catalog_cache.bump_on_commit(sender, {sender._catalog_type: [instance.id]})
+
+
+for catalog_type, model_name in cache.MODELS.items():
+    model = apps.get_model(model_name)
+    model._catalog_type = catalog_type
+    post_save.connect(catalog_saved, sender=model, dispatch_uid=f'catalog_saved_{catalog_type}')
+    pre_delete.connect(catalog_deleting, sender=model, dispatch_uid=f'catalog_deleting_{catalog_type}')
+    post_delete.connect(catalog_deleted, sender=model, dispatch_uid=f'catalog_deleted_{catalog_type}')
+
+
+def image_saving(sender, instance, raw=False, **kwargs):
+    # A file not committed yet is an upload; it is written to the storage during the save
+    if not raw:
+        instance._uploaded_images = [name for name in sender._image_fields
+                                     if getattr(instance, name) and not getattr(instance, name)._committed]
+
+
+def image_saved(sender, instance, raw=False, **kwargs):
+    for name in instance.__dict__.pop('_uploaded_images', []):
+        try:
+            # An upload identical to a known image reuses its blob and renditions
+            renditions.generate(getattr(instance, name), force=False)
+        except Exception:
+            renditions.logger.exception('Failed to make the renditions of %s', getattr(instance, name).name)
+
+
+for model_name in renditions.MODELS:
+    model = apps.get_model(model_name)
+    model._image_fields = renditions.image_fields(model)
+    pre_save.connect(image_saving, sender=model, dispatch_uid=f'image_saving_{model_name}')
+    post_save.connect(image_saved, sender=model, dispatch_uid=f'image_saved_{model_name}')
+
+
+def user_lists_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Favorites and watchlist are part of the user's state; bumped once committed, since data
+    # cached under the new version before that would be read from the old rows
+    if reverse:
+        user_ids = [instance.id]
+    elif action == 'pre_clear':
+        instance.__dict__.setdefault('_cleared_users', set()).update(
+            sender.objects.filter(show=instance).values_list(sender._user_column, flat=True))
+        return
+    elif action in ('post_add', 'post_remove'):
+        user_ids = set(pk_set)
+    elif action == 'post_clear':
+        user_ids = instance.__dict__.pop('_cleared_users', set())
+    else:
+        return
+    transaction.on_commit(lambda: catalog_cache.bump(USER_STATE, user_ids), using=router.db_for_write(sender))
+
+
+def user_link_changed(sender, instance, raw=False, **kwargs):
+    # The toggles write the link rows themselves
+    if not raw:
+        user_id = instance.user_id
+        transaction.on_commit(lambda: catalog_cache.bump(USER_STATE, [user_id]), using=router.db_for_write(sender))
+
+
+def activity_owner_deleting(sender, instance, **kwargs):
+    # Activity rows have no foreign key constraints to cascade from, and may be in another database
+    field = 'show' if sender is Show else 'user'
+    for model in (Progress, HistoryEntry, RecentView, Favorite, WatchlistEntry):
+        model.objects.filter(**{field: instance.pk}).delete()
+
+
+def user_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and (update_fields is None or USER_STATE_FIELDS & set(update_fields)):
+        catalog_cache.bump(USER_STATE, [instance.id])
+
+
+for field in ('favorites', 'watchlist'):
+    descriptor = getattr(Show, field)
+    descriptor.through._user_column = descriptor.field.m2m_reverse_name()
+    m2m_changed.connect(user_lists_changed, sender=descriptor.through, dispatch_uid=f'user_lists_changed_{field}')
+    post_save.connect(user_link_changed, sender=descriptor.through, dispatch_uid=f'user_link_saved_{field}')
+    post_delete.connect(user_link_changed, sender=descriptor.through, dispatch_uid=f'user_link_deleted_{field}')
+post_save.connect(user_saved, sender=apps.get_model(settings.AUTH_USER_MODEL), dispatch_uid='user_state_saved')
+Progress, HistoryEntry, RecentView, Favorite, WatchlistEntry = (apps.get_model('shows', name) for name in (
+    'Progress', 'HistoryEntry', 'RecentView', 'Favorite', 'WatchlistEntry'))
+for owner in (Show, apps.get_model(settings.AUTH_USER_MODEL)):
+    pre_delete.connect(activity_owner_deleting, sender=owner, dispatch_uid=f'activity_owner_deleting_{owner.__name__}')
+
+# Cached representations nesting other entities
+catalog_cache.register('show', ShowDocumentSerializer, ShowLiteDocumentSerializer)
+catalog_cache.register('artist', ArtistSerializer)
+catalog_cache.register('country', CountrySerializer)
+catalog_cache.register('language', LanguageSerializer)
+catalog_cache.register('genre', GenreSerializer)
+catalog_cache.register('label', LabelSerializer)
+catalog_cache.register('rating', RatingSerializer)
@@ -0,0 +1,80 @@
+'''
+Sparse fieldsets and expansion control for read endpoints.
+
+`?fields=id,name,rating.name` keeps only the listed fields, dotted names
+reaching into nested objects. `?expand=rating,artists` renders only the listed
+relations as nested objects and the others as ids; without it every relation
+stays as the serializer nests it. Dropped fields are never computed, and the
+query planner in shows.prefetch plans from the pruned serializer.
+'''
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def _names(value):
+    return tuple(sorted({name.strip() for name in value.split(',') if name.strip()}))
+
+
+def requested(request):
+    # Hashable (fields, expand); None where the client did not ask
+    if request is None:
+        return None, None
+    fields = request.query_params.get(FIELDS_PARAM)
+    expand = request.query_params.get(EXPAND_PARAM)
+    return (_names(fields) if fields is not None else None,
+            _names(expand) if expand is not None else None)
+
+
+def _tree(paths):
+    # ('id', 'rating.name') -> {'id': None, 'rating': {'name': None}}; None means every field
+    tree = {}
+    for path in paths:
+        node = tree
+        *parents, leaf = path.split('.')
+        for name in parents:
+            if node.get(name, {}) is None:
+                break
+            node = node.setdefault(name, {})
+        else:
+            node[leaf] = None
+    return tree
+
+
+def prune(fields, tree, expand, prefix=''):
+    for name in list(fields):
+        if tree is not None and name not in tree:
+            del fields[name]
+            continue
+        field = fields[name]
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if not isinstance(nested, serializers.ModelSerializer) or field.source == '*':
+            continue
+        path = prefix + name
+        if expand is not None and not any(item == path or item.startswith(path + '.') for item in expand):
+            fields[name] = serializers.PrimaryKeyRelatedField(
+                read_only=True, many=nested is not field,
+                source=None if field.source in (None, name) else field.source)
+        else:
+            prune(nested.fields, tree.get(name) if tree is not None else None, expand, path + '.')
+
+
+class SparseFieldsMixin:
+    '''
+    Applies ?fields= and ?expand= to the serializer at the top of a response.
+    The query planner passes them in the context as `sparse` instead.
+    '''
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if 'sparse' in self.context:
+            spec = self.context['sparse']
+        elif self.root is self or (self.parent is self.root and isinstance(self.parent, serializers.ListSerializer)):
+            spec = requested(self.context.get('request'))
+        else:
+            return fields
+        paths, expand = spec
+        if paths is not None or expand is not None:
+            prune(fields, _tree(paths) if paths is not None else None, expand)
+        return fields
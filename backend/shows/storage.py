@@ -1,8 +1,15 @@
+from django.core.files import File
 from django.core.files.storage import FileSystemStorage
 from django.conf import settings
 from django.utils.deconstruct import deconstructible
+import hashlib
 import os
 
+# Directory of the content-addressed files, under MEDIA_ROOT
+BLOBS = 'blobs'
+
+
+# File_Rename and OverwriteStorage are kept for the migrations that reference them
 @deconstructible
 class File_Rename(object):
     def __init__(self, sub_path):
@@ -18,4 +25,38 @@ class OverwriteStorage(FileSystemStorage):
     def get_available_name(self, name, max_length=None):
         if self.exists(name):
             os.remove(os.path.join(settings.MEDIA_ROOT, name))
-        return name
\ No newline at end of file
+        return name
+
+
+def blob_hash(name):
+    # The content hash a blob is named after, None for other files
+    if not name.startswith(f'{BLOBS}/'):
+        return None
+    return os.path.basename(name).split('.')[0]
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    '''
+    Names every file after the SHA-256 of its content, under blobs/. A file is
+    never changed once written, so its URL can be cached forever, and identical
+    uploads share one file. Nothing is deleted along with the rows; the
+    prune_media command removes the blobs no longer referenced.
+    '''
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        return f'{BLOBS}/{digest[:2]}/{digest}{os.path.splitext(name)[1].lower()}'
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        # A concurrent upload of the same content ends up under a suffixed name, which is as immutable
+        return super().save(name, content, max_length=max_length)
@@ -0,0 +1,493 @@
+import base64
+import contextlib
+import io
+import json
+from unittest import mock, skipUnless
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from knox.models import AuthToken
+from rest_framework import status
+from rest_framework.test import APITestCase
+from core.routers import ACTIVITY_MODELS
+from . import search
+from .cache import catalog_cache
+from .heartbeats import HeartbeatBuffer
+from .models import Artist, Country, Favorite, Genre, Label, Language, Progress, Rating, Show
+from .prefetch import QueryBudgetExceeded, QueryCounter
+from .typeahead import TypeaheadIndex
+from .views import ArtistsViewSet, CountriesViewSet, GenresViewSet, LabelsViewSet, LanguagesViewSet, RatingsViewSet
+from .views import ShowsViewSet
+User = get_user_model()
+
+# Every test gets caches of its own, in memory
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'catalog': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog'},
+    'auth': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'auth'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES, ALLOWED_HOSTS=['testserver'])
+class QueryBudgetTests(APITestCase):
+    # The query_budgets of the views hold over a generated catalog, in their worst case
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('generate_catalog', shows=150, artists=80, users=2, seed=1, verbosity=0)
+        cls.user = User.objects.get(username='viewer0')
+        # Full pages, so a query per row would show
+        cls.user.shows_per_page = 100
+        cls.user.save()
+
+    def count_queries(self, url):
+        # A token this worker has not verified yet and an empty catalog cache
+        token = AuthToken.objects.create(self.user)[1]
+        catalog_cache.cache.clear()
+        counter = QueryCounter()
+        with contextlib.ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            response = self.client.get(url, HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        return counter.count
+
+    def assertWithinBudgets(self, viewset, basename, pk):
+        for action, budget in viewset.query_budgets.items():
+            if action == 'list':
+                url = reverse(f'{basename}-list')
+            elif action == 'retrieve':
+                url = reverse(f'{basename}-detail', args=[pk])
+            else:
+                detail = getattr(viewset, action).detail
+                url = reverse(f'{basename}-{action.replace("_", "-")}', args=[pk] if detail else [])
+            with self.subTest(url=url):
+                count = self.count_queries(url)
+                self.assertLessEqual(count, budget, f'{viewset.__name__}.{action} ran {count} queries')
+
+    def busiest(self, model):
+        return model.objects.order_by('-shows_count').values_list('id', flat=True).first()
+
+    def test_taxonomies(self):
+        for viewset, basename, model in ((ArtistsViewSet, 'artist', Artist), (CountriesViewSet, 'country', Country),
+                                         (LanguagesViewSet, 'language', Language), (GenresViewSet, 'genre', Genre),
+                                         (RatingsViewSet, 'rating', Rating), (LabelsViewSet, 'label', Label)):
+            self.assertWithinBudgets(viewset, basename, self.busiest(model))
+
+    def test_shows(self):
+        self.assertWithinBudgets(ShowsViewSet, 'show', Show.objects.filter(kind='series').values_list('id', flat=True)[0])
+
+    def test_going_over_a_budget_fails_when_enforced(self):
+        with mock.patch.object(GenresViewSet, 'query_budgets', {'list': 0}):
+            with override_settings(QUERY_BUDGETS_ENFORCED=True), self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('genre-list'))
+            # Only logged in production
+            catalog_cache.cache.clear()
+            with override_settings(QUERY_BUDGETS_ENFORCED=False), self.assertLogs('shows.prefetch', 'WARNING'):
+                self.assertEqual(self.client.get(reverse('genre-list')).status_code, status.HTTP_200_OK)
+
+
+@override_settings(CACHES=TEST_CACHES, ALLOWED_HOSTS=['testserver'])
+class HeartbeatBufferTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', 'password', email='viewer@example.com')
+        rating = Rating.objects.create(name='PG')
+        cls.show = Show.objects.create(name='Series', kind='series', rating=rating, episodes={'1': 6})
+
+    def setUp(self):
+        # One buffer per worker; neither flushes on its own during a test
+        self.buffer = HeartbeatBuffer(interval=3600, size=1000)
+        self.other_worker = HeartbeatBuffer(interval=3600, size=1000)
+
+    def tearDown(self):
+        self.buffer.flush()
+        self.other_worker.flush()
+
+    def progress(self, season=1, episode=1):
+        return Progress.objects.get(user=self.user, show=self.show, season=season, episode=episode).time
+
+    def test_duplicate_and_late_sequence_numbers_are_dropped(self):
+        self.assertTrue(self.buffer.add(self.user.id, self.show.id, 1, 1, 10, seq=5))
+        self.assertFalse(self.buffer.add(self.user.id, self.show.id, 1, 1, 99, seq=5))
+        self.assertFalse(self.buffer.add(self.user.id, self.show.id, 1, 1, 99, seq=4))
+        self.assertTrue(self.buffer.add(self.user.id, self.show.id, 1, 1, 20, seq=6))
+        [(season, episode, time, _)] = self.buffer.pending_for(self.user.id, [self.show.id])[self.show.id]
+        self.assertEqual((season, episode, time), (1, 1, 20))
+
+    def test_heartbeats_without_sequence_numbers_are_kept(self):
+        self.assertTrue(self.buffer.add(self.user.id, self.show.id, 1, 1, 10))
+        self.assertTrue(self.buffer.add(self.user.id, self.show.id, 1, 1, 5))
+        self.assertEqual(self.buffer.pending_for(self.user.id, [self.show.id])[self.show.id][0][2], 5)
+
+    def test_flush_writes_the_latest_position_of_each_episode(self):
+        self.buffer.add(self.user.id, self.show.id, 1, 1, 10, seq=1)
+        self.buffer.add(self.user.id, self.show.id, 1, 1, 40, seq=2)
+        self.buffer.add(self.user.id, self.show.id, 1, 2, 15, seq=3)
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual((self.progress(1, 1), self.progress(1, 2)), (40, 15))
+        self.assertEqual(self.buffer.pending_for(self.user.id, [self.show.id]), {})
+
+    def test_late_flush_from_another_worker_does_not_overwrite_a_newer_position(self):
+        # Received first by one worker, then later by another that flushes before it
+        self.other_worker.add(self.user.id, self.show.id, 1, 1, 10)
+        self.buffer.add(self.user.id, self.show.id, 1, 1, 60)
+        self.buffer.flush()
+        self.other_worker.flush()
+        self.assertEqual(self.progress(), 60)
+
+    def test_newer_flush_from_another_worker_overwrites(self):
+        self.buffer.add(self.user.id, self.show.id, 1, 1, 10)
+        self.buffer.flush()
+        self.other_worker.add(self.user.id, self.show.id, 1, 1, 60)
+        self.other_worker.flush()
+        self.assertEqual(self.progress(), 60)
+
+    def test_heartbeats_for_deleted_shows_are_skipped(self):
+        self.buffer.add(self.user.id, self.show.id, 1, 1, 10)
+        self.buffer.add(self.user.id, self.show.id + 1000, 1, 1, 10)
+        self.assertEqual(self.buffer.flush(), 1)
+
+    def test_failed_flush_keeps_the_heartbeats(self):
+        self.buffer.add(self.user.id, self.show.id, 1, 1, 10)
+        with mock.patch.object(self.buffer, '_write', side_effect=DatabaseError('database is locked')), \
+                self.assertLogs('shows.heartbeats', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.progress(), 10)
+
+
+@override_settings(CACHES=TEST_CACHES, ALLOWED_HOSTS=['testserver'])
+class HeartbeatViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', 'password', email='viewer@example.com')
+        rating = Rating.objects.create(name='PG')
+        cls.show = Show.objects.create(name='Series', kind='series', rating=rating, episodes={'1': 6})
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        self.url = reverse('show-heartbeat', args=[self.show.id])
+        # The worker's buffer, without the sequence numbers earlier tests left in it
+        self.heartbeats = HeartbeatBuffer(interval=3600, size=1000)
+        for module in ('shows.views', 'shows.imports'):
+            patcher = mock.patch(f'{module}.heartbeats', self.heartbeats)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_malformed_heartbeats_are_rejected(self):
+        for data in ({'season': 'one'}, {'time_reached': 'x'}, {'seq': 'first'}, {'time_reached': None}):
+            with self.subTest(data=data):
+                self.assertEqual(self.client.post(self.url, data, format='json').status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+    def test_missing_fields_default_and_negative_times_are_clamped(self):
+        response = self.client.post(self.url, {'time_reached': -5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.heartbeats.pending_for(self.user.id, [self.show.id])[self.show.id][0][:3], (1, 1, 0))
+
+    def test_duplicates_are_acknowledged_but_not_accepted(self):
+        data = {'season': 1, 'episode': 2, 'time_reached': 30, 'seq': 7}
+        self.assertTrue(self.client.post(self.url, data, format='json').data['accepted'])
+        self.assertFalse(self.client.post(self.url, data, format='json').data['accepted'])
+
+    def test_reads_include_heartbeats_not_written_yet(self):
+        Progress.objects.create(user=self.user, show=self.show, season=1, episode=1, time=70)
+        self.client.post(self.url, {'season': 1, 'episode': 2, 'time_reached': 30, 'seq': 1}, format='json')
+        self.assertFalse(Progress.objects.filter(episode=2).exists())
+        response = self.client.get(reverse('show-detail', args=[self.show.id]))
+        self.assertEqual(response.data['reached_times'], {'1': {'1': 70, '2': 30}})
+        self.assertEqual((response.data['season_reached'], response.data['episode_reached']), (1, 2))
+
+    def test_a_new_heartbeat_changes_the_etag(self):
+        detail = reverse('show-detail', args=[self.show.id])
+        self.client.post(self.url, {'season': 1, 'episode': 1, 'time_reached': 10, 'seq': 1}, format='json')
+        etag = self.client.get(detail)['ETag']
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.post(self.url, {'season': 1, 'episode': 1, 'time_reached': 20, 'seq': 2}, format='json')
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['reached_times'], {'1': {'1': 20}})
+
+
+@override_settings(CACHES=TEST_CACHES, ALLOWED_HOSTS=['testserver'])
+class KeysetPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', 'password', email='viewer@example.com', shows_per_page=2)
+        rating = Rating.objects.create(name='PG')
+        # Ties on year and on (year, name), which only the id breaks
+        for year, name in (('2020', 'Alpha'), ('2021', 'Zulu'), ('2020', 'Alpha'), ('2019', 'Alpha'),
+                           ('2020', 'Bravo'), ('2021', 'Zulu'), ('2020', 'Alpha')):
+            Show.objects.create(name=name, year=year, kind='film', rating=rating)
+        cls.expected = list(Show.objects.order_by('-year', 'name', 'id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, direction):
+        # The pages from url on, following their next or previous links
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([show['id'] for show in response.data['results']])
+            url = response.data[direction]
+        return pages
+
+    def last_page_url(self, url):
+        while True:
+            response = self.client.get(url)
+            if not response.data['next']:
+                return url
+            url = response.data['next']
+
+    def test_pages_forward_in_sort_order(self):
+        pages = self.walk(reverse('show-list'), 'next')
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), self.expected)
+
+    def test_pages_back_to_the_first(self):
+        pages = self.walk(self.last_page_url(reverse('show-list')), 'previous')
+        self.assertEqual(sum(reversed(pages), []), self.expected)
+        self.assertIsNone(self.client.get(reverse('show-list')).data['previous'])
+
+    def listing_plan(self, url):
+        # SQLite's plan for the query that reads the page at url
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        [sql] = [query['sql'] for query in queries if 'FROM "shows_show"' in query['sql'] and 'ORDER BY' in query['sql']]
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return ' | '.join(row[-1] for row in cursor.fetchall())
+
+    @skipUnless(connection.vendor == 'sqlite', 'reads the SQLite query plan')
+    def test_later_pages_seek_into_the_listing_index(self):
+        first = self.client.get(reverse('show-list'))
+        for url in (first.data['next'], self.client.get(first.data['next']).data['previous']):
+            with self.subTest(url=url):
+                plan = self.listing_plan(url)
+                self.assertIn('SEARCH shows_show USING COVERING INDEX show_listing_order', plan)
+                self.assertNotIn('SCAN', plan)
+
+    def test_favorites_page_most_recently_added_first(self):
+        for show_id in self.expected[:5]:
+            Favorite.objects.create(user=self.user, show_id=show_id)
+        pages = self.walk(reverse('show-favorites'), 'next')
+        self.assertEqual(sum(pages, []), self.expected[4::-1])
+        pages = self.walk(self.last_page_url(reverse('show-favorites')), 'previous')
+        self.assertEqual(sum(reversed(pages), []), self.expected[4::-1])
+
+    def test_invalid_cursors_are_not_found(self):
+        def encode(value):
+            return base64.urlsafe_b64encode(value.encode()).decode()
+        for cursor in ('not a cursor', encode('not json'), encode(json.dumps({'r': 1})),
+                       encode(json.dumps({'p': 'Alpha'})), encode(json.dumps({'p': ['2020', 'Alpha']})),
+                       encode(json.dumps(['2020', 'Alpha', 1]))):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('show-list'), {'cursor': cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ActivityOnlyRouter:
+    # Migrates a database the way ActivityRouter migrates the activity database
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return model_name is not None and f'{app_label}.{model_name}' in ACTIVITY_MODELS
+
+
+class ActivityMigrationTests(SimpleTestCase):
+    # Outside a transaction, which SQLite's schema editor needs
+    databases = {'default'}
+
+    def sql(self, migration):
+        out = io.StringIO()
+        call_command('sqlmigrate', 'shows', migration, stdout=out)
+        return out.getvalue()
+
+    def test_activity_tables_are_created_without_foreign_key_constraints(self):
+        # The users and shows tables are in another database, so constraints on them could not be created
+        with override_settings(DATABASE_ROUTERS=['shows.tests.ActivityOnlyRouter']):
+            for migration in ('0008', '0009'):
+                with self.subTest(migration=migration):
+                    self.assertNotIn('REFERENCES', self.sql(migration))
+
+    def test_main_database_keeps_its_constraints(self):
+        self.assertIn('REFERENCES', self.sql('0008'))
+
+
+@override_settings(CACHES=TEST_CACHES, ALLOWED_HOSTS=['testserver'])
+class CatalogCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'password', email='admin@example.com')
+        cls.genre = Genre.objects.create(name='Drama')
+
+    def setUp(self):
+        catalog_cache.cache.clear()
+
+    def genre_names(self):
+        return [genre['name'] for genre in self.client.get(reverse('genre-list')).data]
+
+    def test_cached_list_changes_once_an_admin_edit_commits(self):
+        self.assertEqual(self.genre_names(), ['Drama'])
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('admin:shows_genre_change', args=[self.genre.id]),
+                                        {'name': 'Thriller', 'description': ''})
+            self.assertEqual(response.status_code, 302)
+            # Nothing is bumped before the commit, so no list is cached under a new version from old rows
+            self.assertEqual(self.genre_names(), ['Drama'])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.genre_names(), ['Thriller'])
+
+    def test_bumping_a_version_invalidates_what_was_cached_under_it(self):
+        builds = []
+
+        def build(ids):
+            builds.append(ids)
+            return {object_id: len(builds) for object_id in ids}
+
+        variant = catalog_cache.variant('test')
+        self.assertEqual(catalog_cache.get_many('genre', [self.genre.id], variant, build), {self.genre.id: 1})
+        self.assertEqual(catalog_cache.get_many('genre', [self.genre.id], variant, build), {self.genre.id: 1})
+        catalog_cache.bump('genre', [self.genre.id])
+        self.assertEqual(catalog_cache.get_many('genre', [self.genre.id], variant, build), {self.genre.id: 2})
+        self.assertEqual(builds, [[self.genre.id], [self.genre.id]])
+
+    def test_a_current_copy_is_answered_with_not_modified(self):
+        for url in (reverse('genre-list'), reverse('genre-detail', args=[self.genre.id])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                etag = response.headers['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual((response.content, response.headers['ETag']), (b'', etag))
+                # Until the genre changes
+                with self.captureOnCommitCallbacks(execute=True):
+                    Genre.objects.filter(id=self.genre.id).update(name='Thriller')
+                    catalog_cache.changed(Genre, [self.genre.id])
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotEqual(response.headers['ETag'], etag)
+
+
+class TypeaheadTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(name='United States')
+        rating = Rating.objects.create(name='R')
+        cls.pitt = Artist.objects.create(name='Brad Pitt', birthYear=1963, nationality=country)
+        cls.dourif = Artist.objects.create(name='Brad Dourif', birthYear=1950, nationality=country)
+        cls.potter = Show.objects.create(name='Potter', year='2001', rating=rating)
+        cls.blade = Show.objects.create(name='Blade Runner', year='1982', rating=rating)
+        Genre.objects.create(name='Biography')
+        # Ranked by their number of shows
+        Artist.objects.filter(id=cls.pitt.id).update(shows_count=3)
+        Artist.objects.filter(id=cls.dourif.id).update(shows_count=1)
+        Genre.objects.filter(name='Biography').update(shows_count=5)
+
+    def setUp(self):
+        self.index = TypeaheadIndex()
+        self.index.build()
+
+    def names(self, query, limit=10):
+        return [suggestion['name'] for suggestion in self.index.suggest(query, limit)]
+
+    def test_every_typed_word_starts_a_word_of_the_name(self):
+        self.assertEqual(self.names('brad pi'), ['Brad Pitt'])
+        self.assertEqual(self.names('PITT br'), ['Brad Pitt'])
+        self.assertEqual(self.names('runner'), ['Blade Runner'])
+        self.assertEqual(self.names('brad x'), [])
+
+    def test_one_typo_in_show_and_artist_names(self):
+        # A swap, a substitution, a missing and an extra letter
+        self.assertEqual(self.names('bard'), ['Brad Pitt', 'Brad Dourif'])
+        self.assertIn('Brad Pitt', self.names('pott'))
+        self.assertEqual(self.names('blde'), ['Blade Runner'])
+        self.assertEqual(self.names('runnner'), ['Blade Runner'])
+        # Too short to be told from a typo, and genres are only matched as typed
+        self.assertEqual(self.names('bad'), [])
+        self.assertEqual(self.names('biograpy'), [])
+
+    def test_names_as_typed_rank_before_typos(self):
+        self.assertEqual(self.names('pott'), ['Potter', 'Brad Pitt'])
+        self.assertEqual(self.names('pott', limit=1), ['Potter'])
+
+    def test_ranked_by_number_of_shows_then_shows_first(self):
+        expected = ['Biography', 'Brad Pitt', 'Brad Dourif', 'Blade Runner']
+        # Both when every match is ranked and when the prefix is read from its ranked list
+        for ranked_min_words in (64, 0):
+            with self.subTest(ranked_min_words=ranked_min_words), \
+                    mock.patch('shows.typeahead.RANKED_MIN_WORDS', ranked_min_words):
+                self.assertEqual(self.names('b'), expected)
+                self.assertEqual(self.names('b', limit=2), expected[:2])
+
+    def test_changes_are_picked_up(self):
+        self.assertEqual(self.names('b', limit=1), ['Biography'])
+        self.pitt.name = 'Bradley Pitt'
+        self.index.update('artist', self.pitt)
+        self.assertEqual(self.names('bradle'), ['Bradley Pitt'])
+        self.index.remove('genre', Genre.objects.get().id)
+        self.assertEqual(self.names('b', limit=1), ['Bradley Pitt'])
+        Artist.objects.filter(id=self.dourif.id).update(shows_count=9)
+        self.index.recount('artist', [self.dourif.id])
+        self.assertEqual(self.names('b', limit=1), ['Brad Dourif'])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'the full-text index is only kept on SQLite')
+class SearchIndexTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rating = Rating.objects.create(name='TV-MA')
+        cls.show = Show.objects.create(name='The Crown', year='2016', kind='series', rating=cls.rating,
+                                       description='The reign of Queen Elizabeth II')
+        cls.genre = Genre.objects.create(name='Crown Court', description='Legal dramas')
+        country = Country.objects.create(name='United Kingdom')
+        cls.artist = Artist.objects.create(name='Claire Foy', birthYear=1984, nationality=country)
+        cls.user = User.objects.create_user('viewer', 'password', email='viewer@example.com')
+
+    def found(self, query):
+        return [(result['result_type'], result['name']) for result in search.search(query, 10)]
+
+    def test_every_word_matches_as_a_prefix(self):
+        # Grouped by result type, genres before shows
+        self.assertEqual(self.found('crow'), [('genre', 'Crown Court'), ('show', 'The Crown')])
+        self.assertEqual(self.found('the crow'), [('show', 'The Crown')])
+        self.assertEqual(self.found('clai fo'), [('artist', 'Claire Foy')])
+        self.assertEqual(self.found('crown x'), [])
+
+    def test_shows_are_also_matched_on_their_description(self):
+        self.assertEqual(self.found('elizabeth'), [('show', 'The Crown')])
+        self.assertEqual(self.found('legal'), [])
+
+    def test_payload_is_served_from_the_index(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/search/crown/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        show = response.data['results'][1]
+        self.assertEqual((show['name'], show['kind'], show['year'], show['rating']),
+                         ('The Crown', 'series', '2016', 'TV-MA'))
+
+    def test_saves_and_deletes_are_kept_in_sync(self):
+        self.show.name = 'The Queen'
+        self.show.save()
+        self.assertEqual(self.found('crown'), [('genre', 'Crown Court')])
+        self.assertEqual(self.found('queen'), [('show', 'The Queen')])
+        # Shows carry their rating's name
+        self.rating.name = 'Mature'
+        self.rating.save()
+        self.assertEqual(search.search('queen', 10)[0]['rating'], 'Mature')
+        self.genre.delete()
+        self.assertEqual(self.found('crown'), [])
+
+    def test_an_empty_index_is_filled_after_migrating(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        self.assertEqual(self.found('crown'), [])
+        search.migrated(using='default')
+        self.assertEqual(self.found('crown'), [('genre', 'Crown Court'), ('show', 'The Crown')])
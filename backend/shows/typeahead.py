@@ -0,0 +1,303 @@
+'''
+In-process typeahead index over catalog names.
+
+Every worker keeps the words of Show, Artist, Genre, Country, Language, Label
+and Rating names in a sorted list, so the words starting with what was typed are
+one bisect away, and a deletion index over the words of show and artist names so
+that a word typed with one typo still finds them. Prefixes matching many words
+keep their entries ranked, so a one-letter query reads only the first few. The
+index is built once per worker and kept current by signals, so a suggestion never
+touches the database. Signals only reach the worker that made the change, so
+every index is also rebuilt in the background once it is older than
+TYPEAHEAD_MAX_AGE.
+'''
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+MODELS = {
+    'show': 'shows.Show',
+    'artist': 'shows.Artist',
+    'genre': 'shows.Genre',
+    'country': 'shows.Country',
+    'language': 'shows.Language',
+    'label': 'shows.Label',
+    'rating': 'shows.Rating',
+}
+# Only these names are matched with typos, and only words typed with at least this many letters
+FUZZY_TYPES = {'show', 'artist'}
+FUZZY_MIN_LENGTH = 4
+# Prefixes matching more words than this are answered from a ranked list instead of ranking every match
+RANKED_MIN_WORDS = 64
+# Sorts after every word starting with a prefix
+_PREFIX_END = chr(0x10FFFF)
+
+
+def normalize(text):
+    # Lowercase words without diacritics
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r'\w+', text.casefold())
+
+
+def deletions(word):
+    # The word and every string one deleted letter away from it; two words within one typo share one
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def one_typo_apart(typed, word):
+    # Whether one insertion, deletion, substitution or swap of neighbouring letters turns typed into word
+    if abs(len(typed) - len(word)) > 1:
+        return False
+    if typed == word:
+        return True
+    start = 0
+    while start < min(len(typed), len(word)) and typed[start] == word[start]:
+        start += 1
+    if len(typed) == len(word):
+        return (typed[start + 1:] == word[start + 1:] or
+                (typed[start] == word[start + 1] and typed[start + 1] == word[start] and typed[start + 2:] == word[start + 2:]))
+    shorter, longer = (typed, word) if len(typed) < len(word) else (word, typed)
+    return shorter[start:] == longer[start + 1:]
+
+
+def _url(field):
+    return field.url if field else None
+
+
+def suggestion(result_type, instance):
+    payload = {'result_type': result_type, 'id': instance.id, 'name': instance.name}
+    if result_type == 'country':
+        payload['image'] = _url(instance.flag) or _url(instance.image)
+    else:
+        payload['image'] = _url(instance.image)
+    if result_type == 'show':
+        payload['kind'] = instance.kind
+        payload['year'] = instance.year
+    return payload
+
+
+class TypeaheadIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._built_at = 0
+        self._refreshing = False
+        self._clear()
+
+    def _clear(self):
+        # (result_type, id) -> (payload, words, weight)
+        self._entries = {}
+        # Every distinct word, sorted, and word -> entries having it
+        self._words = []
+        self._word_keys = {}
+        # deletions() of the words of the fuzzy types -> those words
+        self._deletions = {}
+        # prefix -> its entries best first, for prefixes matching many words; dropped on every change
+        self._ranked = {}
+
+    def build(self, get_model=global_apps.get_model):
+        entries = []
+        for result_type, model_name in MODELS.items():
+            # Everything but shows is ranked by its number of shows
+            for instance in get_model(model_name).objects.iterator():
+                entries.append((result_type, instance, getattr(instance, 'shows_count', 0)))
+        with self._lock:
+            self._clear()
+            for result_type, instance, weight in entries:
+                self._add(result_type, instance, weight, insort=False)
+            self._words = sorted(self._word_keys)
+            self._built = True
+            self._built_at = time.monotonic()
+        return len(entries)
+
+    def ensure_built(self):
+        if self._built and time.monotonic() - self._built_at < settings.TYPEAHEAD_MAX_AGE.total_seconds():
+            return
+        with self._lock:
+            if not self._built:
+                self.build()
+                return
+            if self._refreshing or time.monotonic() - self._built_at < settings.TYPEAHEAD_MAX_AGE.total_seconds():
+                return
+            self._refreshing = True
+        thread = threading.Thread(target=self._refresh, daemon=True)
+        thread.start()
+
+    def _refresh(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Could not refresh the typeahead index')
+        finally:
+            self._refreshing = False
+            # The thread has its own connection
+            connection.close()
+
+    def update(self, result_type, instance):
+        if not self._built:
+            return
+        with self._lock:
+            entry = self._entries.get((result_type, instance.id))
+            weight = entry[2] if entry else 0
+            self._remove((result_type, instance.id))
+            self._add(result_type, instance, weight)
+
+    def remove(self, result_type, object_id):
+        if not self._built:
+            return
+        with self._lock:
+            self._remove((result_type, object_id))
+
+    def recount(self, result_type, object_ids, get_model=global_apps.get_model):
+        # Picks up the show counts used for ranking after shows were linked or unlinked
+        if not self._built or not object_ids:
+            return
+        counts = dict(get_model(MODELS[result_type]).objects.filter(id__in=object_ids).values_list('id', 'shows_count'))
+        with self._lock:
+            for object_id, weight in counts.items():
+                entry = self._entries.get((result_type, object_id))
+                if entry:
+                    self._entries[(result_type, object_id)] = (entry[0], entry[1], weight)
+            self._ranked.clear()
+
+    def _add(self, result_type, instance, weight, insort=True):
+        key = (result_type, instance.id)
+        words = frozenset(normalize(instance.name))
+        self._entries[key] = (suggestion(result_type, instance), words, weight)
+        for word in words:
+            keys = self._word_keys.get(word)
+            if keys is None:
+                keys = self._word_keys[word] = set()
+                if insort:
+                    bisect.insort(self._words, word)
+            keys.add(key)
+            if result_type in FUZZY_TYPES and len(word) >= FUZZY_MIN_LENGTH - 1:
+                for deleted in deletions(word):
+                    self._deletions.setdefault(deleted, set()).add(word)
+        self._ranked.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for word in entry[1]:
+            keys = self._word_keys[word]
+            keys.discard(key)
+            if not keys:
+                del self._word_keys[word]
+                del self._words[bisect.bisect_left(self._words, word)]
+            # The deletion index keeps a word while any entry of a fuzzy type has it
+            if not any(other[0] in FUZZY_TYPES for other in keys):
+                for deleted in deletions(word):
+                    words = self._deletions.get(deleted)
+                    if words is not None:
+                        words.discard(word)
+                        if not words:
+                            del self._deletions[deleted]
+        self._ranked.clear()
+
+    def _rank(self, key):
+        # The most linked first, shows before the rest
+        payload, _, weight = self._entries[key]
+        return -weight, key[0] != 'show', payload['name'].casefold(), key
+
+    def _prefix_range(self, prefix):
+        # Positions in _words of the words starting with prefix
+        return bisect.bisect_left(self._words, prefix), bisect.bisect_left(self._words, prefix + _PREFIX_END)
+
+    def _prefixed(self, prefix):
+        start, end = self._prefix_range(prefix)
+        keys = set()
+        for word in self._words[start:end]:
+            keys |= self._word_keys[word]
+        return keys
+
+    def _ranked_prefixed(self, prefix):
+        ranked = self._ranked.get(prefix)
+        if ranked is None:
+            ranked = self._ranked[prefix] = sorted(self._prefixed(prefix), key=self._rank)
+        return ranked
+
+    def _misspelled(self, word):
+        # Entries of the fuzzy types with a word one typo away from the typed one
+        if len(word) < FUZZY_MIN_LENGTH:
+            return set()
+        keys = set()
+        for deleted in deletions(word):
+            for candidate in self._deletions.get(deleted, ()):
+                if one_typo_apart(word, candidate):
+                    keys |= {key for key in self._word_keys[candidate] if key[0] in FUZZY_TYPES}
+        return keys
+
+    def _typos(self, key, typed_words, misspelled):
+        # How many typed words the entry only matches through a typo, or None when one does not match at all
+        words = self._entries[key][1]
+        typos = 0
+        for typed, typo_keys in zip(typed_words, misspelled):
+            if not any(word.startswith(typed) for word in words):
+                if key not in typo_keys:
+                    return None
+                typos += 1
+        return typos
+
+    def suggest(self, query, limit):
+        # Every typed word has to start a word of the name, or be a typo of one in show and artist names
+        typed_words = normalize(query)
+        if not typed_words:
+            return []
+        self.ensure_built()
+        with self._lock:
+            misspelled = [self._misspelled(typed) for typed in typed_words]
+            # The candidates come from the typed word matching the fewest words
+            sizes = [(end - start) + len(keys) for (start, end), keys in
+                     zip(map(self._prefix_range, typed_words), misspelled)]
+            driver = sizes.index(min(sizes))
+            if sizes[driver] - len(misspelled[driver]) > RANKED_MIN_WORDS:
+                # Walked best first, so only the first few are read; typo matches rank after exact ones
+                exact, fuzzy = [], []
+                for key in self._ranked_prefixed(typed_words[driver]):
+                    typos = self._typos(key, typed_words, misspelled)
+                    if typos == 0:
+                        exact.append(key)
+                        if len(exact) == limit:
+                            return [dict(self._entries[key][0]) for key in exact]
+                    elif typos is not None:
+                        fuzzy.append((typos, self._rank(key), key))
+                # Entries only reached through a typo of the driving word
+                for key in misspelled[driver]:
+                    typos = self._typos(key, typed_words, misspelled)
+                    if typos is not None and not any(word.startswith(typed_words[driver])
+                                                     for word in self._entries[key][1]):
+                        fuzzy.append((typos, self._rank(key), key))
+                best = exact + [key for _, _, key in heapq.nsmallest(limit - len(exact), fuzzy)]
+            else:
+                candidates = self._prefixed(typed_words[driver]) | misspelled[driver]
+                scored = []
+                for key in candidates:
+                    typos = self._typos(key, typed_words, misspelled)
+                    if typos is not None:
+                        scored.append((typos, self._rank(key), key))
+                best = [key for _, _, key in heapq.nsmallest(limit, scored)]
+            return [dict(self._entries[key][0]) for key in best]
+
+typeahead = TypeaheadIndex()
+
+
+def warm():
+    # Called once per worker at start; a failure only means the first suggestion builds the index
+    try:
+        count = typeahead.build()
+    except Exception:
+        logger.exception('Could not build the typeahead index')
+        return
+    logger.info('Typeahead index built with %d names', count)
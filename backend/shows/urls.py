@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import searchView
+from .views import searchView, typeaheadView
 
 urlpatterns = [
     path("search/<str:query>/", searchView),
+    path("typeahead/<str:query>/", typeaheadView),
 ]
\ No newline at end of file
@@ -1,184 +1,304 @@
-import random
-from datetime import date, datetime
-from .imports import updateReached, changeEpisode
-from .models import Artist, Language, Country, Genre, Rating, Label, Show
+from django.conf import settings
+from . import search
+from .typeahead import typeahead
+from .heartbeats import heartbeats
+from .imports import updateReached, changeEpisode, logView
+from .pagination import KeysetPagination
+from .picker import random_shows
+from .prefetch import PlannedQueryMixin, plan_queryset
+from .sparse import requested
+from .cache import catalog_cache, USER_STATE
+from .conditional import Validators, timestamp
+from .models import Artist, Language, Country, Genre, Rating, Label, Show, Progress, Favorite, WatchlistEntry
 from .serializers import ArtistSerializer, LanguageSerializer, CountrySerializer, GenreSerializer, RatingSerializer, LabelSerializer, ShowSerializer, ShowLiteSerializer, SearchResultSerializer
+from .serializers import render_shows
+from .serializers import ArtistSummarySerializer, LanguageSummarySerializer, CountrySummarySerializer, GenreSummarySerializer, RatingSummarySerializer, LabelSummarySerializer
 
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
 from rest_framework.decorators import action
 from django.http import JsonResponse
 from django.contrib.auth import get_user_model
-from django.db.models import Case, When, Q, Exists, OuterRef
+from django.db import router, transaction
+from django.db.models import Case, When, Q
+from django.shortcuts import get_object_or_404
+from core.aio import async_api_view, run
 User = get_user_model()
+SEARCH_RESULTS_LIMIT = 50
+TYPEAHEAD_LIMIT = 10
+RANDOM_SHOWS_COUNT = 10
 
 
 # ------- Basic ViewSets -------
-class ArtistsViewSet(ModelViewSet):
+def show_page(paginator, queryset, request, view):
+    # Pages through the shows reading only their sort key, the rows are rendered from the catalog cache
+    ordering = paginator.get_ordering(queryset)
+    page = paginator.paginate_queryset(queryset.only(*{field.lstrip('-') for field in ordering}), request, view)
+    return [show.id for show in page]
+
+
+def conditional_shows(request, serializer_class, show_ids, respond):
+    '''
+    respond(rendered shows), or a 304 when the client already has them. The
+    validators are the versions of the shows, the user's state and the
+    heartbeats this worker has not written yet.
+    '''
+    versions = catalog_cache.versions('show', show_ids)
+    user_versions, pending = [], {}
+    if request.user.is_authenticated:
+        user_versions = [catalog_cache.versions(USER_STATE, [request.user.id])[request.user.id]]
+        pending = heartbeats.pending_for(request.user.id, show_ids)
+    received = [timestamp(row[3]) for rows in pending.values() for row in rows]
+    validators = Validators([*versions.values(), *user_versions, *received], serializer_class.__name__, show_ids,
+                            sorted(pending.items()), request.get_full_path(), request.get_host(), per_user=True)
+    return validators.not_modified(request) or validators.apply(
+        respond(render_shows(serializer_class, show_ids, request, versions)))
+
+
+def paginated_links(request, field_name, view=None):
+    # Pages through the user's rows of the favorites/watchlist table itself, most recently added first
+    field = getattr(Show, field_name).field
+    links = field.remote_field.through.objects.filter(**{field.m2m_reverse_field_name(): request.user})
+    paginator = KeysetPagination(ordering=['-id'])
+    show_column = field.m2m_column_name()
+    show_ids = [getattr(link, show_column) for link in paginator.paginate_queryset(
+        links.only('id', field.m2m_field_name()), request, view)]
+    return conditional_shows(request, ShowLiteSerializer, show_ids, paginator.get_paginated_response)
+
+
+def new_shows(request):
+    show_ids = catalog_cache.get_list('show', 'new', lambda: list(
+        Show.objects.order_by('-updated').values_list('id', flat=True)[:25]))
+    return conditional_shows(request, ShowLiteSerializer, show_ids, Response)
+
+
+def history_shows(request):
+    # The recent views are already distinct and bounded, so this reads at most RECENT_VIEWS_LIMIT rows
+    last_shows_ids = request.user.recent_show_ids(settings.RECENT_VIEWS_LIMIT)
+    return conditional_shows(request, ShowLiteSerializer, last_shows_ids, Response)
+
+
+def heartbeat_position(pk, data):
+    # (show_id, season, episode, time_reached, seq) of a heartbeat; TypeError or ValueError when malformed
+    seq = data.get('seq')
+    return (int(pk), int(data.get('season') or 1), int(data.get('episode') or 1),
+            max(int(data.get('time_reached', 0)), 0), None if seq is None else int(seq))
+
+
+def time_reached_update(request, show):
+    season = int(request.data.get('season', 1))
+    episode = int(request.data.get('episode', 1))
+    time_reached = int(request.data.get('time_reached', 0))
+
+    updateReached(request.user, show.id, show.kind,
+                  season, episode, time_reached)
+    return Response({
+        'message': f'Updated time reached for the {show.kind.title()} \'{show.name}\' Season {season} Episode {episode} to {time_reached}',
+        'new_time_reached': time_reached
+    }, status=status.HTTP_200_OK)
+
+
+def search_response(query):
+    if query:
+        # One ranked query over the search index; one extra row tells us there are too many
+        results = search.search(query, SEARCH_RESULTS_LIMIT + 1)
+        if len(results) > SEARCH_RESULTS_LIMIT:
+            return Response({'message': 'Be More Specific', 'query': [], 'results': []}, status=status.HTTP_300_MULTIPLE_CHOICES)
+        serializer = SearchResultSerializer(results, many=True)
+        return Response({'message': 'Search Complete', 'query': query, 'results': serializer.data}, status=status.HTTP_200_OK)
+    else:
+        return Response({'message': 'No search query provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TaxonomyViewSet(PlannedQueryMixin, ModelViewSet):
+    # Related objects are given as counts, each one paginated by its own sub-resource
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    summary_serializer_class = None
+    # Two of them authenticate the request when the worker has not verified the token lately; each viewset states
+    # its own, since the objects nest different relations (checked by shows.tests.QueryBudgetTests)
+    query_budgets = {'list': 3, 'retrieve': 3, 'shows': 7}
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return self.summary_serializer_class
+        return self.serializer_class
+
+    def _variant(self, request):
+        # Image URLs are absolute, so the host is part of the representation
+        return catalog_cache.variant(self.get_serializer_class().__name__, requested(request), request.get_host())
+
+    # Reads answer 304 from the cached versions before anything is loaded
+    def list(self, request, *args, **kwargs):
+        catalog_type = self.queryset.model._catalog_type
+        variant = self._variant(request)
+        version = catalog_cache.versions(catalog_type)
+        validators = Validators([version], variant)
+        return validators.not_modified(request) or validators.apply(Response(catalog_cache.get_list(
+            catalog_type, variant, lambda: super(TaxonomyViewSet, self).list(request, *args, **kwargs).data, version)))
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            object_id = int(kwargs[self.lookup_field])
+        except ValueError:
+            raise NotFound()
+        catalog_type = self.queryset.model._catalog_type
+        variant = self._variant(request)
+        versions = catalog_cache.versions(catalog_type, [object_id])
+        validators = Validators(versions.values(), variant)
+        return validators.not_modified(request) or validators.apply(Response(catalog_cache.get_many(
+            catalog_type, [object_id], variant,
+            lambda ids: {object_id: super(TaxonomyViewSet, self).retrieve(request, *args, **kwargs).data}, versions)[object_id]))
+
+    def _sub_resource(self, queryset, serializer_class):
+        paginator = KeysetPagination()
+        # Any change to an entity of the listed type bumps the version of the type
+        validators = Validators([catalog_cache.versions(queryset.model._catalog_type)], serializer_class.__name__,
+                                paginator.get_page_size(self.request), self.request.get_full_path(), self.request.get_host())
+        not_modified = validators.not_modified(self.request)
+        if not_modified is not None:
+            return not_modified
+        page = paginator.paginate_queryset(
+            plan_queryset(queryset, serializer_class, requested(self.request)), self.request, self)
+        serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+        return validators.apply(paginator.get_paginated_response(serializer.data))
+
+    @action(detail=True)
+    def shows(self, request, pk=None):
+        paginator = KeysetPagination()
+        # Filtered from Show rather than through the related manager, which would set the taxonomy on every row
+        # and, for the rating's foreign key, read the deferred column once per row
+        relation = self.queryset.model._meta.get_field('shows')
+        show_ids = show_page(paginator, Show.objects.filter(**{relation.field.name: self.get_object()}), request, self)
+        return conditional_shows(request, ShowLiteSerializer, show_ids, paginator.get_paginated_response)
+
+
+class ArtistsViewSet(TaxonomyViewSet):
     queryset = Artist.objects.all()
     serializer_class = ArtistSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    summary_serializer_class = ArtistSummarySerializer
+    query_budgets = {**TaxonomyViewSet.query_budgets, 'retrieve': 4, 'shows': 8}
 
 
-class LanguagesViewSet(ModelViewSet):
+class LanguagesViewSet(TaxonomyViewSet):
     queryset = Language.objects.all()
     serializer_class = LanguageSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    summary_serializer_class = LanguageSummarySerializer
+    query_budgets = {**TaxonomyViewSet.query_budgets, 'countries': 4}
 
+    @action(detail=True)
+    def countries(self, request, pk=None):
+        return self._sub_resource(self.get_object().countries.all(), CountrySummarySerializer)
 
-class CountriesViewSet(ModelViewSet):
+
+class CountriesViewSet(TaxonomyViewSet):
     queryset = Country.objects.all()
     serializer_class = CountrySerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    summary_serializer_class = CountrySummarySerializer
+    query_budgets = {**TaxonomyViewSet.query_budgets, 'retrieve': 4, 'shows': 8, 'artists': 5}
 
+    @action(detail=True)
+    def artists(self, request, pk=None):
+        return self._sub_resource(self.get_object().artists.all(), ArtistSummarySerializer)
 
-class GenresViewSet(ModelViewSet):
+
+class GenresViewSet(TaxonomyViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    summary_serializer_class = GenreSummarySerializer
 
 
-class RatingsViewSet(ModelViewSet):
+class RatingsViewSet(TaxonomyViewSet):
     queryset = Rating.objects.all()
     serializer_class = RatingSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    summary_serializer_class = RatingSummarySerializer
 
 
-class LabelsViewSet(ModelViewSet):
+class LabelsViewSet(TaxonomyViewSet):
     queryset = Label.objects.all()
     serializer_class = LabelSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    summary_serializer_class = LabelSummarySerializer
 
 
-class ShowsViewSet(ModelViewSet):
+class ShowsViewSet(PlannedQueryMixin, ModelViewSet):
     queryset = Show.objects.all()
     permission_classes = [IsAuthenticated]
-
-    def get_queryset(self):
-        user = self.request.user
-        queryset = Show.objects.select_related('rating')
-
-        # Optimization: Prefetch related fields for detail view to avoid N+1 queries
-        # depth=2 in ShowSerializer means we need deeper prefetching
-        if self.action == 'retrieve':
-            queryset = queryset.prefetch_related(
-                'artists__nationality',
-                'countries__languages',
-                'languages',
-                'genres',
-                'labels'
-            )
-
-        if user.is_authenticated:
-            # Optimize in_favorites/in_watchlist checks with annotations to avoid N+1 queries during serialization
-            queryset = queryset.annotate(
-                in_favorites_annotated=Exists(
-                    Show.objects.filter(favorites=user, pk=OuterRef('pk'))),
-                in_watchlist_annotated=Exists(
-                    Show.objects.filter(watchlist=user, pk=OuterRef('pk')))
-            )
-        return queryset
+    pagination_class = KeysetPagination
+    # Two of them authenticate a token the worker has not verified lately, retrieve also logs the view; one more on a cache miss
+    query_budgets = {'list': 6, 'retrieve': 19, 'favorites': 6, 'watchlist': 6, 'new': 6, 'history': 6, 'random': 6}
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return ShowSerializer
         return ShowLiteSerializer
 
+    # Reads render the shared catalog part of the shows from the cache and lay the user's fields over it
+    def list(self, request, *args, **kwargs):
+        show_ids = show_page(self.paginator, self.filter_queryset(Show.objects.all()), request, self)
+        return conditional_shows(request, ShowLiteSerializer, show_ids, self.get_paginated_response)
+
     def retrieve(self, request, *args, **kwargs):
-        show = self.get_object()
+        try:
+            show_id = int(kwargs['pk'])
+        except ValueError:
+            raise NotFound()
+        def respond(data):
+            if not data:
+                raise NotFound()
+            return Response(data[0])
+        response = conditional_shows(request, ShowSerializer, [show_id], respond)
 
-        # Log into history
-        today_str, time_str = str(date.today()), datetime.now().strftime("%H:%M:%S")
-        if today_str not in request.user.history:
-            request.user.history[today_str] = {}
-        request.user.history[today_str][time_str] = show.id
-        request.user.save()
+        logView(request.user, show_id)
 
-        serializer = ShowSerializer(show, context={'request': request})
-        return Response(serializer.data)
+        return response
 
     @action(detail=False)
     def favorites(self, request):
-        queryset = self.get_queryset().filter(favorites=request.user)
-        serializer = ShowLiteSerializer(
-            queryset, context={'request': request}, many=True)
-        return Response(serializer.data)
+        return paginated_links(request, 'favorites', self)
 
     @action(detail=False)
     def watchlist(self, request):
-        queryset = self.get_queryset().filter(watchlist=request.user)
-        serializer = ShowLiteSerializer(
-            queryset, context={'request': request}, many=True)
-        return Response(serializer.data)
+        return paginated_links(request, 'watchlist', self)
 
     @action(detail=False)
     def new(self, request):
-        queryset = self.get_queryset().order_by('-updated')[:25]
-        serializer = ShowLiteSerializer(
-            queryset, context={'request': request}, many=True)
-        return Response(serializer.data)
+        return new_shows(request)
 
     @action(detail=False)
     def history(self, request):
-        history_dict = request.user.history
-        if not history_dict:
-            return Response([])
-
-        # Flatten into (datetime_string, show_id) and sort descending in a single pass
-        flattened = [
-            (f"{date_str} {time_str}", show_id)
-            for date_str, times in history_dict.items()
-            for time_str, show_id in times.items()
-        ]
-        flattened.sort(key=lambda item: item[0], reverse=True)
-
-        # Deduplicate while retaining order
-        seen_show_ids = set()
-        last_shows_ids = []
-        for _, show_id in flattened:
-            if show_id not in seen_show_ids:
-                seen_show_ids.add(show_id)
-                last_shows_ids.append(show_id)
-                if len(last_shows_ids) == 40:
-                    break
-
-        if not last_shows_ids:
-            return Response([])
-
-        # Python list mapping to preserve order instead of dynamic DB Case/When
-        show_map = {show.id: show for show in self.get_queryset().filter(id__in=last_shows_ids)}
-        ordered_shows = [show_map[pk] for pk in last_shows_ids if pk in show_map]
-
-        serializer = ShowLiteSerializer(ordered_shows, context={'request': request}, many=True)
-        return Response(serializer.data)
+        return history_shows(request)
 
     @action(detail=False)
     def random(self, request):
-        # Optimization: Fetch only IDs first to avoid evaluating all fields of all shows in memory
-        all_pks = list(Show.objects.values_list('pk', flat=True))
-        if len(all_pks) > 10:
-            sample_pks = random.sample(all_pks, 10)
-            queryset = self.get_queryset().filter(pk__in=sample_pks)
-        else:
-            queryset = self.get_queryset()
-        serializer = ShowLiteSerializer(
-            queryset, context={'request': request}, many=True)
-        return Response(serializer.data)
+        # Optional filters: ?kind=, ?genre=<id> and ?unwatched=1 for shows the user has not started
+        kind = request.query_params.get('kind') or None
+        genre_id = request.query_params.get('genre') or None
+        if kind is not None and kind not in dict(Show._meta.get_field('kind').choices):
+            return Response({'message': f'Unknown kind {kind}.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            genre_id = None if genre_id is None else int(genre_id)
+        except ValueError:
+            return Response({'message': 'Invalid genre.'}, status=status.HTTP_400_BAD_REQUEST)
+        unwatched = request.query_params.get('unwatched') in ('1', 'true')
+        show_ids = random_shows.pick(request.user, RANDOM_SHOWS_COUNT, kind, genre_id, unwatched)
+        return Response(render_shows(ShowLiteSerializer, show_ids, request))
 
     @action(detail=True, methods=['post'])
     def toggleFavorite(self, request, pk=None):
         show = self.get_object()
-        if show.favorites.filter(id=request.user.id).exists():
-            show.favorites.remove(request.user)
-            message = 'Show removed from favorites successfully!'
-            current_status = False
-        else:
-            show.favorites.add(request.user)
-            message = 'Show added to favorites successfully!'
-            current_status = True
+        # The check and the write share one transaction, so concurrent toggles cannot both add or remove.
+        # The link table is used directly, since it may be in another database than users and shows
+        with transaction.atomic(using=router.db_for_write(Favorite)):
+            if Favorite.objects.filter(show=show, user=request.user).delete()[0]:
+                message = 'Show removed from favorites successfully!'
+                current_status = False
+            else:
+                Favorite.objects.create(show=show, user=request.user)
+                message = 'Show added to favorites successfully!'
+                current_status = True
 
         return Response({
             'message': message,
@@ -188,14 +308,16 @@ class ShowsViewSet(ModelViewSet):
     @action(detail=True, methods=['post'])
     def toggleWatchlist(self, request, pk=None):
         show = self.get_object()
-        if show.watchlist.filter(id=request.user.id).exists():
-            show.watchlist.remove(request.user)
-            message = 'Show removed from watchlist successfully!'
-            current_status = False
-        else:
-            show.watchlist.add(request.user)
-            message = 'Show added to watchlist successfully!'
-            current_status = True
+        # The check and the write share one transaction, so concurrent toggles cannot both add or remove.
+        # The link table is used directly, since it may be in another database than users and shows
+        with transaction.atomic(using=router.db_for_write(WatchlistEntry)):
+            if WatchlistEntry.objects.filter(show=show, user=request.user).delete()[0]:
+                message = 'Show removed from watchlist successfully!'
+                current_status = False
+            else:
+                WatchlistEntry.objects.create(show=show, user=request.user)
+                message = 'Show added to watchlist successfully!'
+                current_status = True
 
         return Response({
             'message': message,
@@ -275,26 +397,26 @@ class ShowsViewSet(ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def update_time_reached(self, request, pk=None):
-        show = self.get_object()
-        season = int(request.data.get('season', 1))
-        episode = int(request.data.get('episode', 1))
-        time_reached = int(request.data.get('time_reached', 0))
+        return time_reached_update(request, self.get_object())
 
-        updateReached(request.user, show.id, show.kind,
-                      season, episode, time_reached)
-        return Response({
-            'message': f'Updated time reached for the {show.kind.title()} \'{show.name}\' Season {season} Episode {episode} to {time_reached}',
-            'new_time_reached': time_reached
-        }, status=status.HTTP_200_OK)
+    @action(detail=True, methods=['post'])
+    def heartbeat(self, request, pk=None):
+        # Hot path while a video plays: no get_object() and no write, the buffer is flushed in bulk
+        try:
+            position = heartbeat_position(pk, request.data)
+        except (TypeError, ValueError):
+            return Response({'message': 'Invalid heartbeat.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        accepted = heartbeats.add(request.user.id, *position)
+        return Response({'accepted': accepted}, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=True, methods=['post'])
     def mark_as_unwatched(self, request, pk=None):
         show = self.get_object()
-        user = request.user
-        show_id = str(show.id)
-        if show_id in user.reached:
-            del user.reached[show_id]
-            user.save()
+        heartbeats.discard(request.user.id, show.id)
+        deleted, _ = Progress.objects.filter(user=request.user, show=show).delete()
+        catalog_cache.bump(USER_STATE, [request.user.id])
+        if deleted:
             return Response({'message': f'Show {show.name} marked as unwatched.'}, status=status.HTTP_200_OK)
         return Response({'message': f'Show {show.name} was already unwatched.'}, status=status.HTTP_200_OK)
 
@@ -304,83 +426,66 @@ class ShowsViewSet(ModelViewSet):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def searchView(request, query):
-    if query:
-        results = []
-        for country in Country.objects.filter(name__icontains=query):
-            results.append({
-                'result_type': 'country',
-                'id': country.id,
-                'name': country.name,
-                'image': country.flag.url if country.flag else (country.image.url if country.image else None),
-                'description': country.description[:100] + '...' if len(country.description) > 100 else country.description
-            })
-        for language in Language.objects.filter(name__icontains=query):
-            results.append({
-                'result_type': 'language',
-                'id': language.id,
-                'name': language.name,
-                'image': language.image.url if language.image else None,
-                'description': language.description[:100] + '...' if len(language.description) > 100 else language.description
-            })
-        for genre in Genre.objects.filter(name__icontains=query):
-            results.append({
-                'result_type': 'genre',
-                'id': genre.id,
-                'name': genre.name,
-                'image': genre.image.url if genre.image else None,
-                'description': genre.description[:100] + '...' if len(genre.description) > 100 else genre.description
-            })
-        for label in Label.objects.filter(name__icontains=query):
-            results.append({
-                'result_type': 'label',
-                'id': label.id,
-                'name': label.name,
-                'image': label.image.url if label.image else None,
-                'description': label.description[:100] + '...' if len(label.description) > 100 else label.description
-            })
-        for rating in Rating.objects.filter(name__icontains=query):
-            results.append({
-                'result_type': 'rating',
-                'id': rating.id,
-                'name': rating.name,
-                'image': rating.image.url if rating.image else None,
-                'description': rating.description[:100] + '...' if len(rating.description) > 100 else rating.description
-            })
-        for user in User.objects.filter(username__icontains=query).select_related('nationality'):
-            results.append({
-                'result_type': 'user',
-                'id': user.id,
-                'name': user.username,
-                'image': user.profile_picture.url if user.profile_picture else None,
-                'description': user.bio[:100] + '...' if user.bio and len(user.bio) > 100 else (user.bio or 'No bio provided'),
-                'nationality': user.nationality.name if user.nationality else None
-            })
-        for show in Show.objects.filter(Q(name__icontains=query) | Q(description__icontains=query)).select_related('rating'):
-            results.append({
-                'result_type': 'show',
-                'kind': show.kind,
-                'id': show.id,
-                'name': show.name,
-                'image': show.image.url if show.image else None,
-                'description': show.description[:100] + '...' if len(show.description) > 100 else show.description,
-                'year': show.year,
-                'rating': show.rating.name if show.rating else None
-            })
-        for artist in Artist.objects.filter(name__icontains=query).select_related('nationality'):
-            results.append({
-                'result_type': 'artist',
-                'id': artist.id,
-                'name': artist.name,
-                'image': artist.image.url if artist.image else None,
-                'description': artist.description[:100] + '...' if len(artist.description) > 100 else artist.description,
-                'birthYear': artist.birthYear,
-                'age': artist.age,
-                'nationality': artist.nationality.name if artist.nationality else None
-            })
-
-        if len(results) > 50:
-            return Response({'message': 'Be More Specific', 'query': [], 'results': []}, status=status.HTTP_300_MULTIPLE_CHOICES)
-        serializer = SearchResultSerializer(results, many=True)
-        return Response({'message': 'Search Complete', 'query': query, 'results': serializer.data}, status=status.HTTP_200_OK)
-    else:
-        return Response({'message': 'No search query provided'}, status=status.HTTP_400_BAD_REQUEST)
+    return search_response(query)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def typeaheadView(request, query):
+    # Served from the worker's in-memory index, so it is cheap enough to call on every keystroke
+    return Response({'query': query, 'results': typeahead.suggest(query, TYPEAHEAD_LIMIT)}, status=status.HTTP_200_OK)
+
+
+# ------- Async Views -------
+# Served instead of their sync counterparts by core.asgi (see core.aio); the blocking work runs on the ORM threads
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def asyncFavoritesView(request):
+    return await run(paginated_links, request, 'favorites')
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def asyncWatchlistView(request):
+    return await run(paginated_links, request, 'watchlist')
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def asyncNewView(request):
+    return await run(new_shows, request)
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def asyncHistoryView(request):
+    return await run(history_shows, request)
+
+
+@async_api_view(['POST'])
+@permission_classes([IsAuthenticated])
+async def asyncHeartbeatView(request, pk):
+    # Never leaves the loop unless the buffer fills up
+    try:
+        position = heartbeat_position(pk, request.data)
+    except (TypeError, ValueError):
+        return Response({'message': 'Invalid heartbeat.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    accepted = await heartbeats.aadd(request.user.id, *position)
+    return Response({'accepted': accepted}, status=status.HTTP_202_ACCEPTED)
+
+
+@async_api_view(['POST'])
+@permission_classes([IsAuthenticated])
+async def asyncUpdateTimeReachedView(request, pk):
+    def update():
+        return time_reached_update(request, get_object_or_404(Show.objects.only('id', 'name', 'kind'), pk=pk))
+    return await run(update)
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def asyncSearchView(request, query):
+    return await run(search_response, query)
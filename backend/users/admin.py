@@ -3,7 +3,7 @@ from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin
 
-from .models import CustomUser
+from .models import CustomUser, OutboxEmail
 
 # Register your models here.
 class CustomUserAdmin(UserAdmin):
@@ -22,10 +22,16 @@ class CustomUserAdmin(UserAdmin):
             "Advanced options",
             {
                 "classes": ["collapse"],
-                "fields": ['time_autosave', 'autoplay', 'view_captions', 'remember_home_tab', 'home_tab', 'shows_per_page', 'reached', 'history'],
+                "fields": ['time_autosave', 'autoplay', 'view_captions', 'remember_home_tab', 'home_tab', 'shows_per_page'],
             },
         ),
     ) + UserAdmin.fieldsets
     search_fields = ('username', 'email', 'nickname')
     ordering = ('username',)
-admin.site.register(CustomUser, CustomUserAdmin)
\ No newline at end of file
+admin.site.register(CustomUser, CustomUserAdmin)
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'created', 'sent', 'attempts', 'failed')
+    list_filter = ('failed',)
+    search_fields = ('to', 'subject')
@@ -1,4 +1,17 @@
+import binascii
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from knox.auth import TokenAuthentication
+from knox.crypto import hash_token
+from knox.settings import CONSTANTS
+from rest_framework import exceptions
 User= get_user_model()
 
 class Auth:
@@ -14,4 +27,95 @@ class Auth:
         try:
             return User.objects.get(pk=user_id)
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
+
+
+# Revocation versions shared by every worker; bumping one makes them check the token against the database again
+def token_version_key(token_key):
+    return f'token:{token_key}'
+
+
+def user_version_key(user_id):
+    return f'user:{user_id}'
+
+
+def revoke(*keys):
+    caches['auth'].set_many({key: time.time_ns() for key in keys})
+
+
+def _versions(*keys):
+    found = caches['auth'].get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        caches['auth'].set_many(missing)
+        found.update(missing)
+    return tuple(found[key] for key in keys)
+
+
+class VerifiedTokens:
+    '''
+    Bounded LRU of the tokens a worker verified, by digest.
+
+    An entry holds the pickled token with its user, so every request gets its
+    own copies, and the revocation versions it was verified under.
+    '''
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+            return entry
+
+    def put(self, digest, entry):
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+
+verified_tokens = VerifiedTokens(settings.AUTH_CACHE_SIZE)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''
+    knox token authentication that skips the database for tokens this worker
+    verified lately. An entry is used until its token expires or it gets older
+    than AUTH_CACHE_MAX_AGE, and only while the revocation versions of its token
+    and user stay the same: deleting a token (logout, logout all) or saving the
+    user moves them for every worker.
+    '''
+
+    def authenticate_credentials(self, token):
+        try:
+            digest = hash_token(token.decode('utf-8'))
+        except (TypeError, ValueError, binascii.Error):
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        now = timezone.now()
+        entry = verified_tokens.get(digest)
+        if entry is not None:
+            payload, keys, versions, verified, expiry = entry
+            if (now - verified < settings.AUTH_CACHE_MAX_AGE and (expiry is None or expiry > now)
+                    and _versions(*keys) == versions):
+                auth_token = pickle.loads(payload)
+                return auth_token.user, auth_token
+            verified_tokens.discard(digest)
+
+        # The token's version is read first, so a logout while verifying is not missed
+        token_key = token_version_key(token.decode('utf-8')[:CONSTANTS.TOKEN_KEY_LENGTH])
+        token_version = _versions(token_key)
+        user, auth_token = super().authenticate_credentials(token)
+        keys = (token_key, user_version_key(user.id))
+        versions = token_version + _versions(keys[1])
+        verified_tokens.put(digest, (pickle.dumps(auth_token), keys, versions, now, auth_token.expiry))
+        return user, auth_token
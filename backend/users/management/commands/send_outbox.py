@@ -0,0 +1,45 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from users import outbox
+
+# Seconds between purges of old sent emails
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Sends the queued emails in batches, retrying failed ones with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send what is due and exit')
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH)
+        parser.add_argument('--interval', type=float, default=settings.EMAIL_OUTBOX_POLL_INTERVAL,
+                            help='Seconds to wait when nothing is due')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['once']:
+            total_sent = total_failed = 0
+            while True:
+                sent, failed = outbox.send_batch(batch_size)
+                total_sent, total_failed = total_sent + sent, total_failed + failed
+                if sent + failed < batch_size:
+                    break
+            purged = outbox.purge()
+            self.stdout.write(self.style.SUCCESS(
+                f'Sent {total_sent} emails, {total_failed} failed, purged {purged} old ones.'))
+            return
+
+        last_purge = 0
+        while True:
+            sent, failed = outbox.send_batch(batch_size)
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} emails, {failed} failed.')
+            if sent + failed < batch_size:
+                if time.monotonic() - last_purge > PURGE_INTERVAL:
+                    outbox.purge()
+                    last_purge = time.monotonic()
+                # Idle: do not hold a database connection while waiting
+                connection.close()
+                time.sleep(options['interval'])
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_customuser_shows_per_page'),
+        # Existing progress is copied into shows.Progress before the column is dropped
+        ('shows', '0008_progress'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customuser',
+            name='reached',
+        ),
+    ]
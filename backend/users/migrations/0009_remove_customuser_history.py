@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:23
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_remove_customuser_reached'),
+        # Existing history is copied into shows.HistoryEntry before the column is dropped
+        ('shows', '0009_history'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customuser',
+            name='history',
+        ),
+    ]
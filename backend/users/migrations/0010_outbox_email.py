@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_remove_customuser_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200)),
+                ('template', models.CharField(max_length=100)),
+                ('to', models.EmailField(max_length=254)),
+                ('context', models.JSONField(default=dict)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('sent', models.DateTimeField(blank=True, null=True)),
+                ('failed', models.BooleanField(default=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sent', 'failed', 'next_attempt'], name='outbox_due')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:49
+
+import shows.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_outbox_email'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_picture',
+            field=models.ImageField(blank=True, null=True, storage=shows.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+    ]
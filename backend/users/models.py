@@ -1,7 +1,8 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.base_user import BaseUserManager
-from .storage import OverwriteStorage, File_Rename
+from shows.storage import ContentAddressedStorage
 
 
 class CustomUserManager(BaseUserManager):
@@ -25,17 +26,12 @@ class CustomUser(AbstractUser):
     email = models.EmailField(unique=True)
     nickname = models.CharField(max_length=30, blank=True, null=True)
     birthday = models.DateField(null=True, blank=True)
-    profile_picture = models.ImageField(upload_to=File_Rename(
-        'users/profile_pic/'), storage=OverwriteStorage(), blank=True, null=True)
+    profile_picture = models.ImageField(storage=ContentAddressedStorage(), blank=True, null=True)
     bio = models.TextField(max_length=500, blank=True, null=True)
     nationality = models.ForeignKey(
         'shows.Country', on_delete=models.CASCADE, blank=True, null=True)
 
-    # shows related fields
-    reached = models.JSONField(
-        encoder=None, decoder=None, default=dict, blank=True)
-    history = models.JSONField(
-        encoder=None, decoder=None, default=dict, blank=True)
+    # shows related data lives in shows.Progress, shows.HistoryEntry and shows.RecentView
     # user preferences
     time_autosave = models.BooleanField(default=True)
     autoplay = models.BooleanField(default=True)
@@ -50,3 +46,34 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return self.username
+
+    # Progress and history are only read through these, for the shows and rows a response needs
+    def reached_for(self, show_ids):
+        from shows.imports import getReached
+        return getReached(self, show_ids)
+
+    def recent_show_ids(self, limit):
+        return list(self.recent_views.order_by('-viewed_at').values_list('show_id', flat=True)[:limit])
+
+
+class OutboxEmail(models.Model):
+    # Emails are queued here inside the request and rendered and sent by the send_outbox worker
+    subject = models.CharField(max_length=200)
+    template = models.CharField(max_length=100)
+    to = models.EmailField()
+    context = models.JSONField(default=dict)
+    created = models.DateTimeField(auto_now_add=True)
+    # Due time of the next attempt, pushed back while a worker holds the email and after failures
+    next_attempt = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent = models.DateTimeField(null=True, blank=True)
+    failed = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'{self.subject} to {self.to}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sent', 'failed', 'next_attempt'], name='outbox_due'),
+        ]
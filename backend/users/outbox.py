@@ -0,0 +1,99 @@
+'''
+Durable outbox for the emails sent to users.
+
+Requests only insert a row. The send_outbox worker claims due rows in batches,
+renders them and sends them over one SMTP connection, pushing failed ones back
+with exponential backoff until EMAIL_MAX_ATTEMPTS.
+'''
+import logging
+import os
+from datetime import datetime
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(subject, template, user, btnLink=''):
+    # The context is taken now, so the email says what was true when it was asked for
+    return OutboxEmail.objects.create(subject=subject, template=template, to=user.email, context={
+        'name': user.username,
+        'email': user.email,
+        'year': datetime.now().year,
+        'button_link': btnLink,
+        'link_to_simsy': os.getenv('FRONTEND_DOMAIN'),
+        'admin_email': os.getenv('EMAIL_HOST'),
+    })
+
+
+def render(email):
+    html_content = render_to_string(email.template, email.context)
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=strip_tags(html_content),
+        from_email=None,
+        to=[email.to],
+    )
+    message.attach_alternative(html_content, "text/html")
+    return message
+
+
+def claim(batch_size):
+    # Pushing next_attempt past the lease keeps other workers off these rows while they are sent
+    now = timezone.now()
+    due = OutboxEmail.objects.filter(sent=None, failed=False, next_attempt__lte=now)
+    ids = list(due.order_by('next_attempt').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    lease = now + settings.EMAIL_OUTBOX_LEASE
+    due.filter(id__in=ids).update(next_attempt=lease)
+    return list(OutboxEmail.objects.filter(id__in=ids, next_attempt=lease).order_by('id'))
+
+
+def backoff(attempts):
+    return settings.EMAIL_RETRY_BACKOFF * 2 ** (attempts - 1)
+
+
+def send_batch(batch_size=None, connection=None):
+    # Sends one batch of due emails; returns (sent, failed)
+    emails = claim(batch_size or settings.EMAIL_OUTBOX_BATCH)
+    if not emails:
+        return 0, 0
+    connection = connection or get_connection()
+    sent, failed = [], 0
+    try:
+        for email in emails:
+            try:
+                # Opens the connection the first time and after a failure, a no-op otherwise
+                connection.open()
+                connection.send_messages([render(email)])
+            except Exception as error:
+                failed += 1
+                _failed(email, error)
+                # The connection may be what broke
+                connection.close()
+            else:
+                sent.append(email.id)
+    finally:
+        connection.close()
+        OutboxEmail.objects.filter(id__in=sent).update(sent=timezone.now())
+    return len(sent), failed
+
+
+def _failed(email, error):
+    email.attempts += 1
+    email.last_error = f'{type(error).__name__}: {error}'
+    email.failed = email.attempts >= settings.EMAIL_MAX_ATTEMPTS
+    email.next_attempt = timezone.now() + backoff(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'failed', 'next_attempt'])
+    log = logger.error if email.failed else logger.warning
+    log('Email %s to %s failed (attempt %d): %s', email.id, email.to, email.attempts, email.last_error)
+
+
+def purge():
+    # Sent emails are only kept for a while
+    return OutboxEmail.objects.filter(sent__lt=timezone.now() - settings.EMAIL_OUTBOX_RETENTION).delete()[0]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from shows.renditions import RenditionsMixin
+from shows.sparse import SparseFieldsMixin
 from .models import *
 User = get_user_model()
 
@@ -37,10 +39,9 @@ class RegisterSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, RenditionsMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
-        exclude = ['password', 'groups',
-                   'user_permissions', 'history', 'reached']
+        exclude = ['password', 'groups', 'user_permissions']
         read_only_fields = ['id', 'date_joined', 'is_active',
                             'is_staff', 'is_superuser', 'last_login']
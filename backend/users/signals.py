@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from knox.models import get_token_model
+from .auth import revoke, token_version_key, user_version_key
+User = get_user_model()
+
+
+def token_deleted(sender, instance, **kwargs):
+    # Logout and logout all delete tokens
+    revoke(token_version_key(instance.token_key))
+
+
+def user_changed(sender, instance, **kwargs):
+    # Cached tokens carry a copy of their user
+    revoke(user_version_key(instance.id))
+
+
+post_delete.connect(token_deleted, sender=get_token_model(), dispatch_uid='auth_token_deleted')
+post_save.connect(user_changed, sender=User, dispatch_uid='auth_user_saved')
+post_delete.connect(user_changed, sender=User, dispatch_uid='auth_user_deleted')
@@ -3,6 +3,8 @@ from django.conf import settings
 from django.utils.deconstruct import deconstructible
 import os
 
+
+# File_Rename and OverwriteStorage are kept for the migrations that reference them
 @deconstructible
 class File_Rename(object):
     def __init__(self, sub_path):
@@ -18,4 +20,4 @@ class OverwriteStorage(FileSystemStorage):
     def get_available_name(self, username, max_length=None):
         if self.exists(username):
             os.remove(os.path.join(settings.MEDIA_ROOT, username))
-        return username
\ No newline at end of file
+        return username
@@ -1,3 +1,151 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from knox.crypto import hash_token
+from knox.models import AuthToken
+from rest_framework import status
+from rest_framework.test import APITestCase
+from shows.tests import TEST_CACHES
+from . import outbox
+from .auth import verified_tokens
+from .models import OutboxEmail
 
-# Create your tests here.
+User = get_user_model()
+
+
+class RefusingBackend(EmailBackend):
+    # Keeps sent messages in mail.outbox like the test backend, but refuses those to refused addresses
+    def send_messages(self, messages):
+        for message in messages:
+            if any(to.startswith('refused') for to in message.to):
+                raise ConnectionRefusedError('Connection refused')
+        return super().send_messages(messages)
+
+
+class OutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', 'password', email='viewer@example.com')
+        cls.refused = User.objects.create_user('refused', 'password', email='refused@example.com')
+
+    def setUp(self):
+        OutboxEmail.objects.all().delete()
+
+    def enqueue(self, user, count=1):
+        return [outbox.enqueue(f'Login Notification {n}', 'email/login.html', user).id for n in range(count)]
+
+    def later(self, delta):
+        # Every worker's clock moved on by delta
+        return mock.patch('django.utils.timezone.now', return_value=timezone.now() + delta)
+
+    def test_due_emails_are_sent_once(self):
+        self.enqueue(self.user, 3)
+        self.assertEqual(outbox.send_batch(), (3, 0))
+        self.assertEqual(sorted(message.subject for message in mail.outbox),
+                         ['Login Notification 0', 'Login Notification 1', 'Login Notification 2'])
+        self.assertFalse(OutboxEmail.objects.filter(sent=None).exists())
+        self.assertEqual(outbox.send_batch(), (0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_claimed_emails_come_back_once_the_lease_expires(self):
+        ids = self.enqueue(self.user, 2)
+        self.assertEqual([email.id for email in outbox.claim(10)], ids)
+        # Held while the worker that claimed them may still be sending
+        self.assertEqual(outbox.claim(10), [])
+        with self.later(settings.EMAIL_OUTBOX_LEASE - timedelta(seconds=1)):
+            self.assertEqual(outbox.claim(10), [])
+        # That worker died, so another one takes them
+        with self.later(settings.EMAIL_OUTBOX_LEASE + timedelta(seconds=1)):
+            self.assertEqual([email.id for email in outbox.claim(10)], ids)
+
+    def test_claims_are_limited_to_the_batch_size(self):
+        ids = self.enqueue(self.user, 3)
+        self.assertEqual([email.id for email in outbox.claim(2)], ids[:2])
+        self.assertEqual([email.id for email in outbox.claim(2)], ids[2:])
+
+    def test_two_workers_never_send_the_same_email(self):
+        ids = self.enqueue(self.user, 2)
+        # The second worker claims between the first one reading the due ids and leasing them
+        update, second = QuerySet.update, []
+
+        def interleaved(queryset, **kwargs):
+            if not second and queryset.model is OutboxEmail:
+                second.append(None)
+                second[:] = outbox.claim(10)
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', interleaved):
+            first = outbox.claim(10)
+        self.assertEqual(first, [])
+        self.assertEqual([email.id for email in second], ids)
+
+    def test_failed_emails_are_retried_with_backoff(self):
+        [refused] = self.enqueue(self.refused)
+        self.enqueue(self.user)
+        with self.assertLogs('users.outbox', 'WARNING'):
+            self.assertEqual(outbox.send_batch(connection=RefusingBackend()), (1, 1))
+        # The other email still went out over the same connection
+        self.assertEqual([message.to for message in mail.outbox], [['viewer@example.com']])
+        email = OutboxEmail.objects.get(id=refused)
+        self.assertEqual((email.attempts, email.sent, email.failed), (1, None, False))
+        self.assertEqual(email.last_error, 'ConnectionRefusedError: Connection refused')
+
+        # Not before the backoff, which doubles after every attempt
+        with self.later(settings.EMAIL_RETRY_BACKOFF - timedelta(seconds=1)):
+            self.assertEqual(outbox.send_batch(connection=RefusingBackend()), (0, 0))
+        with self.later(settings.EMAIL_RETRY_BACKOFF + timedelta(seconds=1)), self.assertLogs('users.outbox', 'WARNING'):
+            self.assertEqual(outbox.send_batch(connection=RefusingBackend()), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 2)
+        self.assertAlmostEqual(email.next_attempt - timezone.now(), settings.EMAIL_RETRY_BACKOFF * 3,
+                               delta=timedelta(seconds=5))
+
+    def test_emails_are_given_up_after_the_last_attempt(self):
+        [refused] = self.enqueue(self.refused)
+        OutboxEmail.objects.filter(id=refused).update(attempts=settings.EMAIL_MAX_ATTEMPTS - 1)
+        with self.assertLogs('users.outbox', 'ERROR'):
+            self.assertEqual(outbox.send_batch(connection=RefusingBackend()), (0, 1))
+        self.assertTrue(OutboxEmail.objects.get(id=refused).failed)
+        with self.later(settings.EMAIL_RETRY_BACKOFF * 2 ** settings.EMAIL_MAX_ATTEMPTS):
+            self.assertEqual(outbox.claim(10), [])
+
+    def test_only_sent_emails_past_retention_are_purged(self):
+        old, recent, unsent = self.enqueue(self.user, 3)
+        OutboxEmail.objects.filter(id=old).update(sent=timezone.now() - settings.EMAIL_OUTBOX_RETENTION - timedelta(days=1))
+        OutboxEmail.objects.filter(id=recent).update(sent=timezone.now())
+        OutboxEmail.objects.filter(id=unsent).update(created=timezone.now() - 2 * settings.EMAIL_OUTBOX_RETENTION)
+        self.assertEqual(outbox.purge(), 1)
+        self.assertEqual(sorted(OutboxEmail.objects.values_list('id', flat=True)), [recent, unsent])
+
+
+@override_settings(CACHES=TEST_CACHES, ALLOWED_HOSTS=['testserver'])
+class CachedTokenAuthenticationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', 'password', email='viewer@example.com')
+
+    def current(self, token):
+        return self.client.get(reverse('users-current'), HTTP_AUTHORIZATION=f'Token {token}')
+
+    def test_a_deleted_token_is_rejected_though_it_was_verified_before(self):
+        auth_token, token = AuthToken.objects.create(self.user)
+        self.assertEqual(self.current(token).status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(verified_tokens.get(hash_token(token)))
+        # Logging out elsewhere deletes the token without touching this worker's cache
+        auth_token.delete()
+        self.assertIsNotNone(verified_tokens.get(hash_token(token)))
+        self.assertEqual(self.current(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_tokens_of_the_user_stay_valid(self):
+        auth_token, token = AuthToken.objects.create(self.user)
+        other = AuthToken.objects.create(self.user)[1]
+        self.assertEqual(self.current(other).status_code, status.HTTP_200_OK)
+        auth_token.delete()
+        self.assertEqual(self.current(other).status_code, status.HTTP_200_OK)
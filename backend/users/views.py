@@ -1,41 +1,23 @@
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 from django.contrib.auth import get_user_model, authenticate
 from django.dispatch import receiver
 from rest_framework import status
 from rest_framework.viewsets import ViewSet, ModelViewSet
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
-from rest_framework.decorators import action
+from rest_framework.decorators import action, permission_classes
 from rest_framework.response import Response
 from django_rest_passwordreset.signals import reset_password_token_created, post_password_reset  # type: ignore
 from knox.models import AuthToken  # type: ignore
-from datetime import datetime
+from core.aio import async_api_view, run
+from shows.prefetch import PlannedQueryMixin
+from . import outbox
 from .serializers import LoginSerializer, RegisterSerializer, UserSerializer
 from .models import *
 import os
 User = get_user_model()
 
 
-def send_email(subject, template, user, btnLink=""):
-    context = {
-        'name': user.username,
-        'email': user.email,
-        'year': datetime.now().year,
-        'button_link': btnLink,
-        'link_to_simsy': os.getenv('FRONTEND_DOMAIN'),
-        'admin_email': os.getenv('EMAIL_HOST'),
-    }
-    html_content = render_to_string(template, context)
-    plain_message = strip_tags(html_content)
-    message = EmailMultiAlternatives(
-        subject=subject,
-        body=plain_message,
-        from_email=None,
-        to=[user.email],
-    )
-    message.attach_alternative(html_content, "text/html")
-    message.send()
+# Emails are queued and sent by the send_outbox worker, so requests never wait on SMTP
+send_email = outbox.enqueue
 
 
 @receiver(reset_password_token_created)
@@ -93,18 +75,29 @@ class RegisterViewSet(ViewSet):
             return Response(serializer.errors, status=400)
 
 
-class UsersViewSet(ModelViewSet):
+def current_user(request):
+    if request.method in ['PATCH', 'PUT']:
+        serializer = UserSerializer(request.user, data=request.data, partial=True, context={'request': request})
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    serializer = UserSerializer(request.user, context={'request': request})
+    return Response(serializer.data)
+
+
+class UsersViewSet(PlannedQueryMixin, ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
     @action(detail=False, methods=['get', 'patch', 'put'])
     def current(self, request):
-        if request.method in ['PATCH', 'PUT']:
-            serializer = UserSerializer(request.user, data=request.data, partial=True)
-            if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data)
\ No newline at end of file
+        return current_user(request)
+
+
+# Served instead of UsersViewSet.current by core.asgi (see core.aio)
+@async_api_view(['GET', 'PATCH', 'PUT'])
+@permission_classes([IsAuthenticated])
+async def asyncCurrentUserView(request):
+    return await run(current_user, request)
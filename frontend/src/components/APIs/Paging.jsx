@@ -0,0 +1,32 @@
+import { useState, useEffect, useCallback } from 'react';
+import axiosInstance from './Axios';
+
+/**
+ * Loads a cursor-paginated endpoint ({ next, previous, results }) one page at a time.
+ * goTo takes the next or previous link of the current page.
+ */
+export function usePagedList(endpoint) {
+	const [page, setPage] = useState(null);
+	const [loading, setLoading] = useState(true);
+	const [error, setError] = useState(null);
+
+	const goTo = useCallback(async (url) => {
+		setLoading(true);
+		try {
+			const response = await axiosInstance.get(url);
+			setPage(response.data);
+			setError(null);
+		} catch (err) {
+			console.error(`Error fetching ${url}:`, err);
+			setError(err);
+		} finally {
+			setLoading(false);
+		}
+	}, []);
+
+	useEffect(() => {
+		goTo(endpoint);
+	}, [endpoint, goTo]);
+
+	return { items: page?.results || [], page, loading, error, goTo };
+}
@@ -3,7 +3,9 @@ import { useParams, Link as RouterLink } from 'react-router-dom';
 import { Typography, Box, Chip, Avatar, Container, Grid, Alert } from '@mui/material';
 
 import axiosInstance from './APIs/Axios';
+import { usePagedList } from './APIs/Paging';
 import LoadingSpinner from './snippets/LoadingSpinner';
+import PageButtons from './snippets/PageButtons';
 import ShowCard from './snippets/cards/ShowCard';
 import styles from './modules/Show.module.css';
 import { useTitle } from 'react-use';
@@ -13,6 +15,8 @@ const ArtistDetails = () => {
 	const [artist, setArtist] = useState(null);
 	const [loading, setLoading] = useState(true);
 	const [error, setError] = useState(null);
+	// The filmography is paged by the server, apart from the artist itself
+	const shows = usePagedList(`artists/${artist_id}/shows/`);
 	useTitle(`${artist?.name} - SIMSY`);
 
 	useEffect(() => {
@@ -159,14 +163,17 @@ const ArtistDetails = () => {
 								Filmography
 							</Typography>
 							<Box className={styles.castContainer}>
-								<Grid container spacing={2}>
-									{artist.shows.map((show) => (
+								{shows.error ? <Alert severity='error'>Error loading shows.</Alert>
+								: shows.loading ? <LoadingSpinner small />
+								: <Grid container spacing={2}>
+									{shows.items.map((show) => (
 										<Grid item xs={6} key={show.id}>
 											<ShowCard show={show} />
 										</Grid>
 									))}
-								</Grid>
+								</Grid>}
 							</Box>
+							<PageButtons page={shows.page} onPage={shows.goTo} />
 						</Box>
 					</Grid>
 				</Grid>
@@ -3,7 +3,9 @@ import { useParams, Link as RouterLink } from 'react-router-dom';
 import { Typography, Box, Chip, Avatar, Container, Grid, Alert } from '@mui/material';
 
 import axiosInstance from './APIs/Axios';
+import { usePagedList } from './APIs/Paging';
 import LoadingSpinner from './snippets/LoadingSpinner';
+import PageButtons from './snippets/PageButtons';
 import ArtistCard from './snippets/cards/ArtistCard';
 import ShowCard from './snippets/cards/ShowCard';
 import styles from './modules/Show.module.css';
@@ -14,6 +16,9 @@ const CountryDetails = () => {
 	const [country, setCountry] = useState(null);
 	const [loading, setLoading] = useState(true);
 	const [error, setError] = useState(null);
+	// Shows and artists are paged by the server, apart from the country itself
+	const shows = usePagedList(`countries/${country_id}/shows/`);
+	const artists = usePagedList(`countries/${country_id}/artists/`);
 	useTitle(`${country?.name} - SIMSY`);
 
 	useEffect(() => {
@@ -103,13 +108,16 @@ const CountryDetails = () => {
 							<Typography variant='h4' component='h2' gutterBottom sx={{ fontWeight: 'bold', color: 'white' }}>
 								Shows from {country.name}
 							</Typography>
-							<Grid container spacing={2}>
-								{country.shows.map((show) => (
+							{shows.error ? <Alert severity='error'>Error loading shows.</Alert>
+							: shows.loading ? <LoadingSpinner small />
+							: <Grid container spacing={2}>
+								{shows.items.map((show) => (
 									<Grid item xs={6} sm={4} md={3} key={show.id}>
 										<ShowCard show={show} />
 									</Grid>
 								))}
-							</Grid>
+							</Grid>}
+							<PageButtons page={shows.page} onPage={shows.goTo} />
 						</Box>
 					</Grid>
 
@@ -120,14 +128,17 @@ const CountryDetails = () => {
 								Artists (Cast)
 							</Typography>
 							<Box className={styles.castContainer}>
-								<Grid container spacing={1}>
-									{country.artists.map((artist) => (
+								{artists.error ? <Alert severity='error'>Error loading artists.</Alert>
+								: artists.loading ? <LoadingSpinner small />
+								: <Grid container spacing={1}>
+									{artists.items.map((artist) => (
 										<Grid item xs={6} key={artist.id}>
-											<ArtistCard artist={artist} />
+											<ArtistCard artist={{ ...artist, nationality: country }} />
 										</Grid>
 									))}
-								</Grid>
+								</Grid>}
 							</Box>
+							<PageButtons page={artists.page} onPage={artists.goTo} />
 						</Box>
 					</Grid>
 				</Grid>
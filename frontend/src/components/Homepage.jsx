@@ -1,5 +1,5 @@
-import { useState, useEffect, useCallback, useContext, useMemo } from 'react';
-import { Box, Tabs, Tab, Pagination, Stack, InputLabel, MenuItem, FormControl, Select, Container, Typography, Button, Link } from '@mui/material';
+import { useState, useEffect, useCallback, useContext } from 'react';
+import { Box, Tabs, Tab, InputLabel, MenuItem, FormControl, Select, Container, Typography, Button, Link } from '@mui/material';
 import { Link as RouterLink } from 'react-router-dom';
 import {
 	Star as StarIcon,
@@ -14,9 +14,11 @@ import axiosInstance from './APIs/Axios';
 import { UserContext } from './APIs/Context';
 import ShowCard from './snippets/cards/ShowCard';
 import LoadingSpinner from './snippets/LoadingSpinner';
+import PageButtons from './snippets/PageButtons';
 import { useTitle } from 'react-use';
 
 // Configuration: Add or remove tabs here without touching the JSX logic
+// Favorites and watchlist are paged by the server, the other tabs are short lists returned whole
 const TABS_CONFIG = {
 	favorites: { label: 'Favorites', icon: <StarIcon />, color: '#ffc107', endpoint: '/shows/favorites/', empty: 'No favorites yet!' },
 	watchlist: { label: 'Watchlist', icon: <ListIcon />, color: '#0dcaf0', endpoint: '/shows/watchlist/', empty: 'No watchlist items yet!' },
@@ -34,7 +36,6 @@ const TabPanel = ({ children, value, index }) => (
 export default function Homepage() {
 	const { user, setUser } = useContext(UserContext);
 	const [activeTab, setActiveTab] = useState('new');
-	const [page, setPage] = useState(1);
 	const [isConfiguring, setIsConfiguring] = useState(true);
 	const [ShowsPerPage, setShowsPerPage] = useState(user?.shows_per_page || 10);
 	useTitle(`${activeTab.charAt(0).toUpperCase() + activeTab.slice(1)} - Home - SIMSY`)
@@ -47,15 +48,17 @@ export default function Homepage() {
 				shows_per_page: newVal,
 			});
 			setUser(response.data);
+			// The server pages by the new size, so pages loaded so far are refetched from the start
+			setState((prev) => ({ ...prev, data: {} }));
 		} catch (error) {
 			alert('An error occurred while attempting to save your Shows_Per_Page. Please try again.');
 			console.error('An error occurred while attempting to save Shows_Per_Page.', error);
 		}
 	};
 
-	// Consolidated State
+	// Consolidated State; a tab's data is the page it shows, as { next, previous, results }
 	const [state, setState] = useState({
-		data: { favorites: [], watchlist: [], new: [], history: [], random: [] },
+		data: {},
 		loading: {},
 		error: null,
 	});
@@ -68,7 +71,7 @@ export default function Homepage() {
 		setIsConfiguring(false);
 	}, [user?.home_tab]);
 
-	const fetchData = useCallback(async (tabKey) => {
+	const fetchData = useCallback(async (tabKey, url = TABS_CONFIG[tabKey].endpoint) => {
 		setState((prev) => ({
 			...prev,
 			loading: { ...prev.loading, [tabKey]: true },
@@ -76,10 +79,11 @@ export default function Homepage() {
 		}));
 
 		try {
-			const { data } = await axiosInstance.get(TABS_CONFIG[tabKey].endpoint);
+			const { data } = await axiosInstance.get(url);
+			const page = Array.isArray(data) ? { next: null, previous: null, results: data } : data;
 			setState((prev) => ({
 				...prev,
-				data: { ...prev.data, [tabKey]: data },
+				data: { ...prev.data, [tabKey]: page },
 				loading: { ...prev.loading, [tabKey]: false },
 			}));
 		} catch (err) {
@@ -91,20 +95,16 @@ export default function Homepage() {
 		}
 	}, []);
 
-	// Trigger fetch on tab change only if data doesn't exist
+	// Trigger fetch on tab change only if the tab hasn't been loaded
 	useEffect(() => {
-		if (!isConfiguring && activeTab) {
-			const hasData = state.data[activeTab]?.length > 0;
-			if (!hasData) {
-				fetchData(activeTab);
-			}
+		if (!isConfiguring && activeTab && !state.data[activeTab] && !state.loading[activeTab] && !state.error) {
+			fetchData(activeTab);
 		}
-	}, [activeTab, isConfiguring, fetchData, state.data]);
+	}, [activeTab, isConfiguring, fetchData, state.data, state.loading, state.error]);
 
 	// Handle Page/Tab changes
 	const handleTabChange = async (_, newValue) => {
 		setActiveTab(newValue);
-		setPage(1);
 
 		try {
 			const response = await axiosInstance.put('/users/current/', {
@@ -116,18 +116,11 @@ export default function Homepage() {
 		}
 	};
 
-	const handlePageChange = (_, value) => {
-		setPage(value);
+	const handlePageChange = (url) => {
+		fetchData(activeTab, url);
 		window.scrollTo({ top: 0, behavior: 'smooth' });
 	};
 
-	const { paginatedData, totalPages } = useMemo(() => {
-		const currentData = state.data[activeTab] || [];
-		const total = Math.ceil(currentData.length / ShowsPerPage);
-		const sliced = currentData.slice((page - 1) * ShowsPerPage, page * ShowsPerPage);
-		return { paginatedData: sliced, totalPages: total };
-	}, [state.data, activeTab, page, ShowsPerPage]);
-
 	// UI Conditionals
 	if (isConfiguring)
 		return (
@@ -147,6 +140,8 @@ export default function Homepage() {
 
 	const config = TABS_CONFIG[activeTab];
 	const isLoading = state.loading[activeTab];
+	const currentPage = state.data[activeTab];
+	const shows = currentPage?.results || [];
 
 	return (
 		<Container maxWidth='xl' sx={{ my: 5 }}>
@@ -219,24 +214,14 @@ export default function Homepage() {
 						<LoadingSpinner />
 						<Typography variant='h5' sx={{ mt: 2 }}>Loading...</Typography>
 					</Box>
-				: paginatedData.length > 0 ?
+				: shows.length > 0 ?
 					<>
 						<Box sx={{ display: 'flex', flexWrap: 'wrap', justifyContent: 'center', gap: 2 }}>
-							{paginatedData.map((show) => (
+							{shows.map((show) => (
 								<ShowCard key={show.id} show={show} />
 							))}
 						</Box>
-						{totalPages > 1 && (
-							<Stack spacing={2} sx={{ mt: 4 }} alignItems='center'>
-								<Pagination
-									count={totalPages}
-									page={page}
-									onChange={handlePageChange}
-									color='primary'
-									sx={{ '& .MuiPaginationItem-root': { color: 'white' } }}
-								/>
-							</Stack>
-						)}
+						<PageButtons page={currentPage} onPage={handlePageChange} />
 					</>
 				:	<Typography variant='h4' sx={{ textAlign: 'center', mt: 5, color: config.color }}>{config.empty}</Typography>}
 			</TabPanel>
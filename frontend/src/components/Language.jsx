@@ -4,7 +4,9 @@ import { Typography, Box, Chip, Avatar, Tooltip, Container, Grid, Alert } from '
 import { Language as LanguageIcon, Flag as FlagIcon, People as PeopleIcon, Movie as MovieIcon } from '@mui/icons-material';
 
 import axiosInstance from './APIs/Axios.jsx';
+import { usePagedList } from './APIs/Paging.jsx';
 import LoadingSpinner from './snippets/LoadingSpinner.jsx';
+import PageButtons from './snippets/PageButtons.jsx';
 import ShowCard from './snippets/cards/ShowCard.jsx';
 import CountryCard from './snippets/cards/CountryCard.jsx';
 import styles from './modules/Show.module.css';
@@ -15,6 +17,9 @@ const LanguageDetails = () => {
 	const [language, setLanguage] = useState(null);
 	const [loading, setLoading] = useState(true);
 	const [error, setError] = useState(null);
+	// Countries and shows are paged by the server, apart from the language itself
+	const countries = usePagedList(`languages/${language_id}/countries/`);
+	const shows = usePagedList(`languages/${language_id}/shows/`);
 	useTitle(`${language?.name} - SIMSY`);
 
 	useEffect(() => {
@@ -93,13 +98,16 @@ const LanguageDetails = () => {
 							<Typography variant='h5' component='h3' gutterBottom sx={{ fontWeight: 'bold', color: 'white' }}>
 								Countries where spoken
 							</Typography>
-							<Grid container spacing={1}>
-								{language.countries.map((country) => (
+							{countries.error ? <Alert severity='error'>Error loading countries.</Alert>
+							: countries.loading ? <LoadingSpinner small />
+							: <Grid container spacing={1}>
+								{countries.items.map((country) => (
 									<Grid item xs={6} sm={4} md={3} key={country.id}>
 										<CountryCard country={country} />
 									</Grid>
 								))}
-							</Grid>
+							</Grid>}
+							<PageButtons page={countries.page} onPage={countries.goTo} />
 						</Box>
 
 						{/* Filmography Section */}
@@ -107,13 +115,16 @@ const LanguageDetails = () => {
 							<Typography variant='h4' component='h2' gutterBottom sx={{ fontWeight: 'bold', color: 'white' }}>
 								Shows in {language.name}
 							</Typography>
-							<Grid container spacing={2}>
-								{language.shows.map((show) => (
+							{shows.error ? <Alert severity='error'>Error loading shows.</Alert>
+							: shows.loading ? <LoadingSpinner small />
+							: <Grid container spacing={2}>
+								{shows.items.map((show) => (
 									<Grid item xs={6} sm={4} md={3} key={show.id}>
 										<ShowCard show={show} />
 									</Grid>
 								))}
-							</Grid>
+							</Grid>}
+							<PageButtons page={shows.page} onPage={shows.goTo} />
 						</Box>
 					</Grid>
 				</Grid>
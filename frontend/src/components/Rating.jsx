@@ -2,7 +2,9 @@ import React, { useState, useEffect } from 'react';
 import { useParams } from 'react-router-dom';
 import { Typography, Box, Container, Grid, Alert } from '@mui/material';
 import axiosInstance from './APIs/Axios.jsx';
+import { usePagedList } from './APIs/Paging.jsx';
 import LoadingSpinner from './snippets/LoadingSpinner.jsx';
+import PageButtons from './snippets/PageButtons.jsx';
 import ShowCard from './snippets/cards/ShowCard.jsx';
 import styles from './modules/Show.module.css';
 import { useTitle } from 'react-use';
@@ -12,6 +14,8 @@ const RatingDetails = () => {
 	const [rating, setRating] = useState(null);
 	const [loading, setLoading] = useState(true);
 	const [error, setError] = useState(null);
+	// Shows are paged by the server, apart from the rating itself
+	const shows = usePagedList(`ratings/${rating_id}/shows/`);
 	useTitle(`${rating?.name} - SIMSY`);
 
 	useEffect(() => {
@@ -90,13 +94,16 @@ const RatingDetails = () => {
 							<Typography variant='h4' component='h2' gutterBottom sx={{ fontWeight: 'bold', color: 'white' }}>
 								Shows with this Rating
 							</Typography>
-							<Grid container spacing={2}>
-								{rating.shows.map((show) => (
+							{shows.error ? <Alert severity='error'>Error loading shows.</Alert>
+							: shows.loading ? <LoadingSpinner small />
+							: <Grid container spacing={2}>
+								{shows.items.map((show) => (
 									<Grid item xs={6} sm={4} md={3} lg={2} key={show.id}>
 										<ShowCard show={show} />
 									</Grid>
 								))}
-							</Grid>
+							</Grid>}
+							<PageButtons page={shows.page} onPage={shows.goTo} />
 						</Box>
 					</Grid>
 				</Grid>
@@ -149,10 +149,12 @@ const useMediaPlayer = (show, refetchShowData) => {
 
 	const sendTimeReached = useCallback(async (currentShowId, currentSeason, currentEpisode, timeReached) => {
 		try {
-			await axiosInstance.post(`shows/${currentShowId}/update_time_reached/`, {
+			// Heartbeats are buffered by the backend; seq lets it drop late or duplicated ones
+			await axiosInstance.post(`shows/${currentShowId}/heartbeat/`, {
 				season: currentSeason || 0,
 				episode: currentEpisode || 0,
 				time_reached: Math.round(timeReached),
+				seq: Date.now(),
 			});
 		} catch (error) {
 			console.error('Error updating time reached:', error);
@@ -0,0 +1,18 @@
+import { Stack, Button } from '@mui/material';
+import { NavigateBefore as PreviousIcon, NavigateNext as NextIcon } from '@mui/icons-material';
+
+// Previous/Next for the cursor-paginated endpoints, which return { next, previous, results }
+export default function PageButtons({ page, onPage }) {
+	if (!page?.next && !page?.previous) return null;
+
+	return (
+		<Stack direction='row' spacing={2} sx={{ mt: 4 }} justifyContent='center'>
+			<Button variant='outlined' startIcon={<PreviousIcon />} disabled={!page.previous} onClick={() => onPage(page.previous)}>
+				Previous
+			</Button>
+			<Button variant='outlined' endIcon={<NextIcon />} disabled={!page.next} onClick={() => onPage(page.next)}>
+				Next
+			</Button>
+		</Stack>
+	);
+}